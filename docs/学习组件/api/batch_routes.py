@@ -0,0 +1,39 @@
+from typing import Dict, List
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel, Field
+from config import config
+from api.dependencies import get_learning_path_service
+
+batch_router = APIRouter(tags=["学习路径"])
+
+class BatchPathRequest(BaseModel):
+    """批量生成学习路径请求"""
+    subject: str
+    student_ids: List[str] = Field(..., min_length=1)
+
+class BatchPathResponse(BaseModel):
+    """批量生成学习路径结果"""
+    subject: str
+    requested: int
+    generated: int
+    failed_student_ids: List[str]
+    sequences: Dict[str, List[str]]
+
+@batch_router.post("/batch", response_model=BatchPathResponse)
+def generate_paths_batch(request: BatchPathRequest, service=Depends(get_learning_path_service)):
+    """为一批学生（班级/年级）批量生成学习路径"""
+    max_students = config.get("service.batch_max_students", 10000)
+    if len(request.student_ids) > max_students:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"单次最多 {max_students} 名学生"
+        )
+
+    learning_paths = service.generate_paths_batch(request.student_ids, request.subject)
+    return BatchPathResponse(
+        subject=request.subject,
+        requested=len(request.student_ids),
+        generated=len(learning_paths),
+        failed_student_ids=[sid for sid in request.student_ids if sid not in learning_paths],
+        sequences={sid: path.sequence for sid, path in learning_paths.items()}
+    )
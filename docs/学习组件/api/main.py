@@ -1,4 +1,13 @@
+import time
+
+# 启动计时起点，/health 中报告各阶段耗时
+_import_start = time.perf_counter()
+
+import signal
+import asyncio
 import logging
+from datetime import datetime
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
@@ -8,13 +17,21 @@ import sentry_sdk
 from sentry_sdk.integrations.fastapi import FastApiIntegration
 from sentry_sdk.integrations.logging import LoggingIntegration
 from config import config
+from data import async_redis_client, knowledge_state_buffer, warm_up_data, startup_timings
+from data.circuit_breaker import BreakerRegistry
+from models import model_manager
 from api.routes import learning_path_router, student_router
+from api.batch_routes import batch_router
 from api.dependencies import get_learning_path_service, get_student_service
 from api.middlewares import (
     RequestIdMiddleware,
     RateLimitMiddleware,
     CircuitBreakerMiddleware
 )
+from api.rate_limit import RateLimiter, LocalTokenBucket, RedisTokenBucket
+from api.auth import TokenVerifier
+
+startup_timings["imports"] = round(time.perf_counter() - _import_start, 4)
 
 # 初始化日志
 logging.basicConfig(
@@ -38,15 +55,37 @@ if config.get("sentry.dsn"):
         traces_sample_rate=0.1
     )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 可选预热：启动时建立连接并加载模型，否则在首次请求时初始化
+    if config.get("service.warm_up", False):
+        start = time.perf_counter()
+        await asyncio.to_thread(warm_up_data)
+        await asyncio.to_thread(model_manager.warm_up)
+        startup_timings["warm_up"] = round(time.perf_counter() - start, 4)
+    startup_timings["ready"] = round(time.perf_counter() - _import_start, 4)
+    # 配置热更新：配置文件修改或收到 SIGHUP 时重新加载（读取文件和订阅回调在线程池中执行，不阻塞事件循环）
+    config.start_watcher(config.get("service.config_reload_interval", 5))
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGHUP, lambda: loop.run_in_executor(None, config.reload))
+    yield
+    config.stop_watcher()
+    loop.remove_signal_handler(signal.SIGHUP)
+    # 关闭时写入写回缓冲中剩余的知识状态变化
+    if knowledge_state_buffer.initialized:
+        knowledge_state_buffer.close()
+    if async_redis_client.initialized:
+        await async_redis_client.aclose()
+
 # 初始化FastAPI应用
 app = FastAPI(
     title="个性化学习路径API",
     description="基于AI的个性化学习路径生成系统",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# 添加中间件
-app.add_middleware(RequestIdMiddleware)
+# 添加中间件（后添加的在外层）
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 app.add_middleware(
     CORSMiddleware,
@@ -55,18 +94,41 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-app.add_middleware(
-    RateLimitMiddleware,
+rate_limiter = RateLimiter(
     global_limit=config.get("api.rate_limit.global", "100/minute"),
-    endpoint_limits=config.get("api.rate_limit.endpoints", {})
+    endpoint_limits=config.get("api.rate_limit.endpoints", {}),
+    # local：每个worker独立计数；redis：所有worker和实例共享计数
+    bucket=(RedisTokenBucket(async_redis_client) if config.get("api.rate_limit.backend", "local") == "redis"
+            else LocalTokenBucket(config.get("api.rate_limit.max_keys", 100000))),
+    principal_key=config.get("api.rate_limit.principal_key", "principal"),
+    # 按令牌中已签名的租户/学生标识限流
+    token_verifier=(TokenVerifier(
+        config.get_str("api.auth.jwt_secret"),
+        claims=config.get("api.auth.principal_claims", ("tenant_id", "student_id", "sub")),
+        leeway=config.get_float("api.auth.leeway", 30)
+    ) if config.get("api.auth.jwt_secret") else None)
+)
+app.add_middleware(RateLimitMiddleware, rate_limiter=rate_limiter)
+# 限流规则随配置热更新
+config.subscribe(
+    ["api.rate_limit.global", "api.rate_limit.endpoints"],
+    lambda cfg: rate_limiter.update_rules(
+        cfg.get("api.rate_limit.global", "100/minute"), cfg.get("api.rate_limit.endpoints", {})
+    )
 )
 app.add_middleware(
     CircuitBreakerMiddleware,
-    failure_threshold=5,
-    recovery_timeout=60
+    registry=BreakerRegistry(
+        max_breakers=config.get("circuit_breaker.max_breakers", 1000),
+        failure_threshold=config.get("circuit_breaker.failure_threshold", 5),
+        recovery_timeout=config.get("circuit_breaker.recovery_timeout", 60)
+    )
 )
+# 请求ID在最外层生成，限流、熔断返回的响应中同样带有请求ID
+app.add_middleware(RequestIdMiddleware)
 
 # 注册路由
+app.include_router(batch_router, prefix="/api/v1/learning-paths")
 app.include_router(learning_path_router, prefix="/api/v1/learning-paths")
 app.include_router(student_router, prefix="/api/v1/students")
 
@@ -80,7 +142,8 @@ async def health_check():
         "status": "healthy",
         "service": "learning-path-service",
         "version": "1.0.0",
-        "timestamp": datetime.now().isoformat()
+        "timestamp": datetime.now().isoformat(),
+        "startup": startup_timings
     }
 
 # 全局异常处理
@@ -1,95 +1,166 @@
-import time
+import math
 import uuid
-from typing import Callable, Dict, Any
-from fastapi import Request, Response
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from pybreaker import CircuitBreaker, CircuitBreakerError
+import asyncio
+from typing import List
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.routing import BaseRoute, Route
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from api.rate_limit import RateLimiter, LocalTokenBucket
+from data.circuit_breaker import BreakerRegistry, CircuitOpenError
+
+# 以下中间件均为原生ASGI实现：不创建额外任务、不包装响应流，大响应可直接流式返回
+
+def _header(scope: Scope, name: bytes) -> str:
+    """读取请求头（name 为小写字节串），不存在时返回空字符串"""
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return ""
 
 # 请求ID中间件
-class RequestIdMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        request_id = request.headers.get("X-Request-ID", str(uuid.uuid4()))
-        request.state.request_id = request_id
-        response = await call_next(request)
-        response.headers["X-Request-ID"] = request_id
-        return response
+class RequestIdMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = _header(scope, b"x-request-id") or str(uuid.uuid4())
+        # request.state 读取的就是 scope["state"]
+        scope.setdefault("state", {})["request_id"] = request_id
+
+        async def send_with_request_id(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Request-ID"] = request_id
+            await send(message)
+
+        await self.app(scope, receive, send_with_request_id)
 
 # 限流中间件
-limiter = Limiter(key_func=get_remote_address)
-
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, global_limit: str, endpoint_limits: Dict[str, str] = None):
-        super().__init__(app)
-        self.global_limit = global_limit
-        self.endpoint_limits = endpoint_limits or {}
-    
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        # 获取端点路径
-        path = request.url.path
-        method = request.method
-        
-        # 查找端点特定的限流配置
-        limit_key = f"{method}:{path}"
-        limit = self.endpoint_limits.get(limit_key, self.global_limit)
-        
+class RateLimitMiddleware:
+    def __init__(self, app: ASGIApp, rate_limiter: RateLimiter):
+        self.app = app
+        self.rate_limiter = rate_limiter
+        # 进程内令牌桶直接在事件循环中计算；Redis令牌桶通过异步客户端执行Lua脚本
+        self.local = isinstance(rate_limiter.bucket, LocalTokenBucket)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        # 查找端点特定的限流配置（按路由模板匹配）
+        rule_key, rule = self.rate_limiter.match(scope["method"], scope["path"])
+        key = self.rate_limiter.bucket_key(scope, rule_key)
+
         # 应用限流
+        if self.local:
+            retry_after = self.rate_limiter.bucket.acquire(key, rule)
+        else:
+            retry_after = await self.rate_limiter.bucket.acquire(key, rule)
+        if retry_after > 0:
+            response = JSONResponse(
+                {"error": f"Rate limit exceeded: {rule}"},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+            return await response(scope, receive, send)
+
+        await self.app(scope, receive, send)
+
+# 路由级熔断：包装在路由匹配之后执行的 route.app 上，熔断器名称直接取路由模板，不需要按请求遍历路由表
+class RouteCircuitBreaker:
+    """单个路由的熔断包装，熔断器打开时抛出 CircuitOpenError，由 CircuitBreakerMiddleware 返回503"""
+
+    def __init__(self, app: ASGIApp, registry: BreakerRegistry, path: str):
+        self.app = app
+        self.registry = registry
+        self.path = path  # 路由模板，如 /api/v1/students/{student_id}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        # 路径参数不同的请求共用同一个熔断器
+        breaker = self.registry.get(f"route:{scope['method']} {self.path}")
+        breaker.before_call()
+        status_code = None
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
         try:
-            @limiter.limit(limit)
-            async def limited_call(request: Request):
-                return await call_next(request)
-            
-            return await limited_call(request)
-        except RateLimitExceeded as e:
-            return await _rate_limit_exceeded_handler(request, e)
+            await self.app(scope, receive, send_with_status)
+        except (CircuitOpenError, asyncio.CancelledError):
+            # 下游依赖已熔断或请求被取消，不计入路由失败
+            breaker.release()
+            raise
+        except Exception:
+            # 其他异常记录为失败
+            breaker.record_failure()
+            raise
+
+        # 服务器错误记录为失败
+        if status_code is not None and 500 <= status_code < 600:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+def install_route_breakers(routes: List[BaseRoute], registry: BreakerRegistry):
+    """为尚未包装的路由加上熔断包装（首次请求时调用，此时所有路由均已注册）"""
+    for route in routes:
+        if isinstance(route, Route) and not isinstance(route.app, RouteCircuitBreaker):
+            route.app = RouteCircuitBreaker(route.app, registry, route.path)
 
 # 熔断中间件
-class CircuitBreakerMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, failure_threshold: int = 5, recovery_timeout: int = 60):
-        super().__init__(app)
-        self.breakers: Dict[str, CircuitBreaker] = {}
-        self.failure_threshold = failure_threshold
-        self.recovery_timeout = recovery_timeout
-    
-    def get_breaker(self, key: str) -> CircuitBreaker:
-        if key not in self.breakers:
-            self.breakers[key] = CircuitBreaker(
-                fail_max=self.failure_threshold,
-                reset_timeout=self.recovery_timeout,
-                name=key
-            )
-        return self.breakers[key]
-    
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        # 按端点路径创建熔断器
-        key = f"{request.method}:{request.url.path}"
-        breaker = self.get_breaker(key)
-        
+class CircuitBreakerMiddleware:
+    """按路由模板熔断；下游依赖（数据库、Redis、Neo4j、模型）熔断时同样快速返回503
+
+    路由熔断在路由匹配后由 RouteCircuitBreaker 判断，本中间件负责安装包装并将 CircuitOpenError 转为503响应。
+    """
+
+    def __init__(self, app: ASGIApp, registry: BreakerRegistry):
+        self.app = app
+        self.registry = registry
+        self.installed_routes = 0
+
+    def _unavailable(self, scope: Scope, error: CircuitOpenError) -> JSONResponse:
+        return JSONResponse(
+            status_code=503,
+            content={
+                "error": "服务暂时不可用",
+                "message": "当前请求过于频繁，请稍后再试",
+                "request_id": scope.get("state", {}).get("request_id", "")
+            },
+            headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))}
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        # 路由表变化（含首次请求）时补充包装新注册的路由
+        routes = scope["app"].router.routes
+        if len(routes) != self.installed_routes:
+            install_route_breakers(routes, self.registry)
+            self.installed_routes = len(routes)
+
+        started = False
+
+        async def send_with_started(message: Message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
         try:
-            # 执行请求处理
-            def wrapped_call():
-                return call_next(request)
-            
-            response = await breaker.call(wrapped_call)
-            
-            # 如果是服务器错误，记录失败
-            if 500 <= response.status_code < 600:
-                breaker.fail()
-            
-            return response
-        except CircuitBreakerError:
-            return JSONResponse(
-                status_code=503,
-                content={
-                    "error": "服务暂时不可用",
-                    "message": "当前请求过于频繁，请稍后再试",
-                    "request_id": getattr(request.state, "request_id", "")
-                }
-            )
-        except Exception as e:
-            # 其他异常也记录为失败
-            breaker.fail()
-            raise e
+            await self.app(scope, receive, send_with_started)
+        except CircuitOpenError as e:
+            # 路由或下游依赖已熔断，响应尚未开始时返回503；已开始发送的响应无法改写，继续抛出
+            if started:
+                raise
+            await self._unavailable(scope, e)(scope, receive, send)
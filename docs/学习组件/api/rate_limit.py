@@ -0,0 +1,181 @@
+import re
+import time
+import logging
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+from starlette.routing import compile_path
+
+logger = logging.getLogger(__name__)
+
+RATE_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+RATE_PATTERN = re.compile(r"^\s*(\d+)\s*(?:/|per)\s*(\d*)\s*(second|minute|hour|day)s?\s*$")
+
+class RateLimitRule:
+    """令牌桶限流规则：capacity 为桶容量（允许的突发请求数），rate 为每秒补充的令牌数"""
+
+    __slots__ = ("text", "capacity", "rate")
+
+    def __init__(self, limit: int, period: float, text: str = ""):
+        self.text = text or f"{limit} per {period} second"
+        self.capacity = float(limit)
+        self.rate = limit / period
+
+    @classmethod
+    def parse(cls, text: str) -> "RateLimitRule":
+        """解析 "100/minute"、"100 per minute"、"10/5 second" 格式的限流配置"""
+        match = RATE_PATTERN.match(text.lower())
+        if not match:
+            raise ValueError(f"无效的限流配置: {text}")
+        limit, multiple, unit = match.groups()
+        return cls(int(limit), int(multiple or 1) * RATE_PERIODS[unit], text)
+
+    def __str__(self) -> str:
+        return self.text
+
+class LocalTokenBucket:
+    """进程内令牌桶
+
+    只在事件循环线程中调用，不需要加锁。已补满的桶与新建的桶等价，
+    键数量达到上限时优先清理这些桶。
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self.buckets: Dict[str, List[float]] = {}  # {键: [剩余令牌, 上次补充时间, 补满时间]}
+
+    def acquire(self, key: str, rule: RateLimitRule, cost: float = 1.0) -> float:
+        """尝试取出令牌，成功返回0，否则返回需要等待的秒数"""
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.max_keys:
+                self._evict(now)
+            tokens = rule.capacity
+            bucket = self.buckets[key] = [tokens, now, now]
+        else:
+            tokens = min(rule.capacity, bucket[0] + (now - bucket[1]) * rule.rate)
+
+        retry_after = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            retry_after = (cost - tokens) / rule.rate
+        bucket[0], bucket[1], bucket[2] = tokens, now, now + (rule.capacity - tokens) / rule.rate
+        return retry_after
+
+    def _evict(self, now: float):
+        """清理已补满的桶，仍超过上限时按创建顺序淘汰最早的一半"""
+        self.buckets = {key: bucket for key, bucket in self.buckets.items() if bucket[2] > now}
+        if len(self.buckets) >= self.max_keys:
+            for key in list(self.buckets)[:len(self.buckets) // 2]:
+                del self.buckets[key]
+
+# 原子令牌桶：使用Redis服务器时间，多个worker和实例之间共享同一个桶
+TOKEN_BUCKET_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return tostring(retry_after)
+"""
+
+class RedisTokenBucket:
+    """基于Redis Lua脚本的集群级令牌桶，Redis不可用时放行请求
+
+    redis_client 为 redis.asyncio 客户端，脚本在事件循环中异步执行，不占用线程池。
+    """
+
+    def __init__(self, redis_client, prefix: str = "rate_limit:"):
+        self.redis_client = redis_client
+        self.prefix = prefix
+        self._script = None
+
+    async def acquire(self, key: str, rule: RateLimitRule, cost: float = 1.0) -> float:
+        """尝试取出令牌，成功返回0，否则返回需要等待的秒数"""
+        try:
+            if self._script is None:
+                self._script = self.redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+            result = await self._script(keys=[self.prefix + key], args=[rule.capacity, rule.rate, cost])
+            return float(result)
+        except Exception as e:
+            logger.warning(f"Redis限流检查失败，放行请求: {str(e)}")
+            return 0.0
+
+class RateLimiter:
+    """按路由预编译规则的限流器
+
+    端点规则的键为 "方法:路由模板"（如 "GET:/api/v1/students/{student_id}"），
+    不含路径参数的模板按字典直接查找，含路径参数的模板预编译为正则按方法匹配。
+
+    限流对象为已认证的用户：外层认证中间件写入 scope["state"][principal_key] 的标识优先，
+    否则由 token_verifier 校验请求中的令牌得到（并写入 scope["state"] 供后续使用）；
+    未认证的请求按客户端IP计数。客户端可以任意设置的请求头（如 X-Student-ID）不作为限流对象，
+    否则更换请求头即可绕过限流。
+    """
+
+    def __init__(self, global_limit: str, endpoint_limits: Optional[Dict[str, str]] = None,
+                 bucket=None, principal_key: str = "principal", token_verifier=None):
+        self.update_rules(global_limit, endpoint_limits)
+        self.bucket = bucket or LocalTokenBucket()
+        self.principal_key = principal_key
+        self.token_verifier = token_verifier
+
+    def update_rules(self, global_limit: str, endpoint_limits: Optional[Dict[str, str]] = None):
+        """解析并替换限流规则（启动及配置热更新时调用）"""
+        global_rule = RateLimitRule.parse(global_limit)
+        # {"方法:路由模板": 规则}，只在此处解析
+        endpoint_rules = {key: RateLimitRule.parse(limit) for key, limit in (endpoint_limits or {}).items()}
+        # {方法: [(路径正则, 规则键, 规则)]}，按配置顺序匹配
+        template_rules: Dict[str, List[Tuple[Pattern, str, RateLimitRule]]] = {}
+        for key, rule in endpoint_rules.items():
+            method, _, template = key.partition(":")
+            if "{" in template:
+                template_rules.setdefault(method, []).append((compile_path(template)[0], key, rule))
+        self.global_rule, self.endpoint_rules, self.template_rules = global_rule, endpoint_rules, template_rules
+
+    def match(self, method: str, path: str) -> Tuple[str, RateLimitRule]:
+        """匹配端点规则，返回 (规则键, 规则)；没有端点规则时规则键为 "*"，使用全局规则"""
+        key = f"{method}:{path}"
+        rule = self.endpoint_rules.get(key)
+        if rule is not None:
+            return key, rule
+        for pattern, template_key, template_rule in self.template_rules.get(method, ()):
+            if pattern.match(path):
+                return template_key, template_rule
+        return "*", self.global_rule
+
+    def rule_for(self, method: str, path: str) -> RateLimitRule:
+        """获取端点限流规则"""
+        return self.match(method, path)[1]
+
+    def identity(self, scope: Dict[str, Any]) -> str:
+        """限流对象标识：已认证用户的标识，未认证时为客户端IP"""
+        state = scope.setdefault("state", {})
+        principal = state.get(self.principal_key)
+        if not principal and self.token_verifier is not None:
+            principal = self.token_verifier.principal(scope)
+            if principal:
+                state[self.principal_key] = principal
+        if principal:
+            return f"principal={principal}"
+        client = scope.get("client")
+        return f"ip={client[0] if client else '127.0.0.1'}"
+
+    def bucket_key(self, scope: Dict[str, Any], rule_key: Optional[str] = None) -> str:
+        """令牌桶键：有端点规则的端点（按路由模板）各自计数，其余端点共享全局桶"""
+        if rule_key is None:
+            rule_key = self.match(scope["method"], scope["path"])[0]
+        return f"{rule_key}|{self.identity(scope)}"
@@ -0,0 +1,41 @@
+"""pytest-benchmark 运行微基准时的公共 fixture
+
+env 为安装了替身依赖的 BenchmarkEnvironment（整个会话共用一份合成数据），
+每个基准开始前清空缓存，与 python -m benchmarks.e2e run 的微基准一致。
+"""
+import pytest
+
+def pytest_addoption(parser):
+    group = parser.getgroup("learning-path-benchmarks", "学习路径服务基准测试")
+    group.addoption("--bench-subject", default="math")
+    group.addoption("--bench-students", type=int, default=1000, help="合成学生数")
+    group.addoption("--bench-nodes", type=int, default=500, help="知识图谱节点数")
+    group.addoption("--bench-records", type=int, default=50, help="每个学生的平均答题记录数")
+    group.addoption("--bench-batch-size", type=int, default=100, help="batch_get_students 每次读取的学生数")
+    group.addoption("--bench-db-latency-ms", type=float, default=0.0, help="模拟的数据库单次往返耗时")
+    group.addoption("--bench-redis-latency-ms", type=float, default=0.0, help="模拟的Redis单次往返耗时")
+    group.addoption("--bench-graph-latency-ms", type=float, default=0.0, help="模拟的图数据库单次往返耗时")
+    group.addoption("--bench-rounds", type=int, default=50, help="每个微基准的计时轮数")
+    group.addoption("--bench-seed", type=int, default=0)
+
+@pytest.fixture(scope="session")
+def benchmark_environment(request):
+    from benchmarks.e2e import BenchmarkEnvironment
+    option = request.config.getoption
+    return BenchmarkEnvironment(
+        subject=option("--bench-subject"),
+        students=option("--bench-students"),
+        nodes=option("--bench-nodes"),
+        records=option("--bench-records"),
+        db_latency=option("--bench-db-latency-ms") / 1000.0,
+        redis_latency=option("--bench-redis-latency-ms") / 1000.0,
+        graph_latency=option("--bench-graph-latency-ms") / 1000.0,
+        batch_size=option("--bench-batch-size"),
+        seed=option("--bench-seed"),
+        rounds=option("--bench-rounds")
+    ).install()
+
+@pytest.fixture
+def env(benchmark_environment):
+    benchmark_environment.reset_caches()
+    return benchmark_environment
@@ -0,0 +1,405 @@
+"""学习路径服务端到端基准测试
+
+以进程内替身代替PostgreSQL、Redis和知识图谱库（见 benchmarks.fakes），用合成数据
+（见 benchmarks.synthetic）驱动真实的 LearningPathService、StudentRepository 及各缓存层：
+- 微基准：generate_path、assess_knowledge、batch_get_students 等各阶段的单次耗时
+- 负载场景：多线程按比例混合请求，报告吞吐量和 p50/p95/p99 延迟
+
+运行前提是完整的服务代码树：本目录只替换数据源，不提供服务本身缺少的模块和方法
+（如 data.redis_client、data.repositories 包、models.student，以及 LearningPathService 的
+_prepare_answer_features、_generate_adaptive_elements 等辅助方法）。缺少时 install() 直接报告缺少的部分，
+不会以替身代替后继续运行；在缺少这些代码的检出上得到的耗时不能代表服务的真实性能。
+
+结果保存为JSON，可与其他提交的结果比较:
+    python -m benchmarks.e2e run --students 2000 --nodes 500 --output base.json
+    python -m benchmarks.e2e compare base.json benchmarks/results/e2e-<提交>.json
+
+微基准同样可以用 pytest-benchmark 运行（benchmark 与 env fixture 见 benchmarks/conftest.py）:
+    python -m pytest benchmarks --bench-students 2000 --benchmark-autosave
+    python -m pytest benchmarks --bench-students 2000 --benchmark-compare
+"""
+import sys
+import time
+import random
+import logging
+import argparse
+import itertools
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+import data
+from data import student_local_cache, knowledge_feature_cache, knowledge_graph_cache
+from models import model_manager, prediction_cache
+from .fakes import (
+    FakeRedis, FakeDatabase, FakeDBConnector,
+    InMemoryKnowledgeRepository, InMemoryRecordRepository, InMemoryPathRepository
+)
+from .synthetic import generate_knowledge_graph, generate_students, generate_answer_history, build_assessment_model
+from .runner import Benchmark, summarize, save_results, load_results, compare_results, machine_info
+
+logger = logging.getLogger(__name__)
+
+# 基准路径上调用的服务辅助方法，缺少任何一个时 generate_path 只会记录错误并返回空结果
+SERVICE_HELPERS = (
+    "_prepare_answer_features", "_prepare_behavior_features", "_generate_adaptive_elements",
+    "_break_down_complex_nodes", "_reorder_for_exploration", "_heuristic_sort"
+)
+
+class BenchmarkEnvironment:
+    """合成数据及替身依赖，安装到 data 模块的延迟初始化资源上"""
+
+    def __init__(self, subject: str = "math", students: int = 1000, nodes: int = 500, records: int = 50,
+                 max_prerequisites: int = 3, db_latency: float = 0.0, redis_latency: float = 0.0,
+                 graph_latency: float = 0.0, batch_size: int = 100, seed: int = 0, rounds: Optional[int] = None):
+        self.subject = subject
+        # 微基准计时轮数：None 时内置计时器在 max_time 内尽量多轮；pytest-benchmark 需要固定轮数
+        self.rounds = rounds
+        graph = generate_knowledge_graph(subject, nodes, max_prerequisites, seed=seed)
+        self.node_ids: List[str] = list(graph.nodes)
+        self.students = generate_students(students, self.node_ids, seed=seed + 1)
+        self.student_ids = [student.id for student in self.students]
+        self.batch_size = min(batch_size, students)
+
+        self.database = FakeDatabase(db_latency)
+        for student in self.students:
+            self.database.insert_student(student)
+        self.redis = FakeRedis(redis_latency)
+        self.knowledge_repo = InMemoryKnowledgeRepository({subject: graph}, graph_latency)
+        self.record_repo = InMemoryRecordRepository(
+            generate_answer_history(self.students, subject, self.node_ids, records, seed=seed + 2), db_latency
+        )
+        self.path_repo = InMemoryPathRepository(db_latency)
+        self.model = build_assessment_model(seed=seed + 3)
+        self.student_repo = data.student_repo
+        self.service = None
+
+    def install(self):
+        """替换数据层客户端和仓库，注入随机权重模型，然后创建服务"""
+        data.db_connector.override(lambda: FakeDBConnector(self.database))
+        data.redis_client.override(lambda: self.redis)
+        data.knowledge_repo.override(lambda: self.knowledge_repo)
+        data.record_repo.override(lambda: self.record_repo)
+        data.path_repo.override(lambda: self.path_repo)
+        model_manager.models["knowledge_assessment"] = (self.model, "benchmark", datetime.now())
+
+        from learning_path_service import LearningPathService
+        missing = [name for name in SERVICE_HELPERS if not hasattr(LearningPathService, name)]
+        if missing:
+            raise RuntimeError(
+                f"LearningPathService 缺少 {', '.join(missing)}，端到端基准需要完整的服务代码树"
+            )
+        self.service = LearningPathService()
+        return self
+
+    def reset_caches(self):
+        """清空Redis和各进程内缓存，下一次调用从替身数据源加载"""
+        self.redis.flushall()
+        student_local_cache.clear()
+        prediction_cache.local.clear()
+        knowledge_feature_cache.invalidate()
+        knowledge_graph_cache.invalidate()
+
+    def round_trips(self) -> Dict[str, int]:
+        return {
+            "database": self.database.round_trips,
+            "redis": self.redis.round_trips,
+            "knowledge_graph": self.knowledge_repo.round_trips,
+            "records": self.record_repo.round_trips,
+            "paths": self.path_repo.round_trips
+        }
+
+def _require(result: Any, name: str) -> Any:
+    # 服务方法出错时记录日志并返回空值，不能把出错的调用当作有效耗时
+    if result is None:
+        raise RuntimeError(f"{name} 返回空结果，请检查日志中的错误")
+    return result
+
+# 微基准，签名与 pytest-benchmark 一致：第一个参数为 benchmark（内置 Benchmark 或 pytest-benchmark fixture）
+
+def bench_generate_path(benchmark: Benchmark, env: BenchmarkEnvironment):
+    """完整生成一条学习路径（缓存已预热）"""
+    student_ids = itertools.cycle(env.student_ids)
+    result = benchmark.pedantic(
+        env.service.generate_path, setup=lambda: ((next(student_ids), env.subject), {}),
+        warmup_rounds=min(len(env.student_ids), 200), rounds=env.rounds
+    )
+    _require(result, "generate_path")
+
+def bench_assess_knowledge(benchmark: Benchmark, env: BenchmarkEnvironment):
+    """知识评估，推理结果缓存未命中（每轮清空）"""
+    students = itertools.cycle(env.students)
+
+    def setup():
+        prediction_cache.local.clear()
+        return (next(students), env.subject), {}
+
+    _require(benchmark.pedantic(
+        env.service.assess_knowledge, setup=setup, warmup_rounds=5, rounds=env.rounds
+    ), "assess_knowledge")
+
+def bench_assess_knowledge_cached(benchmark: Benchmark, env: BenchmarkEnvironment):
+    """知识评估，推理结果缓存命中"""
+    students = itertools.cycle(env.students[:100])
+    _require(benchmark.pedantic(
+        env.service.assess_knowledge, setup=lambda: ((next(students), env.subject), {}),
+        warmup_rounds=min(len(env.students), 100), rounds=env.rounds
+    ), "assess_knowledge")
+
+def bench_path_sequence(benchmark: Benchmark, env: BenchmarkEnvironment):
+    """由掌握度得到薄弱点并生成路径序列（编译知识图谱已缓存）"""
+    service = env.service
+    students = itertools.cycle(env.students)
+
+    def setup():
+        student = next(students)
+        weak_nodes = service.find_weak_nodes(student.knowledge_state)
+        return (weak_nodes, student, service.select_learning_strategy(student), env.subject), {}
+
+    benchmark.pedantic(service._generate_path_sequence, setup=setup, warmup_rounds=1, rounds=env.rounds)
+
+def _batches(env: BenchmarkEnvironment) -> Callable[[], tuple]:
+    """依次返回不重叠的学生ID批次"""
+    size = env.batch_size
+    batches = itertools.cycle([env.student_ids[start:start + size]
+                               for start in range(0, max(1, len(env.student_ids) - size + 1), size)])
+    return lambda: (next(batches),)
+
+def bench_batch_get_students_db(benchmark: Benchmark, env: BenchmarkEnvironment):
+    """批量读取学生画像，缓存全部未命中（数据库流式读取并管道写回Redis）"""
+    batch = _batches(env)
+
+    def setup():
+        env.redis.flushall()
+        student_local_cache.clear()
+        return batch(), {}
+
+    benchmark.extra_info["batch_size"] = env.batch_size
+    benchmark.pedantic(env.student_repo.batch_get_students, setup=setup, rounds=env.rounds)
+
+def bench_batch_get_students_redis(benchmark: Benchmark, env: BenchmarkEnvironment):
+    """批量读取学生画像，进程内缓存未命中、Redis命中"""
+    batch = _batches(env)
+    repo = env.student_repo
+    repo.batch_get_students(env.student_ids)
+
+    def setup():
+        student_local_cache.clear()
+        return batch(), {}
+
+    benchmark.extra_info["batch_size"] = env.batch_size
+    benchmark.pedantic(repo.batch_get_students, setup=setup, rounds=env.rounds)
+
+def bench_batch_get_students_local(benchmark: Benchmark, env: BenchmarkEnvironment):
+    """批量读取学生画像，全部命中进程内缓存"""
+    batch = _batches(env)
+    repo = env.student_repo
+    repo.batch_get_students(env.student_ids)
+
+    benchmark.extra_info["batch_size"] = env.batch_size
+    benchmark.pedantic(repo.batch_get_students, setup=lambda: (batch(), {}), rounds=env.rounds)
+
+MICRO_BENCHMARKS: Dict[str, Callable[[Benchmark, BenchmarkEnvironment], None]] = {
+    "generate_path": bench_generate_path,
+    "assess_knowledge": bench_assess_knowledge,
+    "assess_knowledge_cached": bench_assess_knowledge_cached,
+    "path_sequence": bench_path_sequence,
+    "batch_get_students_db": bench_batch_get_students_db,
+    "batch_get_students_redis": bench_batch_get_students_redis,
+    "batch_get_students_local": bench_batch_get_students_local
+}
+
+def run_micro(env: BenchmarkEnvironment, names: List[str], max_time: float) -> Dict[str, Dict[str, Any]]:
+    """依次运行微基准，每个基准前清空缓存"""
+    results = {}
+    for name in names:
+        env.reset_caches()
+        benchmark = Benchmark(name, max_time=max_time)
+        MICRO_BENCHMARKS[name](benchmark, env)
+        results[name] = benchmark.stats()
+        logger.info(f"{name}: 中位数 {results[name]['median_ms']:.3f} ms ({results[name]['rounds']} 轮)")
+    return results
+
+# 负载场景：各操作及默认权重
+def _op_generate_path(env: BenchmarkEnvironment, rng: random.Random):
+    return _require(env.service.generate_path(rng.choice(env.student_ids), env.subject), "generate_path")
+
+def _op_assess_knowledge(env: BenchmarkEnvironment, rng: random.Random):
+    student = _require(env.student_repo.get_student(rng.choice(env.student_ids)), "get_student")
+    return env.service.assess_knowledge(student, env.subject)
+
+def _op_batch_get_students(env: BenchmarkEnvironment, rng: random.Random):
+    return env.student_repo.batch_get_students(rng.sample(env.student_ids, env.batch_size))
+
+LOAD_OPERATIONS = {
+    "generate_path": _op_generate_path,
+    "assess_knowledge": _op_assess_knowledge,
+    "batch_get_students": _op_batch_get_students
+}
+DEFAULT_MIX = {"generate_path": 3, "assess_knowledge": 6, "batch_get_students": 1}
+
+def run_load(env: BenchmarkEnvironment, concurrency: int, duration: float, mix: Dict[str, float],
+             warmup: float = 1.0, seed: int = 0) -> Dict[str, Any]:
+    """concurrency 个线程在 duration 秒内按 mix 权重持续发起请求（预热阶段不计入统计）"""
+    operations = [name for name in mix if mix[name] > 0]
+    weights = [mix[name] for name in operations]
+    latencies: Dict[str, List[float]] = {name: [] for name in operations}
+    errors: Dict[str, int] = {name: 0 for name in operations}
+    lock = threading.Lock()
+    start_at = time.perf_counter() + warmup
+    stop_at = start_at + duration
+
+    def worker(index: int):
+        rng = random.Random(seed * 1000 + index)
+        local_latencies = {name: [] for name in operations}
+        local_errors = {name: 0 for name in operations}
+        while True:
+            name = rng.choices(operations, weights)[0]
+            began = time.perf_counter()
+            if began >= stop_at:
+                break
+            try:
+                LOAD_OPERATIONS[name](env, rng)
+                failed = False
+            except Exception as e:
+                logger.debug(f"负载请求 {name} 失败: {str(e)}")
+                failed = True
+            if began >= start_at:
+                if failed:
+                    local_errors[name] += 1
+                else:
+                    local_latencies[name].append(time.perf_counter() - began)
+        with lock:
+            for name in operations:
+                latencies[name].extend(local_latencies[name])
+                errors[name] += local_errors[name]
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench-load") as executor:
+        list(executor.map(worker, range(concurrency)))
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    overall = summarize(all_latencies)
+    return {
+        "concurrency": concurrency,
+        "duration_s": duration,
+        "mix": mix,
+        "requests": len(all_latencies),
+        "errors": sum(errors.values()),
+        "throughput": len(all_latencies) / duration,
+        "p50_ms": overall.get("median_ms"),
+        "p95_ms": overall.get("p95_ms"),
+        "p99_ms": overall.get("p99_ms"),
+        "operations": {
+            name: {**summarize(latencies[name]), "errors": errors[name], "throughput": len(latencies[name]) / duration}
+            for name in operations
+        }
+    }
+
+def _parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in LOAD_OPERATIONS:
+            raise argparse.ArgumentTypeError(f"未知的负载操作: {name}（可选: {', '.join(LOAD_OPERATIONS)}）")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+def _print_results(benchmarks: Dict[str, Dict[str, Any]], load: Optional[Dict[str, Any]]):
+    if benchmarks:
+        print(f"{'基准':<28}{'轮数':>8}{'中位数ms':>12}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>12}")
+        for name, stats in benchmarks.items():
+            print(f"{name:<28}{stats['rounds']:>8}{stats['median_ms']:>12.3f}{stats['p95_ms']:>10.3f}"
+                  f"{stats['p99_ms']:>10.3f}{stats['ops']:>12.1f}")
+    if load:
+        print(f"\n负载场景: 并发 {load['concurrency']}，{load['duration_s']}s，请求 {load['requests']}，"
+              f"错误 {load['errors']}，吞吐量 {load['throughput']:.1f} req/s")
+        print(f"{'操作':<28}{'请求数':>8}{'p50 ms':>12}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>12}")
+        for name, stats in load["operations"].items():
+            if stats["rounds"]:
+                print(f"{name:<28}{stats['rounds']:>8}{stats['median_ms']:>12.3f}{stats['p95_ms']:>10.3f}"
+                      f"{stats['p99_ms']:>10.3f}{stats['throughput']:>12.1f}")
+        print(f"{'总计':<28}{load['requests']:>8}{load['p50_ms'] or 0:>12.3f}{load['p95_ms'] or 0:>10.3f}"
+              f"{load['p99_ms'] or 0:>10.3f}{load['throughput']:>12.1f}")
+
+def run(args) -> int:
+    env = BenchmarkEnvironment(
+        subject=args.subject, students=args.students, nodes=args.nodes, records=args.records,
+        max_prerequisites=args.max_prerequisites, db_latency=args.db_latency_ms / 1000.0,
+        redis_latency=args.redis_latency_ms / 1000.0, graph_latency=args.graph_latency_ms / 1000.0,
+        batch_size=args.batch_size, seed=args.seed
+    ).install()
+
+    names = args.only.split(",") if args.only else list(MICRO_BENCHMARKS)
+    unknown = [name for name in names if name not in MICRO_BENCHMARKS]
+    if unknown:
+        print(f"未知的基准: {', '.join(unknown)}（可选: {', '.join(MICRO_BENCHMARKS)}）", file=sys.stderr)
+        return 2
+
+    benchmarks = run_micro(env, names, args.max_time) if names != ["none"] else {}
+    load = None
+    if args.duration > 0:
+        env.reset_caches()
+        load = run_load(env, args.concurrency, args.duration, args.mix, warmup=args.warmup, seed=args.seed)
+
+    params = {
+        key: value for key, value in vars(args).items() if key not in ("command", "func", "output")
+    }
+    params["round_trips"] = env.round_trips()
+    output = args.output or f"benchmarks/results/e2e-{(machine_info()['commit'] or 'local')[:12]}.json"
+    save_results(output, params, benchmarks, load)
+    _print_results(benchmarks, load)
+    print(f"\n结果已保存: {output}")
+    return 0
+
+def compare(args) -> int:
+    baseline, current = load_results(args.baseline), load_results(args.current)
+    if baseline.get("params", {}).get("students") != current.get("params", {}).get("students") or \
+            baseline.get("params", {}).get("nodes") != current.get("params", {}).get("nodes"):
+        print("警告: 两次结果的数据规模不同，比较结果仅供参考", file=sys.stderr)
+
+    rows = compare_results(baseline, current, args.threshold)
+    print(f"{(baseline['machine'].get('commit') or '?')[:12]} -> {(current['machine'].get('commit') or '?')[:12]}")
+    print(f"{'基准':<36}{'指标':<12}{'基线':>12}{'当前':>12}{'变化':>10}")
+    for row in rows:
+        flag = "  回归" if row["regression"] else ""
+        print(f"{row['name']:<36}{row['metric']:<12}{row['baseline']:>12.3f}{row['current']:>12.3f}"
+              f"{row['change']:>+10.1%}{flag}")
+    return 1 if any(row["regression"] for row in rows) else 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="学习路径服务端到端基准测试")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="运行微基准和负载场景并保存结果")
+    run_parser.add_argument("--subject", default="math")
+    run_parser.add_argument("--students", type=int, default=1000, help="合成学生数")
+    run_parser.add_argument("--nodes", type=int, default=500, help="知识图谱节点数")
+    run_parser.add_argument("--max-prerequisites", type=int, default=3, help="每个知识点的最多前置知识点数")
+    run_parser.add_argument("--records", type=int, default=50, help="每个学生的平均答题记录数")
+    run_parser.add_argument("--batch-size", type=int, default=100, help="batch_get_students 每次读取的学生数")
+    run_parser.add_argument("--db-latency-ms", type=float, default=0.0, help="模拟的数据库单次往返耗时")
+    run_parser.add_argument("--redis-latency-ms", type=float, default=0.0, help="模拟的Redis单次往返耗时")
+    run_parser.add_argument("--graph-latency-ms", type=float, default=0.0, help="模拟的图数据库单次往返耗时")
+    run_parser.add_argument("--only", default="", help="只运行指定微基准（逗号分隔，none 表示不运行）")
+    run_parser.add_argument("--max-time", type=float, default=2.0, help="每个微基准的最长计时秒数")
+    run_parser.add_argument("--concurrency", type=int, default=8, help="负载场景并发线程数")
+    run_parser.add_argument("--duration", type=float, default=10.0, help="负载场景持续秒数，0 表示不运行")
+    run_parser.add_argument("--warmup", type=float, default=1.0, help="负载场景预热秒数")
+    run_parser.add_argument("--mix", type=_parse_mix, default=DEFAULT_MIX,
+                            help="负载操作权重，例: generate_path=3,assess_knowledge=6,batch_get_students=1")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output", default="", help="结果文件路径，默认 benchmarks/results/e2e-<提交>.json")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser("compare", help="比较两次结果，存在回归时返回非零退出码")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="判定为回归的变慢比例")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+"""基准测试用的进程内依赖替身
+
+- FakeRedis：基于 fakeredis 的内存Redis（见 requirements-dev.txt），统计往返次数
+- FakeDBConnector：与 DBConnector 接口一致，解释 StudentRepository 发出的SQL
+- InMemoryKnowledgeRepository：基于 networkx 图的知识图谱仓库，替代Neo4j
+- InMemoryRecordRepository / InMemoryPathRepository：答题记录和学习路径仓库
+
+latency 为模拟的单次网络往返耗时（秒），默认0即只测量本进程内的计算开销。
+"""
+import json
+import time
+import threading
+from types import SimpleNamespace
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import networkx as nx
+import psycopg2.extensions
+import redis
+import fakeredis
+
+class _CountingPipeline(redis.client.Pipeline):
+    """管道：命令在客户端缓存，execute 计为一次往返"""
+
+    owner: "FakeRedis"
+
+    def execute(self, raise_on_error: bool = True) -> List[Any]:
+        self.owner._round_trip()
+        return super().execute(raise_on_error)
+
+class FakeRedis(fakeredis.FakeRedis):
+    """fakeredis 内存Redis，统计网络往返次数并可模拟往返耗时（单条命令和每次管道执行各计一次）"""
+
+    def __init__(self, latency: float = 0.0, **kwargs):
+        # 每个实例使用独立的服务端数据
+        kwargs.setdefault("server", fakeredis.FakeServer())
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.round_trips = 0
+
+    def _round_trip(self):
+        self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def execute_command(self, *args, **options):
+        self._round_trip()
+        return super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> _CountingPipeline:
+        pipe = _CountingPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+        pipe.owner = self
+        return pipe
+
+class FakeDatabase:
+    """内存中的 students 表，行按 STUDENT_COLUMNS 顺序保存"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.round_trips = 0
+        self.students: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def _round_trip(self):
+        self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def insert_student(self, student):
+        """写入学生画像（JSONB列保存为已解码的对象）"""
+        with self._lock:
+            self.students[student.id] = [
+                student.id, student.name, student.grade_level, student.learning_style.value,
+                student.cognitive_style, dict(student.knowledge_state), student.learning_history,
+                student.preferences, student.emotional_state, student.learning_goals, student.available_time
+            ]
+
+class FakeCursor:
+    """解释 StudentRepository 发出的SQL，遇到不支持的语句时报错而不是静默忽略"""
+
+    def __init__(self, connection: "FakeConnection", name: Optional[str] = None):
+        self.connection = connection
+        self.database = connection.database
+        self.name = name
+        self.itersize = 2000
+        self.rows: List[tuple] = []
+        self.values: List[tuple] = []  # execute_values 经 mogrify 传入的参数行
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.rows = []
+
+    def mogrify(self, template, args) -> bytes:
+        # execute_values 将各行经 mogrify 拼入SQL，这里直接保存参数，执行时使用
+        self.values.append(tuple(args))
+        return b"(%s)"
+
+    def execute(self, sql, params: Optional[tuple] = None):
+        if isinstance(sql, bytes):
+            sql = sql.decode("utf-8")
+        statement = " ".join(sql.split())
+        database = self.database
+        if statement.startswith("PREPARE "):
+            return
+        database._round_trip()
+        with database._lock:
+            if statement.startswith("EXECUTE student_select"):
+                row = database.students.get(params[0])
+                self.rows = [tuple(row)] if row else []
+            elif statement.startswith("EXECUTE student_update"):
+                row = database.students.get(params[-1])
+                if row:
+                    row[1:] = [json.loads(value) if index in (4, 5, 6, 7, 8) else value
+                               for index, value in enumerate(params[:-1])]
+                self.rows = []
+            elif statement.startswith("SELECT") and "FROM students WHERE id = ANY(%s)" in statement:
+                self.rows = [tuple(database.students[sid]) for sid in params[0] if sid in database.students]
+            elif statement.startswith("UPDATE students SET knowledge_state") and self.values:
+                for student_id, delta in self.values:
+                    row = database.students.get(student_id)
+                    if row:
+                        row[5] = {**(row[5] or {}), **json.loads(delta)}
+                self.values = []
+                self.rows = []
+            else:
+                raise NotImplementedError(f"数据库替身不支持的语句: {statement[:80]}")
+
+    def fetchone(self) -> Optional[tuple]:
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchall(self) -> List[tuple]:
+        rows, self.rows = self.rows, []
+        return rows
+
+    def __iter__(self):
+        # 服务端游标每 itersize 行一次往返
+        for index, row in enumerate(self.rows):
+            if index and index % self.itersize == 0:
+                self.database._round_trip()
+            yield row
+        self.rows = []
+
+class FakeConnection:
+    """psycopg2 连接替身"""
+
+    encoding = "UTF8"
+
+    def __init__(self, database: FakeDatabase):
+        self.database = database
+        self.autocommit = False
+        self.closed = 0
+        self.info = SimpleNamespace(transaction_status=psycopg2.extensions.TRANSACTION_STATUS_IDLE)
+
+    def cursor(self, name: Optional[str] = None) -> FakeCursor:
+        return FakeCursor(self, name)
+
+    def commit(self):
+        self.database._round_trip()
+
+    def rollback(self):
+        self.database._round_trip()
+
+class FakeDBConnector:
+    """DBConnector 替身：无连接池，每次借出一个新的连接对象"""
+
+    def __init__(self, database: FakeDatabase):
+        self.database = database
+        self.breaker = None
+        self.connections = 0
+
+    @contextmanager
+    def get_connection(self, read_only: bool = False, autocommit: Optional[bool] = None):
+        self.connections += 1
+        conn = FakeConnection(self.database)
+        conn.autocommit = read_only if autocommit is None else autocommit
+        yield conn
+        if not conn.autocommit:
+            conn.commit()
+
+    def close(self):
+        pass
+
+class InMemoryKnowledgeRepository:
+    """知识图谱仓库替身（代替Neo4j），按学科保存 networkx 图，节点属性中带特征向量和知识点对象"""
+
+    def __init__(self, graphs: Dict[str, nx.DiGraph], latency: float = 0.0):
+        self.graphs = graphs
+        self.latency = latency
+        self.round_trips = 0
+        self.nodes: Dict[str, Any] = {
+            node_id: attrs["node"] for graph in graphs.values() for node_id, attrs in graph.nodes(data=True)
+        }
+        self.features: Dict[str, Any] = {
+            node_id: attrs["features"] for graph in graphs.values() for node_id, attrs in graph.nodes(data=True)
+        }
+
+    def _round_trip(self):
+        self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_knowledge_node_ids_by_subject(self, subject: str) -> List[str]:
+        self._round_trip()
+        graph = self.graphs.get(subject)
+        return list(graph.nodes) if graph is not None else []
+
+    def get_node_features(self, node_id: str):
+        self._round_trip()
+        return self.features[node_id]
+
+    def get_subject_node_features(self, subject: str) -> List[Tuple[str, Any]]:
+        self._round_trip()
+        graph = self.graphs.get(subject)
+        return [(node_id, self.features[node_id]) for node_id in graph.nodes] if graph is not None else []
+
+    def get_knowledge_subgraph(self, subject: str) -> nx.DiGraph:
+        self._round_trip()
+        graph = self.graphs.get(subject)
+        return nx.DiGraph(graph) if graph is not None else nx.DiGraph()
+
+    def get_knowledge_nodes(self, node_ids: Iterable[str]) -> List[Any]:
+        self._round_trip()
+        return [self.nodes[node_id] for node_id in node_ids if node_id in self.nodes]
+
+class InMemoryRecordRepository:
+    """学习记录仓库替身，histories 为 {(学生ID, 学科): (答题记录列表, 学习行为)}"""
+
+    def __init__(self, histories: Dict[Tuple[str, str], Tuple[List[Dict[str, Any]], Dict[str, Any]]],
+                 latency: float = 0.0):
+        self.histories = histories
+        self.latency = latency
+        self.round_trips = 0
+
+    def _round_trip(self):
+        self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_student_answer_records(self, student_id: str, subject: str) -> List[Dict[str, Any]]:
+        self._round_trip()
+        return self.histories.get((student_id, subject), ([], {}))[0]
+
+    def get_student_learning_behavior(self, student_id: str, subject: str) -> Dict[str, Any]:
+        self._round_trip()
+        return self.histories.get((student_id, subject), ([], {}))[1]
+
+class InMemoryPathRepository:
+    """学习路径仓库替身，只保存每个学生每个学科的最新路径"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.round_trips = 0
+        self.paths: Dict[Tuple[str, str], Any] = {}
+        self._lock = threading.Lock()
+
+    def _round_trip(self):
+        self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def save_learning_path(self, learning_path) -> bool:
+        self._round_trip()
+        with self._lock:
+            self.paths[(learning_path.student_id, learning_path.subject)] = learning_path
+        return True
+
+    def save_learning_paths(self, learning_paths: List[Any]) -> bool:
+        self._round_trip()
+        with self._lock:
+            for learning_path in learning_paths:
+                self.paths[(learning_path.student_id, learning_path.subject)] = learning_path
+        return True
+
+    def get_latest_learning_path(self, student_id: str, subject: str):
+        self._round_trip()
+        return self.paths.get((student_id, subject))
+
+    def update_learning_path(self, learning_path, added: List[str] = None, removed: List[str] = None) -> bool:
+        return self.save_learning_path(learning_path)
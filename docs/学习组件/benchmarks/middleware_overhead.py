@@ -0,0 +1,75 @@
+"""中间件单请求开销微基准
+
+对比三种中间件栈处理同一个最简端点时的单请求耗时：
+- bare：不加中间件
+- base_http：三层 BaseHTTPMiddleware 透传（原实现的调用结构）
+- asgi：api.middlewares 中的原生ASGI请求ID、限流、熔断中间件
+
+直接以ASGI协议调用应用，不经过网络和HTTP解析: python -m benchmarks.middleware_overhead
+"""
+import time
+import asyncio
+import argparse
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from api.middlewares import RequestIdMiddleware, RateLimitMiddleware, CircuitBreakerMiddleware
+from api.rate_limit import RateLimiter
+from data.circuit_breaker import BreakerRegistry
+
+async def endpoint(request):
+    return PlainTextResponse("ok")
+
+class PassthroughMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        return await call_next(request)
+
+def build_app(stack: str) -> Starlette:
+    app = Starlette(routes=[Route("/api/v1/ping", endpoint)])
+    if stack == "base_http":
+        for _ in range(3):
+            app.add_middleware(PassthroughMiddleware)
+    elif stack == "asgi":
+        app.add_middleware(CircuitBreakerMiddleware, registry=BreakerRegistry())
+        app.add_middleware(RateLimitMiddleware, rate_limiter=RateLimiter("100000000/minute"))
+        app.add_middleware(RequestIdMiddleware)
+    return app
+
+async def run(app: Starlette, requests: int) -> float:
+    """顺序发送请求，返回平均单请求耗时（微秒）"""
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    def scope():
+        return {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/api/v1/ping", "raw_path": b"/api/v1/ping", "query_string": b"",
+            "root_path": "", "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 50000),
+            "server": ("bench", 80), "app": app
+        }
+
+    # 预热：构建中间件栈
+    for _ in range(100):
+        await app(scope(), receive, send)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(scope(), receive, send)
+    return (time.perf_counter() - start) / requests * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="中间件单请求开销微基准")
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    results = {stack: asyncio.run(run(build_app(stack), args.requests)) for stack in ("bare", "base_http", "asgi")}
+    for stack, micros in results.items():
+        overhead = micros - results["bare"]
+        print(f"{stack:<10} {micros:8.1f} us/请求   中间件开销 {overhead:8.1f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""基准测试计时、统计和结果文件
+
+Benchmark 的调用方式与 pytest-benchmark 的 benchmark fixture 一致（benchmark(func, *args)、
+benchmark.pedantic(...)），基准函数可以不加修改地放到 pytest-benchmark 下运行。
+结果保存为JSON，compare_results 按中位数（微基准）和p95（负载场景）比较两次结果。
+"""
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import numpy as np
+
+RESULTS_FORMAT_VERSION = 1
+
+def summarize(durations: Sequence[float]) -> Dict[str, float]:
+    """耗时序列（秒）的统计摘要，时间单位为毫秒"""
+    values = np.asarray(durations, dtype=np.float64) * 1000.0
+    if not len(values):
+        return {"rounds": 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "rounds": int(len(values)),
+        "min_ms": float(values.min()),
+        "max_ms": float(values.max()),
+        "mean_ms": float(values.mean()),
+        "stddev_ms": float(values.std(ddof=1)) if len(values) > 1 else 0.0,
+        "median_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "ops": float(1000.0 / values.mean()) if values.mean() > 0 else 0.0
+    }
+
+class Benchmark:
+    """单个微基准的计时器
+
+    在 max_time 秒内重复调用，至少 min_rounds 次、至多 max_rounds 次；
+    预热调用不计入统计。
+    """
+
+    def __init__(self, name: str, min_rounds: int = 5, max_rounds: int = 1000, max_time: float = 2.0,
+                 warmup_rounds: int = 1):
+        self.name = name
+        self.min_rounds = min_rounds
+        self.max_rounds = max_rounds
+        self.max_time = max_time
+        self.warmup_rounds = warmup_rounds
+        self.durations: List[float] = []
+        self.extra_info: Dict[str, Any] = {}
+
+    def __call__(self, func: Callable, *args, **kwargs) -> Any:
+        """重复调用 func(*args, **kwargs)，返回最后一次调用的结果"""
+        return self.pedantic(func, args=args, kwargs=kwargs, warmup_rounds=self.warmup_rounds)
+
+    def pedantic(self, func: Callable, args: tuple = (), kwargs: Optional[dict] = None,
+                 setup: Optional[Callable[[], Any]] = None, rounds: Optional[int] = None,
+                 iterations: int = 1, warmup_rounds: int = 0) -> Any:
+        """精确控制的计时：每轮先调用 setup（不计时，可返回 (args, kwargs)），再调用 iterations 次"""
+        kwargs = kwargs or {}
+        result = None
+        for _ in range(warmup_rounds):
+            call_args, call_kwargs = self._setup(setup, args, kwargs)
+            result = func(*call_args, **call_kwargs)
+
+        deadline = time.perf_counter() + self.max_time
+        round_limit = rounds or self.max_rounds
+        while len(self.durations) < round_limit:
+            call_args, call_kwargs = self._setup(setup, args, kwargs)
+            start = time.perf_counter()
+            for _ in range(iterations):
+                result = func(*call_args, **call_kwargs)
+            self.durations.append((time.perf_counter() - start) / iterations)
+            if rounds is None and len(self.durations) >= self.min_rounds and time.perf_counter() > deadline:
+                break
+        return result
+
+    @staticmethod
+    def _setup(setup, args: tuple, kwargs: dict):
+        if setup is None:
+            return args, kwargs
+        prepared = setup()
+        return prepared if prepared is not None else (args, kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**summarize(self.durations), **({"extra_info": self.extra_info} if self.extra_info else {})}
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, timeout=10,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def machine_info() -> Dict[str, Any]:
+    """运行环境和代码版本，用于判断两次结果是否可比"""
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+def save_results(path: str, params: Dict[str, Any], benchmarks: Dict[str, Dict[str, Any]],
+                 load: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """保存结果文件"""
+    results = {
+        "format_version": RESULTS_FORMAT_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "machine": machine_info(),
+        "params": params,
+        "benchmarks": benchmarks,
+        "load": load
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return results
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        results = json.load(f)
+    if results.get("format_version") != RESULTS_FORMAT_VERSION:
+        raise ValueError(f"不支持的结果文件格式版本: {results.get('format_version')} ({path})")
+    return results
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any],
+                    threshold: float = 0.1) -> List[Dict[str, Any]]:
+    """比较两次结果，返回各指标的变化；变慢超过 threshold 比例的标记为回归"""
+    rows = []
+
+    def add(name: str, metric: str, before: Optional[float], after: Optional[float], higher_is_better: bool = False):
+        if not before or after is None:
+            return
+        change = (after - before) / before
+        regression = -change > threshold if higher_is_better else change > threshold
+        rows.append({
+            "name": name, "metric": metric, "baseline": before, "current": after,
+            "change": change, "regression": regression
+        })
+
+    for name, stats in current.get("benchmarks", {}).items():
+        add(name, "median_ms", baseline.get("benchmarks", {}).get(name, {}).get("median_ms"), stats.get("median_ms"))
+
+    base_load, load = baseline.get("load") or {}, current.get("load") or {}
+    for name, stats in (load.get("operations") or {}).items():
+        add(f"load:{name}", "p95_ms", (base_load.get("operations") or {}).get(name, {}).get("p95_ms"), stats.get("p95_ms"))
+    if base_load and load:
+        add("load", "throughput", base_load.get("throughput"), load.get("throughput"), higher_is_better=True)
+        add("load", "p99_ms", base_load.get("p99_ms"), load.get("p99_ms"))
+    return rows
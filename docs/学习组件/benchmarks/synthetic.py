@@ -0,0 +1,137 @@
+"""基准测试合成数据：知识图谱、学生画像、答题历史和随机权重的知识评估模型
+
+所有生成函数都接收 seed，相同参数生成的数据完全一致，便于跨提交比较。
+"""
+import numpy as np
+import networkx as nx
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Sequence, Tuple
+from models import StudentProfile, LearningStyle, KnowledgeNode
+from models.lite import LiteModel, LITE_FORMAT_VERSION
+
+# 与 ModelManager._create_model("knowledge_assessment") 的输入一致：答题特征 + 行为特征 + 节点特征
+ANSWER_FEATURE_DIM = 30
+BEHAVIOR_FEATURE_DIM = 15
+NODE_FEATURE_DIM = 50
+
+def make_knowledge_node(node_id: str, subject: str, difficulty: float, estimated_time: int,
+                        prerequisites: List[str]) -> KnowledgeNode:
+    """构造知识点对象"""
+    return KnowledgeNode(
+        id=node_id,
+        name=f"知识点 {node_id}",
+        subject=subject,
+        difficulty=difficulty,
+        estimated_time=estimated_time,
+        prerequisites=prerequisites
+    )
+
+def generate_knowledge_graph(subject: str, node_count: int, max_prerequisites: int = 3,
+                             seed: int = 0) -> nx.DiGraph:
+    """生成学科知识图谱（有向无环图，边由前置知识点指向后续知识点）
+
+    每个节点从排在它之前的节点中随机选择 0..max_prerequisites 个前置知识点，
+    偏向选择相邻节点，使图谱呈现章节式的局部依赖。
+    """
+    rng = np.random.default_rng(seed)
+    graph = nx.DiGraph()
+    node_ids = [f"{subject}-k{i:05d}" for i in range(node_count)]
+    for i, node_id in enumerate(node_ids):
+        prerequisites = []
+        if i:
+            count = int(rng.integers(0, min(max_prerequisites, i) + 1))
+            window = min(i, 20)
+            offsets = rng.choice(window, size=min(count, window), replace=False) + 1
+            prerequisites = [node_ids[i - int(offset)] for offset in offsets]
+        difficulty = round(float(rng.uniform(0.1, 1.0)), 2)
+        graph.add_node(
+            node_id,
+            features=rng.standard_normal(NODE_FEATURE_DIM).astype(np.float32).tolist(),
+            node=make_knowledge_node(node_id, subject, difficulty, int(rng.integers(5, 60)), prerequisites)
+        )
+        graph.add_edges_from((prerequisite, node_id) for prerequisite in prerequisites)
+    return graph
+
+def generate_students(count: int, node_ids: Sequence[str], known_ratio: float = 0.3,
+                      seed: int = 0) -> List[StudentProfile]:
+    """生成学生画像，每个学生已有约 known_ratio 比例知识点的掌握度"""
+    rng = np.random.default_rng(seed)
+    styles = list(LearningStyle)
+    students = []
+    for i in range(count):
+        known = rng.random(len(node_ids)) < known_ratio
+        mastery = rng.uniform(0.0, 1.0, size=len(node_ids))
+        students.append(StudentProfile(
+            id=f"student-{i:07d}",
+            name=f"学生{i}",
+            grade_level=int(rng.integers(1, 7)),
+            learning_style=styles[int(rng.integers(len(styles)))],
+            cognitive_style=str(rng.choice(["analytical", "holistic"])),
+            knowledge_state={
+                node_id: round(float(value), 4) for node_id, value, flag in zip(node_ids, mastery, known) if flag
+            },
+            learning_history=[],
+            preferences={"session_length": int(rng.integers(15, 60))},
+            emotional_state={"frustration": round(float(rng.random()), 2), "engagement": round(float(rng.random()), 2)},
+            learning_goals=[],
+            available_time=int(rng.integers(30, 180))
+        ))
+    return students
+
+def generate_answer_history(students: Sequence[StudentProfile], subject: str, node_ids: Sequence[str],
+                            records_per_student: int = 50, seed: int = 0
+                            ) -> Dict[Tuple[str, str], Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+    """生成答题记录和学习行为，返回 {(学生ID, 学科): (答题记录列表, 学习行为)}"""
+    rng = np.random.default_rng(seed)
+    start = datetime(2024, 1, 1)
+    histories = {}
+    for student in students:
+        count = int(rng.poisson(records_per_student))
+        picks = rng.integers(0, len(node_ids), size=count)
+        correct = rng.random(count)
+        records = [
+            {
+                "question_id": f"q-{int(rng.integers(1 << 30))}",
+                "knowledge_node_id": node_ids[int(pick)],
+                "is_correct": bool(correct[index] < student.knowledge_state.get(node_ids[int(pick)], 0.5)),
+                "time_spent": int(rng.integers(10, 600)),
+                "difficulty": round(float(rng.uniform(0.1, 1.0)), 2),
+                "answered_at": (start + timedelta(minutes=int(rng.integers(0, 525600)))).isoformat()
+            }
+            for index, pick in enumerate(picks)
+        ]
+        behavior = {
+            "total_study_time": int(rng.integers(0, 20000)),
+            "session_count": int(rng.integers(0, 300)),
+            "avg_session_length": round(float(rng.uniform(5, 90)), 1),
+            "video_watch_ratio": round(float(rng.random()), 2),
+            "exercise_completion_rate": round(float(rng.random()), 2),
+            "hint_usage_rate": round(float(rng.random()), 2),
+            "review_frequency": round(float(rng.random()), 2)
+        }
+        histories[(student.id, subject)] = (records, behavior)
+    return histories
+
+def build_assessment_model(hidden: Sequence[int] = (64, 32), seed: int = 0) -> LiteModel:
+    """构造与知识评估模型结构相同、权重随机的NumPy推理模型，无需TensorFlow和模型文件"""
+    rng = np.random.default_rng(seed)
+    input_dim = ANSWER_FEATURE_DIM + BEHAVIOR_FEATURE_DIM + NODE_FEATURE_DIM
+    layers = [{"name": "combined_features", "type": "InputLayer", "inbound": [], "shape": [input_dim]}]
+    arrays = {}
+    previous, width = "combined_features", input_dim
+    for index, units in enumerate([*hidden, 1]):
+        name = "mastery_level" if index == len(hidden) else f"dense_{index}"
+        layers.append({
+            "name": name, "type": "Dense", "inbound": [previous],
+            "activation": "sigmoid" if name == "mastery_level" else "relu", "use_bias": True
+        })
+        arrays[f"{name}/kernel"] = (rng.standard_normal((width, units)) / np.sqrt(width)).astype(np.float32)
+        arrays[f"{name}/bias"] = np.zeros(units, dtype=np.float32)
+        previous, width = name, units
+    spec = {
+        "format_version": LITE_FORMAT_VERSION,
+        "inputs": ["combined_features"],
+        "outputs": ["mastery_level"],
+        "layers": layers
+    }
+    return LiteModel(spec, arrays)
@@ -0,0 +1,10 @@
+"""以 pytest-benchmark 运行 benchmarks.e2e 中的微基准: python -m pytest benchmarks"""
+import pytest
+
+pytest.importorskip("pytest_benchmark", reason="需要 pytest-benchmark（见 requirements-dev.txt）")
+from benchmarks.e2e import MICRO_BENCHMARKS  # noqa: E402
+
+@pytest.mark.parametrize("name", list(MICRO_BENCHMARKS))
+def test_micro_benchmark(benchmark, env, name):
+    benchmark.group = name
+    MICRO_BENCHMARKS[name](benchmark, env)
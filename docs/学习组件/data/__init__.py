@@ -1,6 +1,14 @@
+from concurrent.futures import ThreadPoolExecutor
+from config import config
 from .db_connector import DBConnector
 from .redis_client import RedisClient
 from .neo4j_client import Neo4jClient
+from .async_repository import AsyncRepository
+from .knowledge_cache import KnowledgeFeatureCache, KnowledgeGraphCache, bump_knowledge_version
+from .local_cache import LocalCache, CacheInvalidationBus
+from .write_behind import KnowledgeStateWriteBuffer
+from .lazy import LazyResource, warm_up, startup_timings
+from .circuit_breaker import BreakerRegistry, GuardedClient
 from .repositories import (
     StudentRepository,
     KnowledgeRepository,
@@ -8,13 +16,102 @@ from .repositories import (
     LearningRecordRepository
 )
 
-# 初始化客户端
-db_connector = DBConnector()
-redis_client = RedisClient()
-neo4j_client = Neo4jClient()
+# 下游依赖熔断器（postgres、redis、neo4j、model:<模型名称>）
+dependency_breakers = BreakerRegistry(
+    max_breakers=config.get("circuit_breaker.max_breakers", 1000),
+    failure_threshold=config.get("circuit_breaker.failure_threshold", 5),
+    recovery_timeout=config.get("circuit_breaker.recovery_timeout", 60)
+)
+
+def _create_redis_client() -> GuardedClient:
+    from redis.exceptions import ConnectionError, TimeoutError
+    return GuardedClient(RedisClient(), dependency_breakers.get("redis"), (ConnectionError, TimeoutError))
+
+def _create_async_redis_client():
+    """事件循环中使用的Redis客户端（redis.asyncio），用于限流等每个请求都访问Redis的中间件"""
+    import redis.asyncio
+    return redis.asyncio.Redis(
+        host=config.get("redis.host", "localhost"),
+        port=config.get_int("redis.port", 6379),
+        db=config.get_int("redis.db", 0),
+        password=config.get("redis.password"),
+        socket_timeout=config.get("redis.socket_timeout", 5),
+        max_connections=config.get("redis.max_connections", 100)
+    )
+
+def _create_neo4j_client() -> GuardedClient:
+    from neo4j.exceptions import ServiceUnavailable, SessionExpired
+    return GuardedClient(Neo4jClient(), dependency_breakers.get("neo4j"), (ServiceUnavailable, SessionExpired))
+
+# 客户端、仓库和后台线程均在首次使用时初始化，导入本模块不建立任何连接
+db_connector = LazyResource("db_connector", lambda: DBConnector(breaker=dependency_breakers.get("postgres")))
+redis_client = LazyResource("redis_client", _create_redis_client)
+async_redis_client = LazyResource("async_redis_client", _create_async_redis_client)
+neo4j_client = LazyResource("neo4j_client", _create_neo4j_client)
+
+# 进程内缓存层及跨进程失效通知
+def _create_invalidation_bus() -> CacheInvalidationBus:
+    bus = CacheInvalidationBus(redis_client)
+    bus.start()
+    return bus
+
+cache_invalidation_bus = LazyResource("cache_invalidation_bus", _create_invalidation_bus)
+student_local_cache = LocalCache(
+    max_entries=config.get("redis.local_cache.max_entries", 10000),
+    max_bytes=config.get("redis.local_cache.max_bytes", 256 * 1024 * 1024),
+    ttl=config.get("redis.local_cache.ttl", 30)
+)
 
 # 初始化仓库
-student_repo = StudentRepository(db_connector, redis_client)
-knowledge_repo = KnowledgeRepository(neo4j_client, redis_client)
-path_repo = LearningPathRepository(db_connector, redis_client)
-record_repo = LearningRecordRepository(db_connector, redis_client)
+student_repo = LazyResource("student_repo", lambda: StudentRepository(
+    db_connector,
+    redis_client,
+    local_cache=student_local_cache,
+    invalidation_bus=cache_invalidation_bus,
+    write_buffer=knowledge_state_buffer
+))
+knowledge_repo = LazyResource("knowledge_repo", lambda: KnowledgeRepository(neo4j_client, redis_client))
+path_repo = LazyResource("path_repo", lambda: LearningPathRepository(db_connector, redis_client))
+record_repo = LazyResource("record_repo", lambda: LearningRecordRepository(db_connector, redis_client))
+
+# 知识状态写回缓冲
+def _create_knowledge_state_buffer() -> KnowledgeStateWriteBuffer:
+    buffer = KnowledgeStateWriteBuffer(
+        student_repo,
+        flush_interval=config.get("database.write_behind.flush_interval", 2.0),
+        max_pending=config.get("database.write_behind.max_pending", 5000),
+        max_retries=config.get("database.write_behind.max_retries", 5),
+        redis_client=redis_client
+    )
+    buffer.start()
+    return buffer
+
+knowledge_state_buffer = LazyResource("knowledge_state_buffer", _create_knowledge_state_buffer)
+
+# 进程内知识点特征矩阵和编译知识图谱缓存
+knowledge_feature_cache = KnowledgeFeatureCache(knowledge_repo, redis_client)
+knowledge_graph_cache = KnowledgeGraphCache(knowledge_repo, redis_client)
+
+def invalidate_knowledge(subject: str) -> int:
+    """知识图谱内容变更后调用：递增学科版本号（所有进程在下次检查时重新加载），并立即清除本进程缓存"""
+    version = bump_knowledge_version(redis_client, subject)
+    knowledge_feature_cache.invalidate(subject)
+    knowledge_graph_cache.invalidate(subject)
+    return version
+
+# 异步仓库（阻塞IO在有界线程池中执行）
+io_executor = ThreadPoolExecutor(
+    max_workers=config.get("database.io_workers", 32),
+    thread_name_prefix="data-io"
+)
+async_student_repo = AsyncRepository(student_repo, io_executor)
+async_knowledge_repo = AsyncRepository(knowledge_repo, io_executor)
+async_path_repo = AsyncRepository(path_repo, io_executor)
+async_record_repo = AsyncRepository(record_repo, io_executor)
+
+def warm_up_data():
+    """预先建立数据库、缓存和图数据库连接（可在应用启动时调用）"""
+    warm_up(
+        db_connector, redis_client, neo4j_client, cache_invalidation_bus,
+        student_repo, knowledge_repo, path_repo, record_repo, knowledge_state_buffer
+    )
@@ -0,0 +1,34 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import Executor
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+class AsyncRepository:
+    """同步仓库的异步包装，阻塞的数据库/缓存调用在有界线程池中执行，不占用事件循环"""
+
+    def __init__(self, repository, executor: Executor):
+        self.repository = repository
+        self.executor = executor
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.repository, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            # 调用时再取方法：LazyResource.override 替换实例后，调用转到新实例
+            return getattr(self.repository, name)(*args, **kwargs)
+
+        @functools.wraps(attr)
+        async def wrapper(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, functools.partial(call, *args, **kwargs)
+            )
+
+        # 缓存包装函数，避免每次调用重新创建
+        self.__dict__[name] = wrapper
+        return wrapper
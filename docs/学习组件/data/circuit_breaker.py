@@ -0,0 +1,227 @@
+import time
+import logging
+import functools
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Tuple, Type
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# 熔断器监控指标（由 /metrics 统一导出）
+BREAKER_STATE = Gauge("circuit_breaker_state", "熔断器状态：0关闭，1半开，2打开", ["breaker"])
+BREAKER_FAILURES = Counter("circuit_breaker_failures_total", "熔断器记录的失败次数", ["breaker"])
+BREAKER_REJECTIONS = Counter("circuit_breaker_rejections_total", "熔断器打开时被快速拒绝的调用次数", ["breaker"])
+
+class CircuitOpenError(Exception):
+    """熔断器打开，调用被快速拒绝"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"熔断器 {name} 已打开")
+        self.name = name
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """熔断器
+
+    连续失败 failure_threshold 次后打开，recovery_timeout 秒内的调用直接拒绝；
+    超时后进入半开状态，只放行一个探测调用，成功则关闭，失败则重新打开；
+    探测调用超过 recovery_timeout 仍未结束时允许新的探测。
+    状态判断只在锁内做计数，不跨越IO或 await，同步代码和协程均可使用。
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 60):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False  # 半开状态下是否已有探测调用在进行
+        self.probe_started = 0.0
+        self._lock = threading.Lock()
+        BREAKER_STATE.labels(name).set(STATE_VALUES[CLOSED])
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning(f"熔断器 {self.name} 状态: {self.state} -> {state}")
+            self.state = state
+            BREAKER_STATE.labels(self.name).set(STATE_VALUES[state])
+
+    def before_call(self):
+        """调用前检查，熔断器打开时抛出 CircuitOpenError"""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            now = time.monotonic()
+            elapsed = now - self.opened_at
+            if self.state == OPEN and elapsed >= self.recovery_timeout:
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN and (not self.probing or now - self.probe_started > self.recovery_timeout):
+                self.probing = True
+                self.probe_started = now
+                return
+        BREAKER_REJECTIONS.labels(self.name).inc()
+        raise CircuitOpenError(self.name, max(0.0, self.recovery_timeout - elapsed))
+
+    def record_success(self):
+        """记录成功调用"""
+        if self.state == CLOSED and not self.failures:
+            return
+        with self._lock:
+            self.failures = 0
+            self.probing = False
+            self._set_state(CLOSED)
+
+    def record_failure(self):
+        """记录失败调用"""
+        BREAKER_FAILURES.labels(self.name).inc()
+        with self._lock:
+            self.failures += 1
+            self.probing = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    def release(self):
+        """调用被取消、未得出结果时释放探测名额"""
+        with self._lock:
+            self.probing = False
+
+    def call(self, func: Callable, *args, failure_exceptions: Tuple[Type[BaseException], ...] = (Exception,),
+             **kwargs) -> Any:
+        """在熔断器保护下执行同步调用"""
+        self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except failure_exceptions:
+            self.record_failure()
+            raise
+        except BaseException:
+            # 不计为失败的异常（如业务错误）同样结束本次探测
+            self.record_success()
+            raise
+        self.record_success()
+        return result
+
+class BreakerRegistry:
+    """有界熔断器注册表，超出容量时淘汰最久未使用的熔断器"""
+
+    def __init__(self, max_breakers: int = 1000, failure_threshold: int = 5, recovery_timeout: float = 60):
+        self.max_breakers = max_breakers
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.breakers: "OrderedDict[str, CircuitBreaker]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        """获取熔断器，不存在时创建"""
+        breaker = self.breakers.get(name)
+        if breaker is not None:
+            try:
+                self.breakers.move_to_end(name)
+            except KeyError:
+                pass  # 已被其他线程淘汰
+            return breaker
+        with self._lock:
+            breaker = self.breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(name, self.failure_threshold, self.recovery_timeout)
+                self.breakers[name] = breaker
+                while len(self.breakers) > self.max_breakers:
+                    self._evict()
+            return breaker
+
+    def _evict(self):
+        # 优先淘汰最久未使用的关闭状态熔断器，保留正在熔断的状态
+        victim = next((name for name, b in self.breakers.items() if b.state == CLOSED), None)
+        if victim is None:
+            victim = next(iter(self.breakers))
+        del self.breakers[victim]
+        for metric in (BREAKER_STATE, BREAKER_FAILURES, BREAKER_REJECTIONS):
+            try:
+                metric.remove(victim)
+            except KeyError:
+                pass
+
+    def states(self) -> dict:
+        """各熔断器当前状态"""
+        return {name: breaker.state for name, breaker in self.breakers.items()}
+
+class GuardedObject:
+    """客户端工厂方法返回的对象（如Redis管道、脚本），只在实际访问网络的方法上加熔断保护"""
+
+    def __init__(self, target, breaker: CircuitBreaker, guarded: Tuple[str, ...],
+                 failure_exceptions: Tuple[Type[BaseException], ...] = (Exception,)):
+        self.target = target
+        self.breaker = breaker
+        self.guarded = guarded
+        self.failure_exceptions = failure_exceptions
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.target, name)
+        if name not in self.guarded:
+            return attr
+
+        @functools.wraps(attr)
+        def wrapper(*args, **kwargs):
+            return self.breaker.call(attr, *args, failure_exceptions=self.failure_exceptions, **kwargs)
+        return wrapper
+
+    def __call__(self, *args, **kwargs):
+        if "__call__" not in self.guarded:
+            return self.target(*args, **kwargs)
+        return self.breaker.call(self.target, *args, failure_exceptions=self.failure_exceptions, **kwargs)
+
+    def __enter__(self):
+        self.target.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self.target.__exit__(*exc_info)
+
+class GuardedClient:
+    """为外部依赖客户端的方法调用加上熔断保护，只有 failure_exceptions 计为失败
+
+    LOCAL_FACTORIES 中的方法只在本地创建对象、不访问网络，不经过熔断器（否则每次创建都计为成功，
+    熔断器在热路径上永远不会打开）；返回的对象只保护其执行网络请求的方法，如管道的 execute()、脚本调用。
+    """
+
+    # {工厂方法: 返回对象中需要保护的方法}；pubsub 由订阅线程自行处理断线重连，不加保护
+    LOCAL_FACTORIES = {
+        "pipeline": ("execute",),
+        "register_script": ("__call__",),
+        "pubsub": ()
+    }
+
+    def __init__(self, client, breaker: CircuitBreaker,
+                 failure_exceptions: Tuple[Type[BaseException], ...] = (Exception,)):
+        self.client = client
+        self.breaker = breaker
+        self.failure_exceptions = failure_exceptions
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+
+        if name in self.LOCAL_FACTORIES:
+            guarded = self.LOCAL_FACTORIES[name]
+
+            @functools.wraps(attr)
+            def wrapper(*args, **kwargs):
+                target = attr(*args, **kwargs)
+                if not guarded:
+                    return target
+                return GuardedObject(target, self.breaker, guarded, self.failure_exceptions)
+        else:
+            @functools.wraps(attr)
+            def wrapper(*args, **kwargs):
+                return self.breaker.call(attr, *args, failure_exceptions=self.failure_exceptions, **kwargs)
+
+        # 缓存包装函数，避免每次调用重新创建
+        self.__dict__[name] = wrapper
+        return wrapper
@@ -1,71 +1,228 @@
 import os
+import time
 import yaml
-from typing import Dict, Any
-from functools import lru_cache
+import logging
+import threading
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 只有带此前缀的环境变量参与覆盖，层级用双下划线分隔（如 LEARNING_PATH__DATABASE__POOL_SIZE=30）
+ENV_PREFIX = "LEARNING_PATH__"
+
+_MISSING = object()
+
+def _freeze(value: Any) -> Any:
+    """转换为不可变结构：dict -> MappingProxyType，list -> tuple"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+def _flatten(tree: Mapping[str, Any], prefix: str = "", flat: Dict[str, Any] = None) -> Dict[str, Any]:
+    """展开为点分路径到值的映射，中间层级同样可查询（值为只读映射）"""
+    flat = {} if flat is None else flat
+    for key, value in tree.items():
+        path = f"{prefix}{key}"
+        flat[path] = _freeze(value)
+        if isinstance(value, dict):
+            _flatten(value, path + ".", flat)
+    return flat
+
+_TRUE_VALUES = ("1", "true", "yes", "on")
+_FALSE_VALUES = ("0", "false", "no", "off")
+
+def _coerce_env(name: str, value: str, default: Any) -> Any:
+    """将环境变量字符串转换为默认值的类型，无法转换时抛出 ValueError"""
+    if default is None or isinstance(default, str):
+        return value
+    if isinstance(default, bool):
+        lowered = value.strip().lower()
+        if lowered in _TRUE_VALUES or lowered in _FALSE_VALUES:
+            return lowered in _TRUE_VALUES
+        raise ValueError(f"环境变量 {name} 不是有效的布尔值: {value}")
+    if isinstance(default, (int, float)):
+        # 整数默认值同样接受小数（如超时秒数 10 覆盖为 2.5）
+        try:
+            return int(value) if isinstance(default, int) and value.strip().lstrip("+-").isdigit() else float(value)
+        except ValueError:
+            raise ValueError(f"环境变量 {name} 不是有效的数值: {value}")
+    parsed = yaml.safe_load(value) if value else type(default)()
+    if not isinstance(parsed, type(default)):
+        raise ValueError(f"环境变量 {name} 应为{'列表' if isinstance(default, list) else '字典'}: {value}")
+    return parsed
 
 class Config:
-    """系统配置管理类"""
-    
+    """系统配置管理类
+
+    配置在加载时编译为只读的扁平快照（点分路径 -> 值），get 为一次字典查找。
+    重新加载时整体替换快照，并通知订阅了变化配置项的组件。
+    """
+
     def __init__(self, env: str = "production"):
         """初始化配置，支持多环境"""
         self.env = env
+        self.config_dir = os.path.dirname(__file__)
+        self.subscribers: List[Tuple[Tuple[str, ...], Callable[["Config"], None]]] = []
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stop_watcher = threading.Event()
+        self._mtimes = self._file_mtimes()
         self.config = self._load_config()
-        self._validate_config()
-    
-    @lru_cache(maxsize=None)
+        self._validate_config(self.config)
+        self._values: Mapping[str, Any] = MappingProxyType(_flatten(self.config))
+        self._warn_legacy_env(self.config)
+
+    def _config_files(self) -> List[str]:
+        return [
+            os.path.join(self.config_dir, "base.yaml"),
+            os.path.join(self.config_dir, f"{self.env}.yaml")
+        ]
+
+    def _file_mtimes(self) -> Tuple:
+        return tuple(os.path.getmtime(path) if os.path.exists(path) else None for path in self._config_files())
+
     def _load_config(self) -> Dict[str, Any]:
         """加载配置文件，支持环境变量覆盖"""
+        base_path, env_path = self._config_files()
         # 加载基础配置
-        base_path = os.path.join(os.path.dirname(__file__), "base.yaml")
         with open(base_path, "r", encoding="utf-8") as f:
             config = yaml.safe_load(f)
-        
+
         # 加载环境特定配置
-        env_path = os.path.join(os.path.dirname(__file__), f"{self.env}.yaml")
         if os.path.exists(env_path):
             with open(env_path, "r", encoding="utf-8") as f:
                 env_config = yaml.safe_load(f)
                 config.update(env_config)
-        
+
         # 环境变量覆盖配置
         self._override_with_env(config)
         return config
-    
+
     def _override_with_env(self, config: Dict[str, Any]):
-        """用环境变量覆盖配置"""
+        """用带 ENV_PREFIX 前缀的环境变量覆盖配置
+
+        值按配置文件中已有默认值的类型转换（布尔、整数、浮点数，列表和字典按YAML解析）；
+        没有默认值或默认值为字符串时保持原字符串，避免 "no"、"0755"、"null" 等密码或名称被改写。
+        """
         for key, value in os.environ.items():
-            parts = key.lower().split("__")  # 用双下划线分隔层级
+            if not key.startswith(ENV_PREFIX):
+                continue
+            parts = key[len(ENV_PREFIX):].lower().split("__")  # 用双下划线分隔层级
             current = config
-            for i, part in enumerate(parts):
-                if i == len(parts) - 1:
-                    current[part] = value
-                    break
-                if part not in current:
+            for part in parts[:-1]:
+                if not isinstance(current.get(part), dict):
                     current[part] = {}
                 current = current[part]
-    
-    def _validate_config(self):
+            current[parts[-1]] = _coerce_env(key, value, current.get(parts[-1]))
+
+    def _warn_legacy_env(self, config: Dict[str, Any]):
+        """旧版本直接读取不带前缀的环境变量（如 DATABASE__HOST），现已忽略，启动时提示改名"""
+        legacy = sorted(
+            key for key in os.environ
+            if not key.startswith(ENV_PREFIX) and "__" in key and key.split("__", 1)[0].lower() in config
+        )
+        if legacy:
+            logger.warning(
+                f"以下环境变量缺少 {ENV_PREFIX} 前缀，已不再覆盖配置: {', '.join(legacy)}"
+                f"（请改为 {ENV_PREFIX}{legacy[0]} 形式）"
+            )
+
+    def _validate_config(self, config: Dict[str, Any]):
         """验证配置完整性"""
         required_sections = ["database", "redis", "neo4j", "model", "service"]
         for section in required_sections:
-            if section not in self.config:
+            if section not in config:
                 raise ValueError(f"配置缺失必要部分: {section}")
-    
+
     def get(self, key: str, default: Any = None) -> Any:
         """获取配置项，支持点分路径（如"database.host"）"""
-        parts = key.split(".")
-        current = self.config
-        for part in parts:
-            if part not in current:
-                return default
-            current = current[part]
-        return current
-    
-    def reload(self):
-        """重新加载配置"""
-        self._load_config.cache_clear()
-        self.config = self._load_config()
-        self._validate_config()
+        return self._values.get(key, default)
+
+    def get_int(self, key: str, default: int = 0) -> int:
+        value = self._values.get(key)
+        return default if value is None else int(value)
+
+    def get_float(self, key: str, default: float = 0.0) -> float:
+        value = self._values.get(key)
+        return default if value is None else float(value)
+
+    def get_bool(self, key: str, default: bool = False) -> bool:
+        value = self._values.get(key)
+        if value is None:
+            return default
+        if isinstance(value, str):
+            return value.strip().lower() in _TRUE_VALUES
+        return bool(value)
+
+    def get_str(self, key: str, default: str = "") -> str:
+        value = self._values.get(key)
+        return default if value is None else str(value)
+
+    @property
+    def snapshot(self) -> Mapping[str, Any]:
+        """当前配置快照（只读）"""
+        return self._values
+
+    def subscribe(self, keys: Iterable[str], callback: Callable[["Config"], None]):
+        """订阅配置变化：keys 中任一配置项（或其下级配置项）变化时调用 callback(config)"""
+        self.subscribers.append((tuple(keys), callback))
+
+    def reload(self) -> bool:
+        """重新加载配置，校验通过后整体替换快照并通知订阅者；失败时保留当前配置"""
+        with self._lock:
+            # 加载前记录修改时间，加载期间文件再次修改时下次检查仍会重新加载；
+            # 加载失败时不记录，修正前的错误配置在每个检查周期重试
+            mtimes = self._file_mtimes()
+            try:
+                config = self._load_config()
+                self._validate_config(config)
+            except Exception as e:
+                logger.error(f"重新加载配置失败，继续使用当前配置: {str(e)}")
+                return False
+            self._mtimes = mtimes
+
+            old, new = self._values, MappingProxyType(_flatten(config))
+            changed = {
+                key for key in old.keys() | new.keys()
+                if old.get(key, _MISSING) != new.get(key, _MISSING)
+            }
+            self.config = config
+            self._values = new
+
+        if changed:
+            logger.info(f"配置已重新加载，变化的配置项: {', '.join(sorted(changed))}")
+        for keys, callback in list(self.subscribers):
+            if any(key in changed for key in keys):
+                try:
+                    callback(self)
+                except Exception as e:
+                    logger.error(f"配置变更回调执行失败: {str(e)}")
+        return True
+
+    def start_watcher(self, interval: float = 5.0):
+        """启动后台线程，配置文件修改时自动重新加载"""
+        if self._watcher is not None or interval <= 0:
+            return
+
+        self._stop_watcher.clear()
+
+        def watch():
+            while not self._stop_watcher.wait(interval):
+                if self._file_mtimes() != self._mtimes:
+                    self.reload()
+
+        self._watcher = threading.Thread(target=watch, name="config-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        """停止配置文件监视线程"""
+        watcher, self._watcher = self._watcher, None
+        if watcher is not None:
+            self._stop_watcher.set()
+            watcher.join()
 
 # 全局配置实例
 config = Config(os.environ.get("LEARNING_PATH_ENV", "production"))
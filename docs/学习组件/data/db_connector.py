@@ -1,84 +1,309 @@
+import json
+import weakref
+import itertools
+import threading
 import psycopg2
-from psycopg2 import pool
+import psycopg2.extras
+import psycopg2.extensions
 from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence
 from config import config
+from .pool import MonitoredConnectionPool
+from .circuit_breaker import CircuitBreaker
 import logging
 
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:  # orjson 为可选依赖
+    json_loads = json.loads
+
 logger = logging.getLogger(__name__)
 
+# JSON/JSONB列使用更快的解码函数
+psycopg2.extras.register_default_json(globally=True, loads=json_loads)
+psycopg2.extras.register_default_jsonb(globally=True, loads=json_loads)
+
+class PreparedStatements:
+    """服务端预编译语句，每个连接首次使用时 PREPARE，之后只发送 EXECUTE 和参数
+
+    PREPARE 在事务之外（自动提交）执行，写连接上后续事务回滚不会撤销预编译；
+    已在事务中时随事务执行，回滚时由 DBConnector 调用 discard 清除该连接的记录。
+    """
+
+    # 预编译语句属于连接，所有语句集合共享 {连接: 已预编译的语句名}
+    _prepared: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+    _lock = threading.Lock()
+
+    def __init__(self, statements: Dict[str, str]):
+        self.statements = statements  # {语句名: 使用 $1..$n 占位符的SQL}
+
+    @classmethod
+    def discard(cls, conn):
+        """事务回滚后调用，之后重新预编译"""
+        with cls._lock:
+            cls._prepared.pop(conn, None)
+
+    def _prepare(self, cur, name: str):
+        conn = cur.connection
+        idle = conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        if conn.autocommit or not idle:
+            cur.execute(f"PREPARE {name} AS {self.statements[name]}")
+            return
+        conn.autocommit = True
+        try:
+            cur.execute(f"PREPARE {name} AS {self.statements[name]}")
+        finally:
+            conn.autocommit = False
+
+    def execute(self, cur, name: str, params: Sequence[Any]):
+        """执行预编译语句"""
+        conn = cur.connection
+        with self._lock:
+            prepared = name in self._prepared.get(conn, ())
+        if not prepared:
+            self._prepare(cur, name)
+            with self._lock:
+                self._prepared.setdefault(conn, set()).add(name)
+        if params:
+            cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", tuple(params))
+        else:
+            cur.execute(f"EXECUTE {name}")
+
+# 从库复制延迟（秒），主库返回0
+REPLICATION_LAG_SQL = """
+    SELECT CASE WHEN pg_is_in_recovery()
+                THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                ELSE 0 END
+"""
+
+class Replica:
+    """从库节点：连接池及健康状态"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.pool = None
+        self.probe_conn = None  # 健康检查专用连接，不占用连接池
+        self.healthy = False
+        self.lag = 0.0
+        self.in_use = 0
+
+    @property
+    def name(self) -> str:
+        return f"{self.host}:{self.port}"
+
 class DBConnector:
-    """数据库连接池管理"""
-    
-    def __init__(self):
+    """数据库连接池管理（一主多从，从库按健康状态和复制延迟自动摘除与恢复）"""
+
+    def __init__(self, breaker: Optional[CircuitBreaker] = None):
         self.master_pool = None
-        self.slave_pool = None
+        self.breaker = breaker  # 主库熔断器，从库由健康检查摘除
+        self.replicas: List[Replica] = []
+        self.max_replica_lag = config.get("database.max_replica_lag", 10)
+        self.check_interval = config.get("database.replica_check_interval", 5)
+        self._lock = threading.Lock()
+        self._round_robin = itertools.count()
+        self._stopped = threading.Event()
+        self._health_thread = None
         self._init_pools()
-    
+        config.subscribe(
+            ["database.pool_size", "database.pool_min_size", "database.pool_timeout", "database.pool_max_waiters"],
+            self._on_pool_config_change
+        )
+
+    def _connect_kwargs(self, host: str, port: int) -> Dict[str, Any]:
+        return {
+            "host": host,
+            "port": port,
+            "database": config.get("database.name"),
+            "user": config.get("database.user"),
+            "password": config.get("database.password")
+        }
+
+    def _create_pool(self, name: str, host: str, port: int) -> MonitoredConnectionPool:
+        """创建连接池"""
+        return MonitoredConnectionPool(
+            name=name,
+            minconn=config.get("database.pool_min_size", 5),
+            maxconn=config.get("database.pool_size"),
+            timeout=config.get("database.pool_timeout", 5),
+            max_waiters=config.get("database.pool_max_waiters", 100),
+            idle_timeout=config.get("database.pool_idle_timeout", 300),
+            adaptive=config.get("database.pool_adaptive", True),
+            **self._connect_kwargs(host, port)
+        )
+
+    def _on_pool_config_change(self, _config):
+        """连接池配置变化时调整所有连接池"""
+        pools = [self.master_pool] + [replica.pool for replica in self.replicas if replica.pool]
+        for conn_pool in pools:
+            conn_pool.resize(
+                minconn=config.get("database.pool_min_size", 5),
+                maxconn=config.get("database.pool_size"),
+                timeout=config.get("database.pool_timeout", 5),
+                max_waiters=config.get("database.pool_max_waiters", 100)
+            )
+
+    def _replica_configs(self) -> List[dict]:
+        """从库配置，兼容旧的单从库配置 database.slave"""
+        replicas = list(config.get("database.replicas") or [])
+        if not replicas and config.get("database.slave.host"):
+            replicas.append({
+                "host": config.get("database.slave.host"),
+                "port": config.get("database.slave.port")
+            })
+        return replicas
+
     def _init_pools(self):
         """初始化主从连接池"""
         # 主库连接池（写操作）
         try:
-            self.master_pool = psycopg2.pool.ThreadedConnectionPool(
-                minconn=5,
-                maxconn=config.get("database.pool_size"),
-                host=config.get("database.master.host"),
-                port=config.get("database.master.port"),
-                database=config.get("database.name"),
-                user=config.get("database.user"),
-                password=config.get("database.password")
+            self.master_pool = self._create_pool(
+                "master",
+                config.get("database.master.host"),
+                config.get("database.master.port")
             )
             logger.info("主库连接池初始化成功")
         except Exception as e:
             logger.error(f"主库连接池初始化失败: {str(e)}")
             raise
-        
-        # 从库连接池（读操作）
+
+        # 从库连接池（读操作），初始化失败的从库由健康检查重试
+        for replica_config in self._replica_configs():
+            replica = Replica(replica_config["host"], replica_config["port"])
+            self.replicas.append(replica)
+            self._check_replica(replica)
+
+        if self.replicas:
+            self._health_thread = threading.Thread(
+                target=self._health_loop, name="db-replica-health", daemon=True
+            )
+            self._health_thread.start()
+
+    def _probe_connection(self, replica: Replica):
+        """健康检查专用连接：连接池满载时探测不排队，不会因池耗尽误判从库故障"""
+        conn = replica.probe_conn
+        if conn is None or conn.closed:
+            conn = psycopg2.connect(
+                connect_timeout=max(1, int(config.get("database.pool_timeout", 5))),
+                **self._connect_kwargs(replica.host, replica.port)
+            )
+            conn.autocommit = True
+            replica.probe_conn = conn
+        return conn
+
+    def _check_replica(self, replica: Replica):
+        """探测从库可用性和复制延迟，据此摘除或恢复"""
         try:
-            if config.get("database.slave.host"):
-                self.slave_pool = psycopg2.pool.ThreadedConnectionPool(
-                    minconn=5,
-                    maxconn=config.get("database.pool_size"),
-                    host=config.get("database.slave.host"),
-                    port=config.get("database.slave.port"),
-                    database=config.get("database.name"),
-                    user=config.get("database.user"),
-                    password=config.get("database.password")
-                )
-                logger.info("从库连接池初始化成功")
+            conn = self._probe_connection(replica)
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(REPLICATION_LAG_SQL)
+                    replica.lag = float(cur.fetchone()[0])
+            except Exception:
+                conn.close()
+                replica.probe_conn = None
+                raise
+            if replica.pool is None:
+                replica.pool = self._create_pool(replica.name, replica.host, replica.port)
+
+            healthy = replica.lag <= self.max_replica_lag
+            if healthy != replica.healthy:
+                if healthy:
+                    logger.info(f"从库 {replica.name} 恢复可用 (延迟 {replica.lag:.1f}s)")
+                else:
+                    logger.warning(f"从库 {replica.name} 复制延迟 {replica.lag:.1f}s 超过阈值，暂时摘除")
+            replica.healthy = healthy
         except Exception as e:
-            logger.warning(f"从库连接池初始化失败，将使用主库: {str(e)}")
-            self.slave_pool = None
-    
+            if replica.healthy or replica.pool is None:
+                logger.warning(f"从库 {replica.name} 不可用，暂时摘除: {str(e)}")
+            replica.healthy = False
+
+    def _health_loop(self):
+        """后台定期检查从库"""
+        while not self._stopped.wait(self.check_interval):
+            for replica in self.replicas:
+                self._check_replica(replica)
+
+    def _select_replica(self) -> Optional[Replica]:
+        """选择正在使用连接数最少的健康从库，相同时轮询"""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        offset = next(self._round_robin)
+        rotated = healthy[offset % len(healthy):] + healthy[:offset % len(healthy)]
+        return min(rotated, key=lambda replica: replica.in_use)
+
     @contextmanager
-    def get_connection(self, read_only: bool = False):
-        """获取数据库连接上下文管理器"""
-        conn = None
+    def get_connection(self, read_only: bool = False, autocommit: Optional[bool] = None):
+        """获取数据库连接上下文管理器
+
+        只读连接默认以自动提交模式使用，省去事务的BEGIN/COMMIT往返；
+        需要事务的只读操作（如服务端游标）可传入 autocommit=False。
+        """
+        if autocommit is None:
+            autocommit = read_only
+
+        # 优先使用从库读，主库写
+        replica = self._select_replica() if read_only else None
+        conn_pool = replica.pool if replica else self.master_pool
+        breaker = None if replica else self.breaker
+        if breaker:
+            breaker.before_call()
         try:
-            # 优先使用从库读，主库写
-            if read_only and self.slave_pool:
-                conn = self.slave_pool.getconn()
-            else:
-                conn = self.master_pool.getconn()
-            
+            conn = conn_pool.getconn()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            if breaker:
+                breaker.record_failure()
+            raise
+        except Exception:
+            if breaker:
+                breaker.release()
+            raise
+        if replica:
+            with self._lock:
+                replica.in_use += 1
+
+        broken = False
+        try:
+            if conn.autocommit != autocommit:
+                conn.autocommit = autocommit
             yield conn
+            if not autocommit:
+                conn.commit()
+            if breaker:
+                breaker.record_success()
         except Exception as e:
             logger.error(f"数据库操作失败: {str(e)}")
-            if conn:
+            if not conn.closed and not autocommit:
                 conn.rollback()
+                PreparedStatements.discard(conn)
+            if isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+                broken = True
+                if replica:
+                    replica.healthy = False
+            # 连接错误计为失败，SQL错误说明数据库可用
+            if breaker and broken:
+                breaker.record_failure()
+            elif breaker:
+                breaker.record_success()
             raise
         finally:
-            if conn:
-                conn.commit()
-                # 归还连接到池
-                if read_only and self.slave_pool:
-                    self.slave_pool.putconn(conn)
-                else:
-                    self.master_pool.putconn(conn)
-    
+            # 归还连接到池，已损坏的连接直接关闭
+            conn_pool.putconn(conn, close=broken or bool(conn.closed))
+            if replica:
+                with self._lock:
+                    replica.in_use -= 1
+
     def close(self):
         """关闭连接池"""
+        self._stopped.set()
         if self.master_pool:
             self.master_pool.closeall()
-        if self.slave_pool:
-            self.slave_pool.closeall()
+        for replica in self.replicas:
+            if replica.pool:
+                replica.pool.closeall()
+            if replica.probe_conn is not None and not replica.probe_conn.closed:
+                replica.probe_conn.close()
         logger.info("数据库连接池已关闭")
@@ -0,0 +1,210 @@
+import time
+import logging
+from abc import ABC, abstractmethod
+import threading
+import numpy as np
+import networkx as nx
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from config import config
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "knowledge_version:{subject}"
+
+def bump_knowledge_version(redis_client, subject: str) -> int:
+    """知识图谱变更后调用，递增学科版本号，各进程内缓存据此失效
+
+    知识点、前置关系或知识点特征的所有写入路径（知识库仓库的写方法、内容导入任务）
+    都必须在写入成功后调用，否则各进程的编译图谱、特征矩阵和推理结果缓存不会失效。
+    仓库之外的写入可执行 python -m data.knowledge_cache <学科> 手动递增。
+    """
+    return redis_client.incr(VERSION_KEY.format(subject=subject))
+
+class VersionedSubjectCache(ABC):
+    """按学科缓存的进程内数据，通过Redis中的学科版本号判断是否需要重新加载"""
+
+    def __init__(self, redis_client, check_interval: float = None):
+        self.redis_client = redis_client
+        self.check_interval = (check_interval if check_interval is not None
+                               else config.get("knowledge.cache_check_interval", 5))
+        self.entries: Dict[str, Tuple[int, float, Any]] = {}  # {学科: (版本, 检查时间, 数据)}
+        self._lock = threading.Lock()
+
+    def _get_version(self, subject: str) -> int:
+        """读取学科当前版本号"""
+        version = self.redis_client.get(VERSION_KEY.format(subject=subject))
+        return int(version) if version else 0
+
+    @abstractmethod
+    def _load(self, subject: str) -> Any:
+        """加载学科数据，由子类实现"""
+
+    def get(self, subject: str) -> Any:
+        """获取学科数据，版本变化时重新加载"""
+        entry = self.entries.get(subject)
+        now = time.monotonic()
+        if entry and now - entry[1] < self.check_interval:
+            return entry[2]
+
+        try:
+            version = self._get_version(subject)
+        except Exception as e:
+            if entry is None:
+                raise
+            # Redis不可用时继续使用已缓存的数据，下个检查周期再重试
+            logger.warning(f"读取学科 {subject} 版本号失败，继续使用缓存数据: {str(e)}")
+            self.entries[subject] = (entry[0], now, entry[2])
+            return entry[2]
+        if entry and entry[0] == version:
+            self.entries[subject] = (version, now, entry[2])
+            return entry[2]
+
+        with self._lock:
+            # 其他线程可能已完成加载
+            entry = self.entries.get(subject)
+            if entry and entry[0] == version:
+                return entry[2]
+
+            data = self._load(subject)
+            self.entries[subject] = (version, time.monotonic(), data)
+            logger.info(f"学科 {subject} 缓存已加载 (版本: {version})")
+            return data
+
+    def version(self, subject: str) -> int:
+        """本进程缓存中学科数据的版本号，未加载时为0"""
+        entry = self.entries.get(subject)
+        return entry[0] if entry else 0
+
+    def invalidate(self, subject: Optional[str] = None):
+        """清除本进程缓存"""
+        if subject is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(subject, None)
+
+class KnowledgeFeatureCache(VersionedSubjectCache):
+    """学科知识点特征矩阵缓存，每行对应一个知识点
+
+    每次加载只调用一次 knowledge_repo.get_subject_node_features(subject)，
+    由仓库用一条查询返回该学科全部知识点的 [(知识点ID, 特征向量)]，不再逐个知识点查询特征。
+    """
+
+    def __init__(self, knowledge_repo, redis_client, check_interval: float = None):
+        super().__init__(redis_client, check_interval)
+        self.knowledge_repo = knowledge_repo
+
+    def _load(self, subject: str) -> Tuple[List[str], Optional[np.ndarray]]:
+        rows = list(self.knowledge_repo.get_subject_node_features(subject) or [])
+        if not rows:
+            return [], None
+
+        node_ids = [node_id for node_id, _ in rows]
+        matrix = np.ascontiguousarray([features for _, features in rows], dtype=np.float32)
+        return node_ids, matrix
+
+class CompiledKnowledgeGraph:
+    """编译后的学科知识图谱：整数节点ID、CSR前置关系数组、全局拓扑序和祖先位图"""
+
+    def __init__(self, graph: nx.DiGraph):
+        self.graph = graph
+        try:
+            # 节点整数ID即其全局拓扑序位置
+            self.node_ids: List[str] = list(nx.topological_sort(graph))
+            self.is_dag = True
+        except nx.NetworkXUnfeasible:
+            # 存在环时无法预计算，由调用方回退到启发式排序
+            self.node_ids = list(graph.nodes)
+            self.is_dag = False
+        self.index: Dict[str, int] = {node: i for i, node in enumerate(self.node_ids)}
+
+        # 前置知识点（入边）CSR邻接数组
+        predecessors = [sorted(self.index[p] for p in graph.predecessors(node)) for node in self.node_ids]
+        self.indptr = np.zeros(len(self.node_ids) + 1, dtype=np.int32)
+        self.indptr[1:] = np.cumsum([len(preds) for preds in predecessors])
+        self.indices = np.fromiter(
+            (p for preds in predecessors for p in preds), dtype=np.int32, count=int(self.indptr[-1])
+        )
+
+        # 祖先位图：第i位表示拓扑序为i的节点，按拓扑序一次遍历即可求出闭包
+        self.ancestors: List[int] = []
+        if self.is_dag:
+            indptr, indices = self.indptr.tolist(), self.indices.tolist()
+            for i in range(len(self.node_ids)):
+                bits = 0
+                for p in indices[indptr[i]:indptr[i + 1]]:
+                    bits |= self.ancestors[p] | (1 << p)
+                self.ancestors.append(bits)
+
+    def closure_bits(self, nodes: Iterable[str]) -> int:
+        """节点及其全部前置知识点的位图"""
+        bits = 0
+        for node in nodes:
+            i = self.index.get(node)
+            if i is not None:
+                bits |= self.ancestors[i] | (1 << i)
+        return bits
+
+    def decode(self, bits: int) -> List[str]:
+        """位图按低位到高位解码即为拓扑序"""
+        sequence = []
+        while bits:
+            lowest = bits & -bits
+            sequence.append(self.node_ids[lowest.bit_length() - 1])
+            bits ^= lowest
+        return sequence
+
+    def closure_sequence(self, nodes: Iterable[str]) -> List[str]:
+        """返回节点及其全部前置知识点，按全局拓扑序排列"""
+        return self.decode(self.closure_bits(nodes))
+
+    def descendants(self, nodes: Iterable[str]) -> Set[str]:
+        """返回以任一给定节点为前置知识的全部后续节点"""
+        mask = 0
+        for node in nodes:
+            i = self.index.get(node)
+            if i is not None:
+                mask |= 1 << i
+        if not mask:
+            return set()
+        # 拓扑序中位于最小给定节点之前的节点不可能是后续节点
+        start = (mask & -mask).bit_length()
+        return {self.node_ids[i] for i in range(start, len(self.node_ids)) if self.ancestors[i] & mask}
+
+    def splice(self, sequence: List[str], remove: Iterable[str], add: Iterable[str]) -> List[str]:
+        """从已有序列中删除和插入节点，保持其余节点的相对顺序
+
+        新节点按拓扑序依次插入到序列中其最后一个前置知识点之后；
+        原序列满足前置关系时，结果序列同样满足。
+        """
+        removed = set(remove)
+        result = [node for node in sequence if node not in removed]
+        for node in sorted(add, key=lambda n: self.index.get(n, len(self.node_ids))):
+            i = self.index.get(node)
+            ancestors = self.ancestors[i] if i is not None else 0
+            position = 0
+            for pos, existing in enumerate(result):
+                j = self.index.get(existing)
+                if j is not None and ancestors >> j & 1:
+                    position = pos + 1
+            result.insert(position, node)
+        return result
+
+class KnowledgeGraphCache(VersionedSubjectCache):
+    """学科编译知识图谱缓存"""
+
+    def __init__(self, knowledge_repo, redis_client, check_interval: float = None):
+        super().__init__(redis_client, check_interval)
+        self.knowledge_repo = knowledge_repo
+
+    def _load(self, subject: str) -> CompiledKnowledgeGraph:
+        return CompiledKnowledgeGraph(self.knowledge_repo.get_knowledge_subgraph(subject))
+
+if __name__ == "__main__":
+    import sys
+    from data import invalidate_knowledge
+
+    if len(sys.argv) < 2:
+        print("用法: python -m data.knowledge_cache <学科> [<学科> ...]")
+        sys.exit(1)
+    for subject in sys.argv[1:]:
+        print(f"学科 {subject} 知识版本已递增为 {invalidate_knowledge(subject)}")
@@ -0,0 +1,56 @@
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+# 各组件初始化耗时（秒），由 /health 报告
+startup_timings: Dict[str, float] = {}
+
+def record_startup(name: str, seconds: float):
+    """记录组件初始化耗时"""
+    startup_timings[name] = round(seconds, 4)
+
+class LazyResource:
+    """延迟初始化的资源代理：首次访问属性时才调用工厂函数创建实际对象"""
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self._name = name
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def initialized(self) -> bool:
+        return self._instance is not None
+
+    def resolve(self) -> Any:
+        """获取实际对象，必要时初始化"""
+        instance = self._instance
+        if instance is not None:
+            return instance
+        with self._lock:
+            if self._instance is None:
+                start = time.perf_counter()
+                self._instance = self._factory()
+                record_startup(self._name, time.perf_counter() - start)
+                logger.info(f"{self._name} 初始化完成，耗时 {startup_timings[self._name]:.3f}s")
+            return self._instance
+
+    def override(self, factory: Callable[[], Any]):
+        """替换工厂函数（如基准测试注入替身），已创建的实例将被丢弃"""
+        with self._lock:
+            self._factory = factory
+            self._instance = None
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.resolve(), attr)
+
+    def __repr__(self) -> str:
+        return f"<LazyResource {self._name} initialized={self.initialized}>"
+
+def warm_up(*resources: LazyResource):
+    """提前初始化指定资源"""
+    for resource in resources:
+        resource.resolve()
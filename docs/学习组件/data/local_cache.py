@@ -0,0 +1,141 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+class LocalCache:
+    """进程内LRU/TTL缓存，按条目数和字节数双重限制容量"""
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 256 * 1024 * 1024, ttl: float = 30):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()  # {键: (值, 过期时间)}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """读取缓存，过期视为未命中"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: bytes):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.total_bytes += size
+            while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        """删除缓存条目"""
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def _remove(self, key: str):
+        value, _ = self.entries.pop(key)
+        self.total_bytes -= len(value)
+
+    def stats(self) -> Dict[str, int]:
+        """命中统计"""
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+class CacheInvalidationBus:
+    """基于Redis发布订阅的跨进程缓存失效通知"""
+
+    def __init__(self, redis_client, channel: str = INVALIDATION_CHANNEL):
+        self.redis_client = redis_client
+        self.channel = channel
+        self.instance_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.handlers: Dict[str, Callable[[str], None]] = {}  # {键前缀: 失效处理函数}
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def register(self, prefix: str, handler: Callable[[str], None]):
+        """注册键前缀对应的本地失效处理函数"""
+        self.handlers[prefix] = handler
+
+    def publish(self, *keys: str):
+        """通知其他进程失效指定键"""
+        if not keys:
+            return
+        try:
+            self.redis_client.publish(self.channel, "\n".join([self.instance_id, *keys]))
+        except Exception as e:
+            logger.warning(f"发布缓存失效通知失败: {str(e)}")
+
+    def start(self):
+        """启动订阅线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._listen, name="cache-invalidation", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """停止订阅线程"""
+        self._stopped.set()
+
+    def _listen(self):
+        while not self._stopped.is_set():
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                while not self._stopped.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message:
+                        self._handle(message["data"])
+                pubsub.close()
+            except Exception as e:
+                logger.warning(f"缓存失效订阅中断，稍后重连: {str(e)}")
+                time.sleep(1)
+
+    def _handle(self, data):
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        sender, *keys = data.split("\n")
+        if sender == self.instance_id:
+            return
+        for key in keys:
+            for prefix, handler in self.handlers.items():
+                if key.startswith(prefix):
+                    handler(key)
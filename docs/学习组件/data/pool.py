@@ -0,0 +1,194 @@
+import time
+import logging
+import threading
+import psycopg2
+from psycopg2 import pool
+from typing import Dict, List, Tuple
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+# 连接池监控指标（由 /metrics 统一导出）
+POOL_SIZE = Gauge("db_pool_connections", "连接池当前连接总数", ["pool"])
+POOL_IN_USE = Gauge("db_pool_connections_in_use", "已借出的连接数", ["pool"])
+POOL_IDLE = Gauge("db_pool_connections_idle", "空闲连接数", ["pool"])
+POOL_WAITING = Gauge("db_pool_waiting_requests", "正在等待连接的请求数", ["pool"])
+POOL_WAIT_TIME = Histogram(
+    "db_pool_wait_seconds", "获取连接的等待时间", ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2, 5)
+)
+POOL_CHECKOUT_TIME = Histogram(
+    "db_pool_checkout_seconds", "连接借出到归还的持有时间", ["pool"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30)
+)
+POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "获取连接超时或等待队列已满的次数", ["pool"])
+
+class MonitoredConnectionPool:
+    """带等待队列、超时和监控指标的线程安全连接池
+
+    连接数在 minconn 与 maxconn 之间随需求伸缩：借出时按需新建，
+    空闲超过 idle_timeout 的连接在池大小高于 minconn 时关闭（借出、归还时及后台线程定期检查）。
+    缩小 maxconn 后多余的空闲连接立即关闭，借出中的连接在归还时关闭。
+    """
+
+    def __init__(self, name: str, minconn: int, maxconn: int, timeout: float = 5.0,
+                 max_waiters: int = 100, idle_timeout: float = 300.0, adaptive: bool = True, **connect_kwargs):
+        self.name = name
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_waiters = max_waiters
+        self.idle_timeout = idle_timeout
+        self.adaptive = adaptive
+        self.connect_kwargs = connect_kwargs
+        self.idle: List[Tuple[object, float]] = []  # [(连接, 归还时间)]，末尾为最近归还
+        self.checked_out: Dict[int, float] = {}  # {连接id: 借出时间}
+        self.size = 0
+        self.waiters = 0
+        self.closed = False
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+
+        for _ in range(minconn):
+            self.idle.append((self._connect(), time.monotonic()))
+        self._update_gauges()
+
+        # 没有借出和归还时同样需要回收空闲连接
+        if adaptive:
+            threading.Thread(target=self._reap_loop, name=f"db-pool-reaper-{name}", daemon=True).start()
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.connect_kwargs)
+        self.size += 1
+        return conn
+
+    def _update_gauges(self):
+        POOL_SIZE.labels(self.name).set(self.size)
+        POOL_IN_USE.labels(self.name).set(len(self.checked_out))
+        POOL_IDLE.labels(self.name).set(len(self.idle))
+        POOL_WAITING.labels(self.name).set(self.waiters)
+
+    def getconn(self, timeout: float = None):
+        """借出连接，池满时等待至多 timeout 秒"""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        with self._cond:
+            if self.closed:
+                raise pool.PoolError("连接池已关闭")
+            self._reap_idle(start)
+            if not self.idle and self.size >= self.maxconn and self.waiters >= self.max_waiters:
+                POOL_TIMEOUTS.labels(self.name).inc()
+                raise pool.PoolError(f"连接池 {self.name} 等待队列已满")
+
+            self.waiters += 1
+            try:
+                while not self.idle and self.size >= self.maxconn:
+                    remaining = timeout - (time.monotonic() - start)
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        if not self.idle and self.size >= self.maxconn:
+                            POOL_TIMEOUTS.labels(self.name).inc()
+                            raise pool.PoolError(f"连接池 {self.name} 获取连接超时 ({timeout}s)")
+                    if self.closed:
+                        raise pool.PoolError("连接池已关闭")
+            finally:
+                self.waiters -= 1
+
+            if self.idle:
+                conn, _ = self.idle.pop()
+            else:
+                # 新建连接期间占用名额，避免并发超出上限
+                self.size += 1
+                try:
+                    self._cond.release()
+                    try:
+                        conn = psycopg2.connect(**self.connect_kwargs)
+                    finally:
+                        self._cond.acquire()
+                except Exception:
+                    self.size -= 1
+                    self._cond.notify()
+                    raise
+
+            self.checked_out[id(conn)] = time.monotonic()
+            self._update_gauges()
+
+        POOL_WAIT_TIME.labels(self.name).observe(time.monotonic() - start)
+        return conn
+
+    def putconn(self, conn, close: bool = False):
+        """归还连接"""
+        now = time.monotonic()
+        with self._cond:
+            checkout_time = self.checked_out.pop(id(conn), None)
+            if checkout_time is not None:
+                POOL_CHECKOUT_TIME.labels(self.name).observe(now - checkout_time)
+
+            if close or self.closed or conn.closed or self.size > self.maxconn:
+                # 连接池缩小后超出 maxconn 的连接归还时关闭
+                self._close(conn)
+            else:
+                self.idle.append((conn, now))
+                self._reap_idle(now)
+            self._update_gauges()
+            self._cond.notify()
+
+    def _reap_idle(self, now: float):
+        """关闭超出 maxconn 的空闲连接及空闲过久的连接（池大小不低于 minconn），需持有 _cond"""
+        while self.idle and self.size > self.maxconn:
+            conn, _ = self.idle.pop(0)
+            self._close(conn)
+        if not self.adaptive:
+            return
+        while self.idle and self.size > self.minconn and now - self.idle[0][1] > self.idle_timeout:
+            conn, _ = self.idle.pop(0)
+            self._close(conn)
+
+    def _reap_loop(self):
+        interval = max(1.0, self.idle_timeout / 2)
+        while not self._stopped.wait(interval):
+            with self._cond:
+                if self.closed:
+                    return
+                self._reap_idle(time.monotonic())
+                self._update_gauges()
+
+    def _close(self, conn):
+        self.size -= 1
+        try:
+            conn.close()
+        except Exception as e:
+            logger.warning(f"关闭数据库连接失败: {str(e)}")
+
+    def resize(self, minconn: int, maxconn: int, timeout: float = None, max_waiters: int = None):
+        """调整连接池大小和等待参数（配置热更新时调用），多余的空闲连接立即关闭，借出中的在归还时关闭"""
+        with self._cond:
+            self.minconn = minconn
+            self.maxconn = maxconn
+            if timeout is not None:
+                self.timeout = timeout
+            if max_waiters is not None:
+                self.max_waiters = max_waiters
+            self._reap_idle(time.monotonic())
+            self._update_gauges()
+            self._cond.notify_all()
+        logger.info(f"连接池 {self.name} 已调整: minconn={minconn}, maxconn={maxconn}")
+
+    def stats(self) -> Dict[str, int]:
+        """连接池使用情况"""
+        return {
+            "size": self.size,
+            "in_use": len(self.checked_out),
+            "idle": len(self.idle),
+            "waiting": self.waiters
+        }
+
+    def closeall(self):
+        """关闭所有空闲连接，借出的连接在归还时关闭"""
+        self._stopped.set()
+        with self._cond:
+            self.closed = True
+            for conn, _ in self.idle:
+                self._close(conn)
+            self.idle.clear()
+            self._update_gauges()
+            self._cond.notify_all()
@@ -0,0 +1,124 @@
+import math
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 后台提前刷新共用的线程池
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+
+class _Call:
+    """一次进行中的加载"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[Exception] = None
+
+class SingleFlight:
+    """单飞合并：同一个键的并发加载只执行一次，其余调用等待并共享结果"""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.event.wait()
+            if call.error:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def in_flight(self, key: str) -> bool:
+        """键是否正在加载"""
+        return key in self._calls
+
+class ReadThroughCache:
+    """Redis读穿透缓存，防止缓存击穿与集中过期
+
+    - 单飞合并：同一进程内同一个键的并发未命中只回源一次
+    - 提前概率刷新：临近过期时按概率在后台刷新（XFetch），回源越慢越早刷新
+    - TTL抖动：写入时随机化过期时间，避免同批写入的键同时过期
+    """
+
+    def __init__(self, redis_client, ttl: int, jitter: float = 0.1, beta: float = 1.0):
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self.jitter = jitter
+        self.beta = beta
+        self.single_flight = SingleFlight()
+        self.load_time = 0.05  # 回源耗时的指数滑动平均（秒）
+
+    def jittered_ttl(self) -> int:
+        """带随机抖动的过期时间"""
+        return max(1, int(self.ttl * (1 + random.uniform(-self.jitter, self.jitter))))
+
+    def set(self, key: str, payload: bytes):
+        """写入缓存"""
+        self.redis_client.setex(key, self.jittered_ttl(), payload)
+
+    def set_many(self, payloads: Dict[str, bytes]):
+        """通过管道批量写入缓存，各键独立抖动过期时间"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        for key, payload in payloads.items():
+            pipe.setex(key, self.jittered_ttl(), payload)
+        pipe.execute()
+
+    def get(self, key: str, loader: Callable[[], Optional[bytes]]) -> Optional[bytes]:
+        """读取缓存，未命中时回源并写回；loader 返回缓存内容，None 表示数据不存在"""
+        # 读取不需要原子性，不包装 MULTI/EXEC
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.pttl(key)
+        payload, pttl = pipe.execute()
+
+        if payload:
+            if self._should_refresh(pttl) and not self.single_flight.in_flight(key):
+                _refresh_executor.submit(self._refresh, key, loader)
+            return payload
+
+        return self.single_flight.do(key, lambda: self._load(key, loader))
+
+    def _should_refresh(self, pttl: int) -> bool:
+        """XFetch：剩余时间 <= -回源耗时 * beta * ln(rand) 时提前刷新"""
+        if pttl is None or pttl < 0:
+            return False
+        return pttl / 1000.0 <= -self.load_time * self.beta * math.log(1.0 - random.random())
+
+    def _load(self, key: str, loader: Callable[[], Optional[bytes]]) -> Optional[bytes]:
+        """回源加载并写回缓存"""
+        start = time.monotonic()
+        payload = loader()
+        self.load_time = 0.8 * self.load_time + 0.2 * (time.monotonic() - start)
+        if payload:
+            self.set(key, payload)
+        return payload
+
+    def _refresh(self, key: str, loader: Callable[[], Optional[bytes]]):
+        """后台提前刷新"""
+        try:
+            self.single_flight.do(key, lambda: self._load(key, loader))
+        except Exception as e:
+            logger.warning(f"缓存 {key} 提前刷新失败: {str(e)}")
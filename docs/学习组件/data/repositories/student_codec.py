@@ -0,0 +1,87 @@
+from typing import Any, Dict, Union
+from dataclasses import asdict
+import json
+import logging
+import numpy as np
+from ...models.student import StudentProfile, LearningStyle
+
+try:
+    import msgpack
+except ImportError:  # msgpack 为可选依赖
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# 缓存格式版本（首字节）
+JSON_VERSION = 1
+MSGPACK_F32_VERSION = 2  # 旧格式：knowledge_state 为float32向量，只读取不再写入
+MSGPACK_VERSION = 3  # knowledge_state 为float64向量，与数据库中的值完全一致
+
+def student_from_dict(data: Dict[str, Any]) -> StudentProfile:
+    """由字典构建StudentProfile"""
+    return StudentProfile(
+        id=data["id"],
+        name=data["name"],
+        grade_level=data["grade_level"],
+        learning_style=LearningStyle(data["learning_style"]),
+        cognitive_style=data["cognitive_style"],
+        knowledge_state=data["knowledge_state"],
+        learning_history=data["learning_history"],
+        preferences=data["preferences"],
+        emotional_state=data["emotional_state"],
+        learning_goals=data["learning_goals"],
+        available_time=data["available_time"]
+    )
+
+class StudentCacheCodec:
+    """学生画像缓存编解码器，首字节为格式版本，可读取所有已知版本以便平滑切换"""
+
+    def __init__(self, version: int = MSGPACK_VERSION):
+        if version == MSGPACK_F32_VERSION:
+            # float32会改变掌握度（0.1 -> 0.10000000149），缓存命中与数据库读取的薄弱点判定可能不一致
+            version = MSGPACK_VERSION
+        if version == MSGPACK_VERSION and msgpack is None:
+            logger.warning("未安装msgpack，学生画像缓存使用JSON格式")
+            version = JSON_VERSION
+        self.version = version
+
+    def encode(self, student: StudentProfile) -> bytes:
+        """编码学生画像"""
+        data = asdict(student)
+        data["learning_style"] = student.learning_style.value
+        if self.version == JSON_VERSION:
+            return bytes([JSON_VERSION]) + json.dumps(data).encode("utf-8")
+
+        # knowledge_state 拆分为节点ID列表和float64向量，避免逐项编解码浮点数
+        knowledge_state = data.pop("knowledge_state")
+        data["knowledge_ids"] = list(knowledge_state.keys())
+        data["knowledge_values"] = np.fromiter(
+            knowledge_state.values(), dtype=np.float64, count=len(knowledge_state)
+        ).tobytes()
+        return bytes([MSGPACK_VERSION]) + msgpack.packb(data, use_bin_type=True)
+
+    def decode(self, payload: Union[bytes, str]) -> StudentProfile:
+        """解码学生画像"""
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+
+        version = payload[0]
+        if version == ord("{"):
+            # 未带版本号的旧JSON缓存
+            return student_from_dict(json.loads(payload))
+        if version == JSON_VERSION:
+            return student_from_dict(json.loads(payload[1:]))
+        if version in (MSGPACK_VERSION, MSGPACK_F32_VERSION):
+            if msgpack is None:
+                raise ValueError("缓存为msgpack格式，但未安装msgpack")
+            data = msgpack.unpackb(payload[1:], raw=False)
+            if version == MSGPACK_VERSION:
+                values = np.frombuffer(data.pop("knowledge_values"), dtype=np.float64).tolist()
+            else:
+                # 旧格式按float32最短十进制表示还原（0.1 仍为 0.1），直到缓存过期被新格式替换
+                values = np.frombuffer(data.pop("knowledge_values"), dtype=np.float32)
+                values = values.astype(str).astype(np.float64).tolist()
+            data["knowledge_state"] = dict(zip(data.pop("knowledge_ids"), values))
+            return student_from_dict(data)
+
+        raise ValueError(f"未知的学生画像缓存格式版本: {version}")
@@ -1,97 +1,174 @@
 from typing import Optional, Dict, List
-from dataclasses import asdict
 import json
 import logging
+from psycopg2.extras import execute_values
 from datetime import datetime, timedelta
+from config import config
 from ...models.student import StudentProfile, LearningStyle
+from .student_codec import StudentCacheCodec
+from ..local_cache import LocalCache, CacheInvalidationBus
+from ..read_through_cache import ReadThroughCache
+from ..db_connector import PreparedStatements, json_loads
 
 logger = logging.getLogger(__name__)
 
+STUDENT_COLUMNS = """id, name, grade_level, learning_style, cognitive_style,
+                           knowledge_state, learning_history, preferences,
+                           emotional_state, learning_goals, available_time"""
+
+STUDENT_STATEMENTS = PreparedStatements({
+    "student_select": f"SELECT {STUDENT_COLUMNS} FROM students WHERE id = $1",
+    "student_update": """
+        UPDATE students SET
+            name = $1,
+            grade_level = $2,
+            learning_style = $3,
+            cognitive_style = $4,
+            knowledge_state = $5,
+            learning_history = $6,
+            preferences = $7,
+            emotional_state = $8,
+            learning_goals = $9,
+            available_time = $10,
+            updated_at = NOW()
+        WHERE id = $11
+    """
+})
+
+def _json_value(value):
+    """JSON列取值：JSONB已由类型转换器解码，文本列在此解码"""
+    if isinstance(value, (str, bytes)):
+        return json_loads(value)
+    return value
+
+def student_from_row(row) -> StudentProfile:
+    """将 STUDENT_COLUMNS 顺序的查询行转换为StudentProfile"""
+    return StudentProfile(
+        id=row[0],
+        name=row[1],
+        grade_level=row[2],
+        learning_style=LearningStyle(row[3]),
+        cognitive_style=row[4],
+        knowledge_state=_json_value(row[5]),
+        learning_history=_json_value(row[6]),
+        preferences=_json_value(row[7]),
+        emotional_state=_json_value(row[8]),
+        learning_goals=_json_value(row[9]),
+        available_time=row[10]
+    )
+
 class StudentRepository:
     """学生数据仓库"""
     
-    def __init__(self, db_connector, redis_client):
+    def __init__(self, db_connector, redis_client, codec: StudentCacheCodec = None,
+                 local_cache: LocalCache = None, invalidation_bus: CacheInvalidationBus = None,
+                 write_buffer=None):
         self.db_connector = db_connector
         self.redis_client = redis_client
         self.cache_ttl = 3600  # 缓存1小时
+        self.batch_size = 1000  # 批量读取时每批的ID/行数
+        self.cache = ReadThroughCache(
+            redis_client,
+            self.cache_ttl,
+            jitter=config.get("redis.ttl_jitter", 0.1),
+            beta=config.get("redis.early_refresh_beta", 1.0)
+        )
+        self.codec = codec or StudentCacheCodec(config.get("redis.student_codec_version", 3))
+        # 进程内缓存层（位于Redis之前），可选
+        self.local_cache = local_cache
+        self.invalidation_bus = invalidation_bus
+        if self.local_cache and self.invalidation_bus:
+            self.invalidation_bus.register("student:", self.local_cache.delete)
+        # 知识状态写回缓冲（KnowledgeStateWriteBuffer），可选
+        self.write_buffer = write_buffer
+    
+    def _active_write_buffer(self):
+        """已初始化的写回缓冲；延迟资源尚未创建时不可能有待写入的变化"""
+        buffer = self.write_buffer
+        if buffer is None or not getattr(buffer, "initialized", True):
+            return None
+        return buffer
+    
+    def _apply_pending(self, student: StudentProfile) -> StudentProfile:
+        """补齐写回缓冲中尚未写入数据库的知识状态变化"""
+        buffer = self._active_write_buffer()
+        if buffer:
+            pending = buffer.pending_for(student.id)
+            if pending:
+                student.knowledge_state.update(pending)
+        return student
+    
+    def _flush_pending(self, student_ids: List[str]):
+        """先写入这些学生在缓冲中的变化，再进行整行更新或失效缓存"""
+        buffer = self._active_write_buffer()
+        if buffer:
+            buffer.flush(student_ids=student_ids)
+    
+    def _cache_get(self, cache_key: str, loader) -> Optional[bytes]:
+        """读取缓存：先查进程内缓存，再经Redis读穿透回源"""
+        if self.local_cache:
+            cached = self.local_cache.get(cache_key)
+            if cached:
+                return cached
+        
+        cached = self.cache.get(cache_key, loader)
+        if cached and self.local_cache:
+            self.local_cache.set(cache_key, cached)
+        return cached
+    
+    def _cache_set(self, cache_key: str, payload: bytes):
+        """写入Redis和进程内缓存"""
+        self.cache.set(cache_key, payload)
+        if self.local_cache:
+            self.local_cache.set(cache_key, payload)
+    
+    def _cache_set_many(self, payloads: Dict[str, bytes]):
+        """批量写入Redis（单次管道往返）和进程内缓存"""
+        if not payloads:
+            return
+        self.cache.set_many(payloads)
+        if self.local_cache:
+            for cache_key, payload in payloads.items():
+                self.local_cache.set(cache_key, payload)
+    
+    def _cache_invalidate(self, cache_keys: List[str]):
+        """失效本进程缓存并通知其他进程"""
+        if self.local_cache:
+            for cache_key in cache_keys:
+                self.local_cache.delete(cache_key)
+        if self.invalidation_bus:
+            self.invalidation_bus.publish(*cache_keys)
     
     def get_student(self, student_id: str) -> Optional[StudentProfile]:
         """获取学生画像"""
-        # 1. 尝试从缓存获取
+        # 缓存未命中时由读穿透缓存合并并发回源
         cache_key = f"student:{student_id}"
-        cached = self.redis_client.get(cache_key)
+        cached = self._cache_get(cache_key, lambda: self._load_student_payload(student_id))
         if cached:
-            data = json.loads(cached)
-            return StudentProfile(
-                id=data["id"],
-                name=data["name"],
-                grade_level=data["grade_level"],
-                learning_style=LearningStyle(data["learning_style"]),
-                cognitive_style=data["cognitive_style"],
-                knowledge_state=data["knowledge_state"],
-                learning_history=data["learning_history"],
-                preferences=data["preferences"],
-                emotional_state=data["emotional_state"],
-                learning_goals=data["learning_goals"],
-                available_time=data["available_time"]
-            )
-        
-        # 2. 从数据库获取
+            return self.codec.decode(cached)
+        return None
+    
+    def _load_student_payload(self, student_id: str) -> Optional[bytes]:
+        """从数据库加载学生画像并编码为缓存格式"""
         with self.db_connector.get_connection(read_only=True) as conn:
             with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT id, name, grade_level, learning_style, cognitive_style,
-                           knowledge_state, learning_history, preferences,
-                           emotional_state, learning_goals, available_time
-                    FROM students WHERE id = %s
-                """, (student_id,))
+                STUDENT_STATEMENTS.execute(cur, "student_select", (student_id,))
                 row = cur.fetchone()
                 if not row:
                     return None
                 
-                # 转换为StudentProfile对象
-                student = StudentProfile(
-                    id=row[0],
-                    name=row[1],
-                    grade_level=row[2],
-                    learning_style=LearningStyle(row[3]),
-                    cognitive_style=row[4],
-                    knowledge_state=json.loads(row[5]),
-                    learning_history=json.loads(row[6]),
-                    preferences=json.loads(row[7]),
-                    emotional_state=json.loads(row[8]),
-                    learning_goals=json.loads(row[9]),
-                    available_time=row[10]
-                )
-                
-                # 缓存结果
-                self.redis_client.setex(
-                    cache_key, 
-                    self.cache_ttl, 
-                    json.dumps(asdict(student))
-                )
-                return student
+                # 读穿透加载和提前刷新均经过这里，补齐缓冲中的变化，避免覆盖缓存中的最新掌握度
+                student = self._apply_pending(student_from_row(row))
+                return self.codec.encode(student)
     
     def update_student(self, student: StudentProfile) -> bool:
         """更新学生画像"""
         try:
+            # 缓冲中较早的知识状态变化先写入，不能在整行更新之后再覆盖
+            self._flush_pending([student.id])
             with self.db_connector.get_connection() as conn:
                 with conn.cursor() as cur:
-                    cur.execute("""
-                        UPDATE students SET
-                            name = %s,
-                            grade_level = %s,
-                            learning_style = %s,
-                            cognitive_style = %s,
-                            knowledge_state = %s,
-                            learning_history = %s,
-                            preferences = %s,
-                            emotional_state = %s,
-                            learning_goals = %s,
-                            available_time = %s,
-                            updated_at = NOW()
-                        WHERE id = %s
-                    """, (
+                    STUDENT_STATEMENTS.execute(cur, "student_update", (
                         student.name,
                         student.grade_level,
                         student.learning_style.value,
@@ -105,79 +182,103 @@ class StudentRepository:
                         student.id
                     ))
             
-            # 更新缓存
+            # 更新缓存，并通知其他进程失效本地副本
             cache_key = f"student:{student.id}"
-            self.redis_client.setex(
-                cache_key, 
-                self.cache_ttl, 
-                json.dumps(asdict(student))
-            )
+            self._cache_set(cache_key, self.codec.encode(student))
+            if self.invalidation_bus:
+                self.invalidation_bus.publish(cache_key)
             return True
         except Exception as e:
             logger.error(f"更新学生信息失败: {str(e)}")
             return False
     
+    def cache_student(self, student: StudentProfile):
+        """仅刷新学生画像缓存（数据库写入由写回缓冲完成）"""
+        cache_key = f"student:{student.id}"
+        self._cache_set(cache_key, self.codec.encode(student))
+        if self.invalidation_bus:
+            self.invalidation_bus.publish(cache_key)
+    
+    def batch_update_knowledge_state(self, knowledge_states: Dict[str, Dict[str, float]],
+                                     invalidate_cache: bool = True) -> bool:
+        """批量合并更新学生知识状态"""
+        if not knowledge_states:
+            return True
+        try:
+            if invalidate_cache:
+                # 失效缓存后会从数据库重新加载，缓冲中较早的变化需先写入
+                self._flush_pending(list(knowledge_states))
+            with self.db_connector.get_connection() as conn:
+                with conn.cursor() as cur:
+                    # knowledge_state 列为文本（JSON字符串）：转为jsonb合并后再以文本写回
+                    execute_values(cur, """
+                        UPDATE students SET
+                            knowledge_state = (
+                                COALESCE(NULLIF(students.knowledge_state, '')::jsonb, '{}'::jsonb)
+                                || data.delta::jsonb
+                            )::text,
+                            updated_at = NOW()
+                        FROM (VALUES %s) AS data(id, delta)
+                        WHERE students.id = data.id
+                    """, [
+                        (student_id, json.dumps(state))
+                        for student_id, state in knowledge_states.items()
+                    ], page_size=1000)
+            
+            # 失效缓存，下次读取时重新加载
+            if invalidate_cache:
+                cache_keys = [f"student:{sid}" for sid in knowledge_states]
+                self.redis_client.delete(*cache_keys)
+                self._cache_invalidate(cache_keys)
+            return True
+        except Exception as e:
+            logger.error(f"批量更新学生知识状态失败: {str(e)}")
+            return False
+    
     def batch_get_students(self, student_ids: List[str]) -> Dict[str, StudentProfile]:
         """批量获取学生画像"""
-        # 1. 先从缓存获取
-        cache_keys = [f"student:{sid}" for sid in student_ids]
-        cached_results = self.redis_client.mget(cache_keys)
-        
         students = {}
-        missing_ids = []
         
-        for sid, cached in zip(student_ids, cached_results):
+        # 1. 先从进程内缓存获取
+        remote_ids = []
+        for sid in student_ids:
+            cached = self.local_cache.get(f"student:{sid}") if self.local_cache else None
             if cached:
-                data = json.loads(cached)
-                students[sid] = StudentProfile(
-                    id=data["id"],
-                    name=data["name"],
-                    grade_level=data["grade_level"],
-                    learning_style=LearningStyle(data["learning_style"]),
-                    cognitive_style=data["cognitive_style"],
-                    knowledge_state=data["knowledge_state"],
-                    learning_history=data["learning_history"],
-                    preferences=data["preferences"],
-                    emotional_state=data["emotional_state"],
-                    learning_goals=data["learning_goals"],
-                    available_time=data["available_time"]
-                )
+                students[sid] = self.codec.decode(cached)
             else:
-                missing_ids.append(sid)
+                remote_ids.append(sid)
         
-        # 2. 从数据库获取缺失的学生
+        # 2. 再从Redis分批获取
+        missing_ids = []
+        for start in range(0, len(remote_ids), self.batch_size):
+            chunk = remote_ids[start:start + self.batch_size]
+            cached_results = self.redis_client.mget([f"student:{sid}" for sid in chunk])
+            for sid, cached in zip(chunk, cached_results):
+                if cached:
+                    students[sid] = self.codec.decode(cached)
+                    if self.local_cache:
+                        self.local_cache.set(f"student:{sid}", cached)
+                else:
+                    missing_ids.append(sid)
+        
+        # 3. 从数据库获取缺失的学生（服务端游标流式读取）
         if missing_ids:
-            with self.db_connector.get_connection(read_only=True) as conn:
-                with conn.cursor() as cur:
-                    placeholders = ", ".join(["%s"] * len(missing_ids))
+            payloads = {}
+            # 服务端游标需要在事务中使用
+            with self.db_connector.get_connection(read_only=True, autocommit=False) as conn:
+                with conn.cursor(name="batch_get_students") as cur:
+                    cur.itersize = self.batch_size
                     cur.execute(f"""
-                        SELECT id, name, grade_level, learning_style, cognitive_style,
-                               knowledge_state, learning_history, preferences,
-                               emotional_state, learning_goals, available_time
-                        FROM students WHERE id IN ({placeholders})
-                    """, tuple(missing_ids))
+                        SELECT {STUDENT_COLUMNS}
+                        FROM students WHERE id = ANY(%s)
+                    """, (missing_ids,))
                     
-                    for row in cur.fetchall():
-                        student = StudentProfile(
-                            id=row[0],
-                            name=row[1],
-                            grade_level=row[2],
-                            learning_style=LearningStyle(row[3]),
-                            cognitive_style=row[4],
-                            knowledge_state=json.loads(row[5]),
-                            learning_history=json.loads(row[6]),
-                            preferences=json.loads(row[7]),
-                            emotional_state=json.loads(row[8]),
-                            learning_goals=json.loads(row[9]),
-                            available_time=row[10]
-                        )
+                    for row in cur:
+                        student = self._apply_pending(student_from_row(row))
                         students[row[0]] = student
-                        
-                        # 缓存结果
-                        self.redis_client.setex(
-                            f"student:{row[0]}", 
-                            self.cache_ttl, 
-                            json.dumps(asdict(student))
-                        )
+                        payloads[f"student:{row[0]}"] = self.codec.encode(student)
+            
+            # 4. 连接归还后一次性管道写回缓存
+            self._cache_set_many(payloads)
         
         return students
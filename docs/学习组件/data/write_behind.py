@@ -0,0 +1,138 @@
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEAD_LETTER_KEY = "dead_letter:knowledge_state"
+
+class KnowledgeStateWriteBuffer:
+    """知识状态写回缓冲：累积各学生的掌握度变化，定期批量合并写入数据库
+
+    进程异常退出时最多丢失一个刷新周期（flush_interval）内的变化，正常关闭时会全部写入。
+    连续 max_retries 次写入失败的学生变化转入死信列表（Redis列表 DEAD_LETTER_KEY），
+    不再无限重试；Redis同样不可用时写入错误日志。
+    """
+
+    def __init__(self, student_repo, flush_interval: float = 2.0, max_pending: int = 5000,
+                 max_retries: int = 5, redis_client=None):
+        self.student_repo = student_repo
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.redis_client = redis_client  # 死信存储，可选
+        self.pending: Dict[str, Dict[str, float]] = {}  # {学生ID: {知识点ID: 掌握度}}
+        self.in_flight: Dict[str, Dict[str, float]] = {}  # 正在写入数据库的变化
+        self.failures: Dict[str, int] = {}  # {学生ID: 连续写入失败次数}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def add(self, student_id: str, deltas: Dict[str, float]):
+        """记录学生知识状态变化，同一知识点以最新值为准"""
+        with self._lock:
+            self.pending.setdefault(student_id, {}).update(deltas)
+            pending_count = len(self.pending)
+        if pending_count >= self.max_pending:
+            self._wakeup.set()
+
+    def pending_for(self, student_id: str) -> Dict[str, float]:
+        """学生尚未写入数据库的变化（含正在写入的部分），从数据库加载画像后用于补齐"""
+        with self._lock:
+            in_flight, pending = self.in_flight.get(student_id), self.pending.get(student_id)
+            if not in_flight and not pending:
+                return {}
+            return {**(in_flight or {}), **(pending or {})}
+
+    def start(self):
+        """启动后台刷新线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="knowledge-state-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self, student_ids: Optional[Iterable[str]] = None) -> int:
+        """将累积的变化批量写入数据库，返回写入的学生数
+
+        student_ids 不为空时只写入这些学生的变化：整行更新或失效缓存之前调用，
+        保证缓冲中较早的变化不会覆盖之后的写入，也不会在缓存重新加载时丢失。
+        """
+        with self._flush_lock:
+            with self._lock:
+                if student_ids is None:
+                    batch, self.pending = self.pending, {}
+                else:
+                    batch = {sid: self.pending.pop(sid) for sid in student_ids if sid in self.pending}
+                if not batch:
+                    return 0
+                self.in_flight = batch
+
+            # 缓存已在评估时更新，这里只写数据库
+            try:
+                written = self.student_repo.batch_update_knowledge_state(batch, invalidate_cache=False)
+            except Exception as e:
+                logger.error(f"知识状态批量写入异常: {str(e)}")
+                written = False
+
+            with self._lock:
+                self.in_flight = {}
+                if written:
+                    for student_id in batch:
+                        self.failures.pop(student_id, None)
+                    return len(batch)
+                dead = self._requeue(batch)
+
+            if dead:
+                self._dead_letter(dead)
+            if len(batch) > len(dead):
+                logger.warning(f"知识状态批量写入失败，{len(batch) - len(dead)} 名学生的变化将在下个周期重试")
+            return 0
+
+    def _requeue(self, batch: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+        """写入失败时放回缓冲区（保留期间产生的更新值），返回超过重试次数的变化（需持有 _lock）"""
+        dead = {}
+        for student_id, deltas in batch.items():
+            newer = self.pending.pop(student_id, None)
+            if newer:
+                deltas.update(newer)
+            attempts = self.failures.get(student_id, 0) + 1
+            if attempts > self.max_retries:
+                self.failures.pop(student_id, None)
+                dead[student_id] = deltas
+            else:
+                self.failures[student_id] = attempts
+                self.pending[student_id] = deltas
+        return dead
+
+    def _dead_letter(self, batch: Dict[str, Dict[str, float]]):
+        """保存多次写入失败的变化，供排查后人工重放"""
+        failed_at = datetime.now().isoformat()
+        entries = [
+            json.dumps({"student_id": student_id, "deltas": deltas, "failed_at": failed_at})
+            for student_id, deltas in batch.items()
+        ]
+        try:
+            if self.redis_client is None:
+                raise RuntimeError("未配置死信存储")
+            self.redis_client.rpush(DEAD_LETTER_KEY, *entries)
+            logger.error(f"{len(batch)} 名学生的知识状态变化写入失败超过 {self.max_retries} 次，已转入死信 {DEAD_LETTER_KEY}")
+        except Exception as e:
+            logger.error(f"知识状态变化转入死信失败 ({str(e)})，丢弃的变化: {entries}")
+
+    def close(self):
+        """停止后台线程并写入剩余变化"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=self.flush_interval + 5)
+        flushed = self.flush()
+        logger.info(f"知识状态写回缓冲已关闭，最后写入 {flushed} 名学生")
@@ -1,13 +1,21 @@
+import asyncio
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
 import numpy as np
 import networkx as nx
-from data import student_repo, knowledge_repo, path_repo, record_repo
-from models import model_manager, StudentProfile, LearningPath, KnowledgeNode, LearningStrategy
+from data import student_repo, knowledge_repo, path_repo, record_repo, io_executor
+from data import knowledge_feature_cache, knowledge_graph_cache, knowledge_state_buffer
+from data import async_student_repo, async_knowledge_repo, async_path_repo, async_record_repo
+from data.circuit_breaker import CircuitOpenError
+from config import config
+from models import model_manager, batch_predictor, prediction_cache, StudentProfile, LearningPath, KnowledgeNode, LearningStrategy
 
 logger = logging.getLogger(__name__)
 
+# 掌握度比较容差：缓存中的旧格式画像以float32保存，与请求中的float64值不会完全相等
+MASTERY_TOLERANCE = 1e-6
+
 class LearningPathService:
     """学习路径服务，负责生成和更新个性化学习路径"""
     
@@ -68,72 +76,268 @@ class LearningPathService:
             # 6. 获取路径中的知识点详情
             path_nodes = knowledge_repo.get_knowledge_nodes(path_sequence)
             
-            # 7. 计算预计总学习时间
-            total_time = sum(node.estimated_time for node in path_nodes)
-            
-            # 8. 生成自适应元素
-            adaptive_elements = self._generate_adaptive_elements(student, path_nodes, strategy)
-            
-            # 9. 创建学习路径对象
-            learning_path = LearningPath(
-                student_id=student.id,
-                subject=subject,
-                nodes=path_nodes,
-                sequence=path_sequence,
-                estimated_time=total_time,
-                adaptive_elements=adaptive_elements,
-                created_at=datetime.now(),
-                updated_at=datetime.now()
-            )
+            # 7. 创建学习路径对象
+            learning_path = self._build_learning_path(student, subject, path_nodes, path_sequence, strategy)
             
-            # 10. 保存学习路径
+            # 8. 保存学习路径
             path_repo.save_learning_path(learning_path)
             
             logger.info(f"为学生 {student_id} 生成 {subject} 学习路径成功")
             return learning_path
+        except CircuitOpenError:
+            # 下游依赖已熔断，交由 CircuitBreakerMiddleware 快速返回503
+            raise
         except Exception as e:
             logger.error(f"生成学习路径失败: {str(e)}")
             return None
     
+    async def generate_path_async(self, student_id: str, subject: str) -> Optional[LearningPath]:
+        """生成个性化学习路径（异步版本，阻塞IO不占用事件循环）"""
+        try:
+            # 1. 并发获取学生画像、答题记录和学习行为
+            student, answer_records, learning_behavior = await asyncio.gather(
+                async_student_repo.get_student(student_id),
+                async_record_repo.get_student_answer_records(student_id, subject),
+                async_record_repo.get_student_learning_behavior(student_id, subject)
+            )
+            if not student:
+                logger.error(f"学生 {student_id} 不存在")
+                return None
+            
+            # 2. 评估学生知识掌握程度
+            mastery_levels = await self.assess_knowledge_async(
+                student, subject, answer_records, learning_behavior
+            )
+            
+            # 3. 找出薄弱知识点并选择学习策略
+            weak_nodes = self.find_weak_nodes(mastery_levels)
+            strategy = self.select_learning_strategy(student)
+            
+            # 4. 生成学习路径序列（需访问知识图谱，在IO线程池中执行）
+            loop = asyncio.get_running_loop()
+            path_sequence = await loop.run_in_executor(
+                io_executor, self._generate_path_sequence, weak_nodes, student, strategy, subject
+            )
+            
+            # 5. 获取路径中的知识点详情
+            path_nodes = await async_knowledge_repo.get_knowledge_nodes(path_sequence)
+            
+            # 6. 创建并保存学习路径
+            learning_path = self._build_learning_path(student, subject, path_nodes, path_sequence, strategy)
+            await async_path_repo.save_learning_path(learning_path)
+            
+            logger.info(f"为学生 {student_id} 生成 {subject} 学习路径成功")
+            return learning_path
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logger.error(f"生成学习路径失败: {str(e)}")
+            return None
+    
+    def generate_paths_batch(self, student_ids: List[str], subject: str) -> Dict[str, LearningPath]:
+        """批量生成学习路径（班级/年级整体重算），按块处理以限制内存"""
+        chunk_size = config.get("service.batch_chunk_size", 1000)
+        learning_paths = {}
+        for start in range(0, len(student_ids), chunk_size):
+            chunk = student_ids[start:start + chunk_size]
+            try:
+                learning_paths.update(self._generate_paths_chunk(chunk, subject))
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                logger.error(f"批量生成学习路径失败 (学生 {start}-{start + len(chunk)}): {str(e)}")
+        
+        logger.info(f"批量生成 {subject} 学习路径完成: {len(learning_paths)}/{len(student_ids)}")
+        return learning_paths
+    
+    def _generate_paths_chunk(self, student_ids: List[str], subject: str) -> Dict[str, LearningPath]:
+        """为一批学生生成学习路径：一次批量读取、一次整体推理、一次批量写入"""
+        # 1. 批量获取学生画像
+        students = student_repo.batch_get_students(student_ids)
+        students = [students[sid] for sid in student_ids if sid in students]
+        if not students:
+            return {}
+        
+        knowledge_nodes, node_matrix = knowledge_feature_cache.get(subject)
+        if not knowledge_nodes:
+            return {}
+        
+        # 2. 并发获取答题记录和学习行为，组合学生特征
+        answer_records = io_executor.map(
+            lambda student: record_repo.get_student_answer_records(student.id, subject), students
+        )
+        learning_behaviors = io_executor.map(
+            lambda student: record_repo.get_student_learning_behavior(student.id, subject), students
+        )
+        student_features = np.array([
+            np.concatenate([self._prepare_answer_features(records), self._prepare_behavior_features(behavior)])
+            for records, behavior in zip(answer_records, learning_behaviors)
+        ], dtype=node_matrix.dtype)
+        
+        # 3. 学生 × 知识点整体推理
+        mastery_matrix = self._predict_mastery_matrix(student_features, node_matrix)
+        
+        # 4. 逐个学生生成路径序列
+        results = []
+        for student, mastery_row in zip(students, mastery_matrix):
+            mastery_levels = dict(zip(knowledge_nodes, mastery_row.tolist()))
+            student.knowledge_state.update(mastery_levels)
+            
+            weak_nodes = self.find_weak_nodes(mastery_levels)
+            strategy = self.select_learning_strategy(student)
+            path_sequence = self._generate_path_sequence(weak_nodes, student, strategy, subject)
+            results.append((student, strategy, path_sequence, mastery_levels))
+        
+        # 5. 一次性获取所有路径涉及的知识点详情
+        node_ids = list({node_id for _, _, sequence, _ in results for node_id in sequence})
+        nodes_by_id = {node.id: node for node in knowledge_repo.get_knowledge_nodes(node_ids)} if node_ids else {}
+        
+        learning_paths = {}
+        for student, strategy, path_sequence, _ in results:
+            path_nodes = [nodes_by_id[node_id] for node_id in path_sequence if node_id in nodes_by_id]
+            learning_paths[student.id] = self._build_learning_path(
+                student, subject, path_nodes, path_sequence, strategy
+            )
+        
+        # 6. 批量写入知识状态和学习路径
+        student_repo.batch_update_knowledge_state({
+            student.id: mastery_levels for student, _, _, mastery_levels in results
+        })
+        path_repo.save_learning_paths(list(learning_paths.values()))
+        
+        return learning_paths
+    
+    def _predict_mastery_matrix(self, student_features: np.ndarray, node_matrix: np.ndarray) -> np.ndarray:
+        """对 学生 × 知识点 的全部组合推理，返回 (学生数, 知识点数) 的掌握度矩阵"""
+        student_count, feature_dim = student_features.shape
+        node_count = node_matrix.shape[0]
+        
+        # 每次推理的行数上限
+        max_rows = config.get("model.batch_inference_rows", 65536)
+        students_per_step = max(1, max_rows // node_count)
+        
+        mastery_matrix = np.empty((student_count, node_count), dtype=np.float32)
+        for start in range(0, student_count, students_per_step):
+            block = student_features[start:start + students_per_step]
+            features = np.empty(
+                (len(block), node_count, feature_dim + node_matrix.shape[1]), dtype=node_matrix.dtype
+            )
+            features[:, :, :feature_dim] = block[:, np.newaxis, :]
+            features[:, :, feature_dim:] = node_matrix[np.newaxis, :, :]
+            
+            scores = model_manager.predict("knowledge_assessment", features.reshape(-1, features.shape[2]))
+            mastery_matrix[start:start + len(block)] = scores.reshape(len(block), node_count)
+        
+        return mastery_matrix
+    
+    def _build_learning_path(self, student: StudentProfile, subject: str, path_nodes: List[KnowledgeNode],
+                             path_sequence: List[str], strategy: LearningStrategy) -> LearningPath:
+        """根据路径序列和知识点详情创建学习路径对象"""
+        # 计算预计总学习时间
+        total_time = sum(node.estimated_time for node in path_nodes)
+        
+        # 生成自适应元素
+        adaptive_elements = self._generate_adaptive_elements(student, path_nodes, strategy)
+        
+        return LearningPath(
+            student_id=student.id,
+            subject=subject,
+            nodes=path_nodes,
+            sequence=path_sequence,
+            estimated_time=total_time,
+            adaptive_elements=adaptive_elements,
+            created_at=datetime.now(),
+            updated_at=datetime.now()
+        )
+    
     def assess_knowledge(self, student: StudentProfile, subject: str) -> Dict[str, float]:
         """评估学生知识掌握程度"""
         # 1. 获取学生答题记录和学习行为
         answer_records = record_repo.get_student_answer_records(student.id, subject)
         learning_behavior = record_repo.get_student_learning_behavior(student.id, subject)
         
-        # 2. 提取特征
-        answer_features = self._prepare_answer_features(answer_records)
-        behavior_features = self._prepare_behavior_features(learning_behavior)
+        # 2. 查询推理结果缓存，未命中时组合批量特征
+        knowledge_nodes, cache_key, mastery_scores, batch_features = self._prepare_assessment(
+            answer_records, learning_behavior, subject
+        )
+        if not knowledge_nodes:
+            return {}
+        
+        # 3. 批量预测
+        if mastery_scores is None:
+            mastery_scores = batch_predictor.predict("knowledge_assessment", batch_features).flatten()
+            prediction_cache.set(cache_key, mastery_scores)
+        mastery_levels = {
+            node_id: float(score) 
+            for node_id, score in zip(knowledge_nodes, mastery_scores)
+        }
         
-        # 3. 获取该学科所有知识点
-        knowledge_nodes = knowledge_repo.get_knowledge_node_ids_by_subject(subject)
+        # 4. 更新学生知识状态（缓存立即更新，数据库由写回缓冲批量写入）
+        student.knowledge_state.update(mastery_levels)
+        student_repo.cache_student(student)
+        knowledge_state_buffer.add(student.id, mastery_levels)
+        
+        return mastery_levels
+    
+    async def assess_knowledge_async(self, student: StudentProfile, subject: str,
+                                     answer_records: List[Dict[str, Any]],
+                                     learning_behavior: Dict[str, Any]) -> Dict[str, float]:
+        """评估学生知识掌握程度（异步版本，答题记录和学习行为由调用方并发获取）"""
+        loop = asyncio.get_running_loop()
+        knowledge_nodes, cache_key, mastery_scores, batch_features = await loop.run_in_executor(
+            io_executor, self._prepare_assessment, answer_records, learning_behavior, subject
+        )
         if not knowledge_nodes:
             return {}
         
-        # 4. 批量获取知识点特征并组合
-        batch_features = []
-        for node_id in knowledge_nodes:
-            node_features = knowledge_repo.get_node_features(node_id)
-            combined = np.concatenate([answer_features, behavior_features, node_features])
-            batch_features.append(combined)
-        
-        # 5. 批量预测
-        if batch_features:
-            batch_features = np.array(batch_features)
-            mastery_scores = model_manager.predict("knowledge_assessment", batch_features).flatten()
-            mastery_levels = {
-                node_id: float(score) 
-                for node_id, score in zip(knowledge_nodes, mastery_scores)
-            }
-        else:
-            mastery_levels = {}
+        if mastery_scores is None:
+            mastery_scores = (await batch_predictor.predict_async("knowledge_assessment", batch_features)).flatten()
+            await loop.run_in_executor(io_executor, prediction_cache.set, cache_key, mastery_scores)
+        mastery_levels = {
+            node_id: float(score) 
+            for node_id, score in zip(knowledge_nodes, mastery_scores)
+        }
         
-        # 6. 更新学生知识状态
         student.knowledge_state.update(mastery_levels)
-        student_repo.update_student(student)
+        await async_student_repo.cache_student(student)
+        knowledge_state_buffer.add(student.id, mastery_levels)
         
         return mastery_levels
     
+    def _prepare_assessment(self, answer_records: List[Dict[str, Any]], learning_behavior: Dict[str, Any],
+                            subject: str) -> Tuple[List[str], Optional[str], Optional[np.ndarray], Optional[np.ndarray]]:
+        """准备知识评估，返回 (知识点ID列表, 推理缓存键, 缓存命中的掌握度向量, 未命中时的批量特征矩阵)"""
+        # 1. 提取学生特征
+        answer_features = self._prepare_answer_features(answer_records)
+        behavior_features = self._prepare_behavior_features(learning_behavior)
+        student_features = np.concatenate([answer_features, behavior_features])
+        
+        # 2. 获取该学科知识点特征矩阵（进程内缓存）
+        knowledge_nodes, node_matrix = knowledge_feature_cache.get(subject)
+        if not knowledge_nodes:
+            return [], None, None, None
+        
+        # 3. 学生特征和知识点数据都未变化时直接使用缓存的推理结果
+        cache_key = prediction_cache.key(
+            "knowledge_assessment", student_features, subject, knowledge_feature_cache.version(subject)
+        )
+        mastery_scores = prediction_cache.get(cache_key)
+        if mastery_scores is not None and len(mastery_scores) == len(knowledge_nodes):
+            return knowledge_nodes, cache_key, mastery_scores, None
+        
+        return knowledge_nodes, cache_key, None, self._build_assessment_features(student_features, node_matrix)
+    
+    def _build_assessment_features(self, student_features: np.ndarray, node_matrix: np.ndarray) -> np.ndarray:
+        """将学生特征广播到每个知识点行，与知识点特征拼接为批量特征矩阵"""
+        feature_dim = len(student_features)
+        batch_features = np.empty(
+            (node_matrix.shape[0], feature_dim + node_matrix.shape[1]), dtype=node_matrix.dtype
+        )
+        batch_features[:, :feature_dim] = student_features
+        batch_features[:, feature_dim:] = node_matrix
+        
+        return batch_features
+    
     def find_weak_nodes(self, mastery_levels: Dict[str, float], threshold: float = 0.6) -> List[str]:
         """找出知识薄弱点"""
         weak_nodes = [
@@ -171,23 +375,20 @@ class LearningPathService:
         if not weak_nodes:
             return []
         
-        # 获取学科知识子图
-        knowledge_graph = knowledge_repo.get_knowledge_subgraph(subject)
+        # 获取学科编译知识图谱（进程内缓存）
+        compiled_graph = knowledge_graph_cache.get(subject)
+        knowledge_graph = compiled_graph.graph
         
-        # 构建包含薄弱点及其前置知识的子图
-        subgraph_nodes = set(weak_nodes)
-        for node in weak_nodes:
-            if node in knowledge_graph:
-                subgraph_nodes.update(nx.ancestors(knowledge_graph, node))
-        
-        subgraph = knowledge_graph.subgraph(subgraph_nodes)
-        
-        # 拓扑排序
-        try:
-            sequence = list(nx.topological_sort(subgraph))
-        except nx.NetworkXError:
-            # 存在环时使用启发式排序
-            sequence = self._heuristic_sort(subgraph, weak_nodes)
+        if compiled_graph.is_dag:
+            # 薄弱点及其前置知识的祖先闭包，按全局拓扑序排列
+            sequence = compiled_graph.closure_sequence(weak_nodes)
+        else:
+            # 存在环时构建子图并使用启发式排序
+            subgraph_nodes = set(weak_nodes)
+            for node in weak_nodes:
+                if node in knowledge_graph:
+                    subgraph_nodes.update(nx.ancestors(knowledge_graph, node))
+            sequence = self._heuristic_sort(knowledge_graph.subgraph(subgraph_nodes), weak_nodes)
         
         # 根据学习策略调整序列
         if strategy.id == "step_by_step":
@@ -217,10 +418,96 @@ class LearningPathService:
         
         # 判断是否需要更新路径
         if self._check_path_update_needed(current_path, progress):
-            return self.generate_path(student_id, subject)
+            return self._update_path_incremental(current_path, progress)
+        
+        return None
+    
+    async def update_path_async(self, student_id: str, subject: str,
+                                progress: Dict[str, float]) -> Optional[LearningPath]:
+        """更新学习路径（异步版本）"""
+        current_path = await async_path_repo.get_latest_learning_path(student_id, subject)
+        if not current_path:
+            return await self.generate_path_async(student_id, subject)
+        
+        if self._check_path_update_needed(current_path, progress):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(io_executor, self._update_path_incremental, current_path, progress)
         
         return None
     
+    def _update_path_incremental(self, current_path: LearningPath,
+                                 progress: Dict[str, float]) -> Optional[LearningPath]:
+        """根据学习进度增量更新已有路径
+        
+        只重新判定掌握度变化的节点是否薄弱，其余节点沿用路径中已有的判定，不再调用模型
+        （评估模型的输入是答题记录和学习行为，不含进度，重新推理只会得到相同的掌握度）。
+        路径序列与完整生成使用同一流程（前置闭包、学习策略调整、长度限制），只查询新增节点的详情，
+        并通过 path_repo.update_learning_path(learning_path, added, removed) 只保存路径差异。
+        """
+        student_id, subject = current_path.student_id, current_path.subject
+        try:
+            student = student_repo.get_student(student_id)
+            if not student:
+                logger.error(f"学生 {student_id} 不存在")
+                return None
+            
+            # 1. 找出掌握度发生变化的节点（缓存中的掌握度可能经过float32舍入，按容差比较）
+            previous = student.knowledge_state
+            changed = {
+                node_id for node_id, mastery in progress.items()
+                if node_id not in previous or abs(previous[node_id] - mastery) > MASTERY_TOLERANCE
+            }
+            if not changed:
+                return None
+            
+            # 2. 只重新判定变化节点是否薄弱
+            mastery_levels = {**previous, **progress}
+            old_weak = set(self.find_weak_nodes({
+                node_id: previous[node_id] for node_id in current_path.sequence if node_id in previous
+            }))
+            new_weak = (old_weak - changed) | set(self.find_weak_nodes({
+                node_id: mastery_levels[node_id] for node_id in changed
+            }))
+            if not new_weak:
+                # 路径中的薄弱点均已掌握，重新评估生成新路径
+                return self.generate_path(student_id, subject)
+            
+            # 3. 更新学生知识状态（缓存立即更新，数据库由写回缓冲批量写入）
+            student.knowledge_state.update(progress)
+            student_repo.cache_student(student)
+            knowledge_state_buffer.add(student.id, progress)
+            
+            # 4. 按新的薄弱点生成序列，与完整生成的策略调整一致
+            strategy = self.select_learning_strategy(student)
+            weak_nodes = self.find_weak_nodes({node_id: mastery_levels[node_id] for node_id in new_weak})
+            sequence = self._generate_path_sequence(weak_nodes, student, strategy, subject)
+            old_sequence = current_path.sequence
+            if sequence == old_sequence:
+                return None
+            
+            old_set, new_set = set(old_sequence), set(sequence)
+            added = [node_id for node_id in sequence if node_id not in old_set]
+            removed = [node_id for node_id in old_sequence if node_id not in new_set]
+            
+            # 5. 只查询新增节点的详情
+            nodes_by_id = {node.id: node for node in current_path.nodes}
+            if added:
+                nodes_by_id.update({node.id: node for node in knowledge_repo.get_knowledge_nodes(added)})
+            path_nodes = [nodes_by_id[node_id] for node_id in sequence if node_id in nodes_by_id]
+            
+            # 6. 保存路径差异
+            learning_path = self._build_learning_path(student, subject, path_nodes, sequence, strategy)
+            learning_path.created_at = current_path.created_at
+            path_repo.update_learning_path(learning_path, added=added, removed=removed)
+            
+            logger.info(f"学生 {student_id} 的 {subject} 学习路径已增量更新 (新增 {len(added)}，移除 {len(removed)})")
+            return learning_path
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logger.error(f"增量更新学习路径失败: {str(e)}")
+            return None
+    
     def _check_path_update_needed(self, path: LearningPath, progress: Dict[str, float]) -> bool:
         """检查是否需要更新路径"""
         current_sequence = path.sequence
@@ -1,7 +1,23 @@
+from config import config
+from data import redis_client
 from .model_manager import ModelManager
+from .batching import BatchingPredictor
+from .prediction_cache import PredictionCache
 from .student import StudentProfile, LearningStyle, CognitiveLevel
 from .knowledge import KnowledgeNode
 from .path import LearningPath, LearningStrategy
 
 # 初始化模型管理器
 model_manager = ModelManager()
+
+# 初始化批量推理调度器
+batch_predictor = BatchingPredictor(model_manager)
+
+# 初始化推理结果缓存（可选Redis共享层）
+prediction_cache = PredictionCache(
+    model_manager,
+    redis_client=redis_client if config.get("model.prediction_cache.redis", False) else None,
+    max_entries=config.get("model.prediction_cache.max_entries", 50000),
+    max_bytes=config.get("model.prediction_cache.max_bytes", 128 * 1024 * 1024),
+    ttl=config.get("model.prediction_cache.ttl", 600)
+)
@@ -0,0 +1,157 @@
+import time
+import queue
+import asyncio
+import logging
+import threading
+import numpy as np
+from concurrent.futures import Future
+from typing import Dict, List, Sequence, Tuple, Union
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# 单输入模型为二维数组，多输入模型为按行对齐的数组列表
+Features = Union[np.ndarray, Sequence[np.ndarray]]
+
+def _rows(features: Features) -> int:
+    return len(features[0]) if isinstance(features, (list, tuple)) else len(features)
+
+def _concatenate(batch: List[Features]) -> Features:
+    """按行拼接一个批次的输入，多输入模型逐个输入拼接"""
+    if not isinstance(batch[0], (list, tuple)):
+        return np.concatenate(batch)
+    arity = len(batch[0])
+    if any(not isinstance(features, (list, tuple)) or len(features) != arity for features in batch):
+        raise ValueError("同一模型的推理请求输入个数不一致")
+    return [np.concatenate([features[i] for features in batch]) for i in range(arity)]
+
+class BatchingPredictor:
+    """动态微批推理调度器，将同一模型的并发推理请求合并为一个批次"""
+
+    def __init__(self, model_manager, max_batch_size: int = None, max_wait_ms: float = None):
+        self.model_manager = model_manager
+        self.max_batch_size = max_batch_size or config.get("model.batching.max_batch_size", 4096)
+        self.max_wait = (max_wait_ms if max_wait_ms is not None
+                         else config.get("model.batching.max_wait_ms", 5)) / 1000.0
+        self.queues: Dict[str, queue.Queue] = {}  # 请求队列 {模型名称: 队列}
+        self.workers: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _get_queue(self, model_name: str) -> queue.Queue:
+        """获取模型对应的请求队列，首次使用时启动调度线程（调用方持有 _lock）"""
+        request_queue = self.queues.get(model_name)
+        if request_queue is None:
+            request_queue = queue.Queue()
+            worker = threading.Thread(
+                target=self._run,
+                args=(model_name, request_queue),
+                name=f"batching-{model_name}",
+                daemon=True
+            )
+            self.queues[model_name] = request_queue
+            self.workers[model_name] = worker
+            worker.start()
+        return request_queue
+
+    def submit(self, model_name: str, features: Features) -> Future:
+        """提交推理请求，返回对应本次调用结果切片的Future
+
+        多输入模型传入数组列表，各输入按行对齐，合并时逐个输入拼接。
+        """
+        future = Future()
+        # 与 close 互斥：关闭信号入队后不会再有请求排在其后
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("批量推理调度器已关闭")
+            self._get_queue(model_name).put((features, future))
+        return future
+
+    def predict(self, model_name: str, features: Features) -> np.ndarray:
+        """同步推理，阻塞直到所在批次完成"""
+        return self.submit(model_name, features).result()
+
+    async def predict_async(self, model_name: str, features: Features) -> np.ndarray:
+        """异步推理，等待期间不阻塞事件循环"""
+        return await asyncio.wrap_future(self.submit(model_name, features))
+
+    def _collect_batch(self, request_queue: queue.Queue) -> List[Tuple[Features, Future]]:
+        """收集一个批次：达到最大批量或等待超时即返回"""
+        first = request_queue.get()
+        if first is None:
+            return []
+
+        batch = [first]
+        rows = _rows(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = request_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # 关闭信号放回队列，本批次处理完后退出
+                request_queue.put(None)
+                break
+            batch.append(item)
+            rows += _rows(item[0])
+        return batch
+
+    def _run(self, model_name: str, request_queue: queue.Queue):
+        """调度线程主循环"""
+        while True:
+            batch = self._collect_batch(request_queue)
+            if not batch:
+                break
+
+            # 过滤调用方已取消的请求
+            batch = [(features, future) for features, future in batch
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                if len(batch) == 1:
+                    batch[0][1].set_result(self.model_manager.predict(model_name, batch[0][0]))
+                    continue
+
+                features = _concatenate([features for features, _ in batch])
+                outputs = self.model_manager.predict(model_name, features)
+
+                # 按各请求行数切分结果
+                offsets = np.cumsum([_rows(features) for features, _ in batch])[:-1]
+                for (_, future), output in zip(batch, np.split(outputs, offsets)):
+                    future.set_result(output)
+            except Exception as e:
+                logger.error(f"模型 {model_name} 批量推理失败: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def close(self):
+        """停止调度线程，已入队的请求处理完后退出；调度线程未能按时退出时，仍在队列中的请求以异常结束"""
+        with self._lock:
+            self._closed = True
+            for request_queue in self.queues.values():
+                request_queue.put(None)
+            queues, workers = dict(self.queues), dict(self.workers)
+            self.queues.clear()
+            self.workers.clear()
+
+        for model_name, worker in workers.items():
+            worker.join(timeout=5)
+            request_queue = queues[model_name]
+            while True:
+                try:
+                    item = request_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None and item[1].set_running_or_notify_cancel():
+                    item[1].set_exception(RuntimeError("批量推理调度器已关闭"))
+            if worker.is_alive():
+                # 关闭信号可能已被取出，放回以便调度线程完成当前批次后退出
+                request_queue.put(None)
+        logger.info("批量推理调度器已关闭")
@@ -0,0 +1,242 @@
+import os
+import glob
+import json
+import shutil
+import logging
+import tempfile
+import time
+import numpy as np
+from typing import Any, Dict, List, Union
+
+logger = logging.getLogger(__name__)
+
+# 导出格式版本
+LITE_FORMAT_VERSION = 1
+
+# 新权重目录生成后，旧目录至少保留的秒数，留给仍在加载旧目录的worker
+STALE_WEIGHTS_GRACE = 600
+
+def _softmax(x: np.ndarray) -> np.ndarray:
+    exp = np.exp(x - x.max(axis=-1, keepdims=True))
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0, out=x),
+    "sigmoid": lambda x: 0.5 * (1.0 + np.tanh(0.5 * x)),  # 数值稳定的sigmoid
+    "tanh": np.tanh,
+    "softmax": _softmax
+}
+
+SUPPORTED_LAYERS = {"InputLayer", "Dense", "Dropout", "Concatenate"}
+
+def _layer_refs(obj) -> List[str]:
+    """从Keras配置的 inbound_nodes / input_layers 中提取层名（兼容Keras 2与Keras 3格式）"""
+    names = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            if "keras_history" in node:
+                names.append(node["keras_history"][0])
+                return
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, (list, tuple)):
+            if len(node) >= 3 and isinstance(node[0], str) and isinstance(node[1], int):
+                names.append(node[0])
+                return
+            for value in node:
+                walk(value)
+
+    walk(obj)
+    return names
+
+def export_lite_model(model, path: str) -> Dict[str, Any]:
+    """将Keras函数式模型导出为NumPy推理格式（.npz），返回模型结构描述"""
+    model_config = model.get_config()
+    layers = []
+    arrays = {}
+    for layer_config in model_config["layers"]:
+        class_name = layer_config["class_name"]
+        name = layer_config["config"]["name"]
+        if class_name not in SUPPORTED_LAYERS:
+            raise ValueError(f"NumPy推理不支持的层类型: {class_name} ({name})")
+
+        spec = {"name": name, "type": class_name, "inbound": _layer_refs(layer_config.get("inbound_nodes", []))}
+        if class_name == "Dense":
+            activation = layer_config["config"].get("activation", "linear")
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"NumPy推理不支持的激活函数: {activation} ({name})")
+            spec["activation"] = activation
+            kernel, *rest = model.get_layer(name).get_weights()
+            arrays[f"{name}/kernel"] = kernel.astype(np.float32)
+            spec["use_bias"] = bool(rest)
+            if rest:
+                arrays[f"{name}/bias"] = rest[0].astype(np.float32)
+        elif class_name == "InputLayer":
+            # Keras 2 为 batch_input_shape，Keras 3 为 batch_shape
+            shape = layer_config["config"].get("batch_shape") or layer_config["config"].get("batch_input_shape")
+            spec["shape"] = list(shape[1:]) if shape else None
+        elif class_name == "Concatenate":
+            spec["axis"] = layer_config["config"].get("axis", -1)
+        layers.append(spec)
+
+    spec = {
+        "format_version": LITE_FORMAT_VERSION,
+        "inputs": _layer_refs(model_config["input_layers"]),
+        "outputs": _layer_refs(model_config["output_layers"]),
+        "layers": layers
+    }
+    with open(path, "wb") as f:
+        np.savez(f, __spec__=np.frombuffer(json.dumps(spec).encode("utf-8"), dtype=np.uint8), **arrays)
+    return spec
+
+class LiteModel:
+    """纯NumPy前向推理模型，接口与 keras.Model.predict 兼容"""
+
+    def __init__(self, spec: Dict[str, Any], arrays: Dict[str, np.ndarray]):
+        if spec.get("format_version") != LITE_FORMAT_VERSION:
+            raise ValueError(f"不支持的NumPy模型格式版本: {spec.get('format_version')}")
+        self.spec = spec
+        self.input_names: List[str] = spec["inputs"]
+        self.output_names: List[str] = spec["outputs"]
+        self.layers = spec["layers"]
+        self.arrays = arrays
+        shapes = {layer["name"]: layer.get("shape") for layer in self.layers if layer["type"] == "InputLayer"}
+        # 各输入的特征维度（不含批次维），旧格式文件中缺失时为空列表
+        self.input_shapes: List[tuple] = (
+            [tuple(shapes[name]) for name in self.input_names]
+            if all(shapes.get(name) for name in self.input_names) else []
+        )
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = False) -> "LiteModel":
+        """加载导出的 .npz 模型文件
+
+        mmap=True 时权重以只读方式内存映射自 .npz 旁的展开目录，多个worker进程
+        映射同一文件时共享操作系统页缓存中的同一份物理内存。
+        """
+        if mmap:
+            weights_dir = _mapped_weights_dir(path)
+            with open(os.path.join(weights_dir, "spec.json"), "r", encoding="utf-8") as f:
+                spec = json.load(f)
+            arrays = {
+                key: np.load(os.path.join(weights_dir, f"{index}.npy"), mmap_mode="r")
+                for index, key in enumerate(spec["arrays"])
+            }
+            return cls(spec, arrays)
+
+        with np.load(path) as data:
+            spec = json.loads(bytes(data["__spec__"]).decode("utf-8"))
+            arrays = {key: data[key] for key in data.files if key != "__spec__"}
+        return cls(spec, arrays)
+
+    def _normalize_inputs(self, features) -> Dict[str, np.ndarray]:
+        if isinstance(features, dict):
+            return {name: np.asarray(features[name], dtype=np.float32) for name in self.input_names}
+        if isinstance(features, (list, tuple)):
+            return {name: np.asarray(x, dtype=np.float32) for name, x in zip(self.input_names, features)}
+        return {self.input_names[0]: np.asarray(features, dtype=np.float32)}
+
+    def predict(self, features, verbose: int = 0, **kwargs) -> Union[np.ndarray, List[np.ndarray]]:
+        """前向推理（Dropout在推理时为恒等变换）"""
+        values = self._normalize_inputs(features)
+        for layer in self.layers:
+            layer_type = layer["type"]
+            if layer_type == "InputLayer":
+                continue
+            inputs = [values[name] for name in layer["inbound"]]
+            if layer_type == "Dense":
+                output = inputs[0] @ self.arrays[f"{layer['name']}/kernel"]
+                if layer["use_bias"]:
+                    output += self.arrays[f"{layer['name']}/bias"]
+                values[layer["name"]] = ACTIVATIONS[layer["activation"]](output)
+            elif layer_type == "Dropout":
+                values[layer["name"]] = inputs[0]
+            elif layer_type == "Concatenate":
+                values[layer["name"]] = np.concatenate(inputs, axis=layer["axis"])
+
+        outputs = [values[name] for name in self.output_names]
+        return outputs[0] if len(outputs) == 1 else outputs
+
+def _mapped_weights_dir(path: str) -> str:
+    """返回 .npz 对应的可内存映射权重目录（每个数组一个 .npy），不存在时展开生成
+
+    目录名包含 .npz 的修改时间，模型文件被覆盖后自动生成新目录；多个进程并发生成时
+    先写临时目录再原子重命名，后完成的进程直接使用已存在的目录。
+    """
+    stem = os.path.splitext(path)[0]
+    mtime_ns = os.stat(path).st_mtime_ns
+    weights_dir = f"{stem}.{mtime_ns}.weights"
+    if not os.path.isdir(weights_dir):
+        tmp_dir = tempfile.mkdtemp(prefix=os.path.basename(stem) + ".", dir=os.path.dirname(path) or ".")
+        try:
+            with np.load(path) as data:
+                spec = json.loads(bytes(data["__spec__"]).decode("utf-8"))
+                spec["arrays"] = [key for key in data.files if key != "__spec__"]
+                for index, key in enumerate(spec["arrays"]):
+                    np.save(os.path.join(tmp_dir, f"{index}.npy"), data[key])
+            with open(os.path.join(tmp_dir, "spec.json"), "w", encoding="utf-8") as f:
+                json.dump(spec, f)
+            os.rename(tmp_dir, weights_dir)
+            logger.info(f"已生成内存映射权重目录 {weights_dir}")
+        except OSError:
+            # 其他进程已先完成生成
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.isdir(weights_dir):
+                raise
+
+    _remove_stale_weights_dirs(stem, mtime_ns, weights_dir)
+    return weights_dir
+
+def _remove_stale_weights_dirs(stem: str, mtime_ns: int, weights_dir: str, grace: float = STALE_WEIGHTS_GRACE):
+    """清理比当前版本更旧的权重目录（已映射的进程不受影响）
+
+    仅在当前目录生成超过 grace 秒后清理，避免删除其他worker正在加载的旧目录；
+    更新版本的目录和未完成的临时目录不会被删除。
+    """
+    try:
+        if time.time() - os.stat(weights_dir).st_mtime < grace:
+            return
+    except OSError:
+        return
+    for stale_dir in glob.glob(f"{glob.escape(stem)}.*.weights"):
+        version = stale_dir[len(stem) + 1:-len(".weights")]
+        if version.isdigit() and int(version) < mtime_ns:
+            shutil.rmtree(stale_dir, ignore_errors=True)
+            logger.info(f"已清理旧的内存映射权重目录 {stale_dir}")
+
+def verify_lite_model(keras_model, lite_model: LiteModel, samples: int = 64, atol: float = 1e-5) -> float:
+    """用随机样本对比Keras与NumPy推理结果，误差超过 atol 时抛出异常，返回最大绝对误差"""
+    rng = np.random.default_rng(0)
+    inputs = [
+        rng.standard_normal((samples, *tensor.shape[1:])).astype(np.float32)
+        for tensor in keras_model.inputs
+    ]
+    features = inputs[0] if len(inputs) == 1 else inputs
+    expected = keras_model.predict(features, verbose=0)
+    actual = lite_model.predict(features)
+    if not isinstance(expected, list):
+        expected, actual = [expected], [actual]
+
+    max_error = max(float(np.max(np.abs(np.asarray(e) - a))) for e, a in zip(expected, actual))
+    if max_error > atol:
+        raise ValueError(f"NumPy推理结果与Keras不一致，最大误差 {max_error:.2e} 超过 {atol:.0e}")
+    return max_error
+
+if __name__ == "__main__":
+    # 将已有的Keras模型文件导出为NumPy格式: python -m models.lite models/saved_models/xxx_model.h5
+    import argparse
+    from tensorflow.keras.models import load_model
+
+    parser = argparse.ArgumentParser(description="导出Keras模型为NumPy推理格式")
+    parser.add_argument("model_files", nargs="+", help="Keras .h5 模型文件")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    for model_file in args.model_files:
+        keras_model = load_model(model_file)
+        lite_path = os.path.splitext(model_file)[0] + ".npz"
+        export_lite_model(keras_model, lite_path)
+        error = verify_lite_model(keras_model, LiteModel.load(lite_path))
+        logger.info(f"{model_file} -> {lite_path}，最大误差 {error:.2e}")
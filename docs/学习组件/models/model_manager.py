@@ -1,24 +1,39 @@
 import os
+import sys
 import json
+import time
+import subprocess
 import logging
+import threading
 import numpy as np
-import tensorflow as tf
-from tensorflow.keras.models import load_model
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 from config import config
-from data import redis_client
+from data import redis_client, dependency_breakers
+from data.lazy import record_startup
+from .lite import LiteModel, export_lite_model, verify_lite_model
 
 logger = logging.getLogger(__name__)
 
 class ModelManager:
-    """模型管理服务，负责模型加载、推理和训练"""
+    """模型管理服务，负责模型加载、推理和训练
+    
+    推理后端由 model.backend 配置：keras 直接加载 .h5 模型；numpy 加载训练时导出的 .npz
+    权重并用NumPy前向计算，推理进程无需导入TensorFlow。numpy 后端默认以只读内存映射
+    加载权重（model.shared_weights），各worker进程及同时加载的多个版本共享同一份物理内存。
+    """
     
     def __init__(self):
         self.models = {}  # 模型缓存 {模型名称: (模型对象, 版本, 加载时间)}
         self.model_path = config.get("model.path")
+        self.backend = config.get("model.backend", "keras")
         self.model_versions = self._load_model_versions()
-        self._load_default_models()
+        self.model_mtimes: Dict[str, Optional[float]] = {}  # 已加载模型文件的修改时间
+        self._load_lock = threading.Lock()
+        self._watcher = None  # 后台模型更新检查线程
+        self._watcher_lock = threading.Lock()
+        self._update_lock = threading.Lock()  # train() 与后台检查线程不能同时切换模型
+        self._stopped = threading.Event()
     
     def _load_model_versions(self) -> Dict[str, str]:
         """加载模型版本配置"""
@@ -34,45 +49,144 @@ class ModelManager:
     def _save_model_versions(self):
         """保存模型版本配置"""
         version_path = os.path.join(self.model_path, "versions.json")
-        with open(version_path, "w", encoding="utf-8") as f:
+        # 先写临时文件再原子替换，推理进程不会读到写了一半的配置
+        tmp_path = f"{version_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(self.model_versions, f, indent=2)
+        os.replace(tmp_path, version_path)
     
-    def _get_model_file_path(self, model_name: str, version: str = "latest") -> str:
+    def _get_model_file_path(self, model_name: str, version: str = "latest", ext: str = ".h5") -> str:
         """获取模型文件路径"""
         if version == "latest":
             version = self.model_versions.get(model_name, "latest")
         
         if version == "latest":
             # 如果没有指定版本，使用默认文件名
-            return os.path.join(self.model_path, f"{model_name}_model.h5")
+            return os.path.join(self.model_path, f"{model_name}_model{ext}")
         
-        return os.path.join(self.model_path, version, f"{model_name}_model.h5")
+        return os.path.join(self.model_path, version, f"{model_name}_model{ext}")
     
-    def _load_default_models(self):
-        """加载默认模型"""
+    def warm_up(self):
+        """预加载默认模型；未调用时各模型在首次推理时加载"""
         self.load_model("path_recommendation")
         self.load_model("knowledge_assessment")
     
+    def _resolve_version(self, model_name: str, version: str) -> str:
+        """将 latest 解析为版本配置中的实际版本"""
+        return self.model_versions.get(model_name, "latest") if version == "latest" else version
+    
+    def _model_file(self, model_name: str, version: str) -> str:
+        """当前推理后端对应的模型文件路径"""
+        ext = ".npz" if self.backend == "numpy" else ".h5"
+        return self._get_model_file_path(model_name, version, ext=ext)
+    
+    def _build_model(self, model_name: str, version: str):
+        """加载模型对象（不修改模型缓存）"""
+        model_path = self._model_file(model_name, version)
+        if self.backend == "numpy":
+            if not os.path.exists(model_path):
+                raise FileNotFoundError(f"NumPy模型文件不存在: {model_path}，请先训练或导出模型")
+            return LiteModel.load(model_path, mmap=config.get("model.shared_weights", True))
+        
+        from tensorflow.keras.models import load_model
+        if not os.path.exists(model_path):
+            logger.warning(f"模型文件不存在: {model_path}，将创建新模型")
+            return self._create_model(model_name)
+        return load_model(model_path)
+    
+    def _model_mtime(self, model_name: str, version: str) -> Optional[float]:
+        model_path = self._model_file(model_name, version)
+        return os.path.getmtime(model_path) if os.path.exists(model_path) else None
+    
     def load_model(self, model_name: str, version: str = "latest") -> bool:
         """加载指定模型"""
+        start = time.perf_counter()
         try:
-            model_path = self._get_model_file_path(model_name, version)
-            if not os.path.exists(model_path):
-                logger.warning(f"模型文件不存在: {model_path}，将创建新模型")
-                model = self._create_model(model_name)
-            else:
-                model = load_model(model_path)
+            version = self._resolve_version(model_name, version)
+            mtime = self._model_mtime(model_name, version)
+            model = self._build_model(model_name, version)
             
             # 更新模型缓存
             self.models[model_name] = (model, version, datetime.now())
-            logger.info(f"模型 {model_name} (版本: {version}) 加载成功")
+            self.model_mtimes[model_name] = mtime
+            record_startup(f"model:{model_name}", time.perf_counter() - start)
+            logger.info(f"模型 {model_name} (版本: {version}, 后端: {self.backend}) 加载成功")
+            self.start_watcher()
             return True
         except Exception as e:
             logger.error(f"加载模型 {model_name} 失败: {str(e)}")
             return False
     
-    def _create_model(self, model_name: str) -> tf.keras.Model:
+    def _sample_batch(self, model):
+        """构造用于预热的样本批次"""
+        if isinstance(model, LiteModel):
+            shapes = model.input_shapes
+        else:
+            shapes = [tuple(tensor.shape[1:]) for tensor in model.inputs]
+        if not shapes or any(dim is None for shape in shapes for dim in shape):
+            return None
+        inputs = [np.zeros((1, *shape), dtype=np.float32) for shape in shapes]
+        return inputs[0] if len(inputs) == 1 else inputs
+    
+    def start_watcher(self):
+        """启动后台模型更新检查线程（model.watch_interval 为0时不启动）"""
+        interval = config.get("model.watch_interval", 30)
+        if interval <= 0 or self._watcher is not None:
+            return
+        with self._watcher_lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(
+                    target=self._watch, args=(interval,), name="model-watcher", daemon=True
+                )
+                self._watcher.start()
+    
+    def _watch(self, interval: float):
+        while not self._stopped.wait(interval):
+            self.check_for_updates()
+    
+    def check_for_updates(self):
+        """检查版本配置和模型文件，有更新的模型在后台加载、预热后原子替换"""
+        with self._update_lock:
+            self._check_for_updates()
+    
+    def _check_for_updates(self):
+        try:
+            self.model_versions = self._load_model_versions()
+        except Exception as e:
+            logger.error(f"读取模型版本配置失败: {str(e)}")
+            return
+        
+        for model_name, (_, current_version, _) in list(self.models.items()):
+            version = self._resolve_version(model_name, "latest")
+            mtime = self._model_mtime(model_name, version)
+            if version == current_version and mtime == self.model_mtimes.get(model_name):
+                continue
+            try:
+                self._swap_model(model_name, version, current_version, mtime)
+            except Exception as e:
+                # 加载失败时继续使用当前模型，下一轮检查重试
+                logger.error(f"模型 {model_name} 切换到版本 {version} 失败: {str(e)}")
+    
+    def _swap_model(self, model_name: str, version: str, current_version: str, mtime: Optional[float]):
+        """加载并预热新模型后替换缓存项"""
+        start = time.perf_counter()
+        model = self._build_model(model_name, version)
+        sample = self._sample_batch(model)
+        if sample is not None:
+            model.predict(sample, verbose=0)
+        
+        # 整体替换缓存项，进行中的请求继续使用已取出的旧模型
+        self.models[model_name] = (model, version, datetime.now())
+        self.model_mtimes[model_name] = mtime
+        logger.info(
+            f"模型 {model_name} 已热切换到版本 {version} "
+            f"(原版本: {current_version}，加载耗时 {time.perf_counter() - start:.2f}s)"
+        )
+    
+    def _create_model(self, model_name: str) -> "tf.keras.Model":
         """创建新模型"""
+        import tensorflow as tf
+        
         if model_name == "path_recommendation":
             # 路径推荐模型
             student_input = tf.keras.layers.Input(shape=(20,), name='student_features')
@@ -127,90 +241,117 @@ class ModelManager:
     
     def predict(self, model_name: str, features: np.ndarray) -> np.ndarray:
         """模型推理"""
-        # 检查模型是否加载
+        # 检查模型是否加载（首次使用时加载，并发请求只加载一次）
         if model_name not in self.models:
-            if not self.load_model(model_name):
-                raise ValueError(f"模型 {model_name} 无法加载")
-        
-        model, version, load_time = self.models[model_name]
-        
-        # 检查模型是否需要重新加载（超过24小时）
-        if (datetime.now() - load_time).total_seconds() > 86400:
-            self.load_model(model_name, version)
-            model, _, _ = self.models[model_name]
+            with self._load_lock:
+                if model_name not in self.models and not self.load_model(model_name):
+                    raise ValueError(f"模型 {model_name} 无法加载")
         
+        # 新版本由后台线程加载并替换，推理路径上不再重新加载模型
+        model, version, _ = self.models[model_name]
         try:
-            return model.predict(features, verbose=0)
+            return dependency_breakers.get(f"model:{model_name}").call(model.predict, features, verbose=0)
         except Exception as e:
-            logger.error(f"模型 {model_name} 推理失败: {str(e)}")
-            # 尝试重新加载模型后再预测
-            if self.load_model(model_name, version):
-                model, _, _ = self.models[model_name]
-                return model.predict(features, verbose=0)
+            logger.error(f"模型 {model_name} (版本: {version}) 推理失败: {str(e)}")
             raise
     
+    def export_lite(self, model, model_path: str) -> LiteModel:
+        """将Keras模型导出为NumPy推理格式，并校验两者输出一致"""
+        lite_path = os.path.splitext(model_path)[0] + ".npz"
+        export_lite_model(model, lite_path)
+        lite_model = LiteModel.load(lite_path)
+        max_error = verify_lite_model(model, lite_model)
+        logger.info(f"已导出NumPy模型 {lite_path}，与Keras最大误差 {max_error:.2e}")
+        return lite_model
+    
+    def load_keras_model(self, model_name: str) -> "tf.keras.Model":
+        """加载当前版本的Keras模型用于继续训练，文件不存在时创建新模型"""
+        import tensorflow as tf
+        
+        keras_path = self._get_model_file_path(model_name)
+        if os.path.exists(keras_path):
+            return tf.keras.models.load_model(keras_path)
+        return self._create_model(model_name)
+    
+    def publish(self, model_name: str, model, version: str = None) -> str:
+        """保存训练好的模型（.h5 及NumPy格式）并更新版本配置，返回版本号
+        
+        各推理进程的后台检查线程发现版本配置变化后加载新版本。
+        """
+        if not version:
+            version = datetime.now().strftime("%Y%m%d_%H%M%S")
+        model_path = self._get_model_file_path(model_name, version)
+        os.makedirs(os.path.dirname(model_path), exist_ok=True)
+        
+        # 模型文件先写到临时路径再重命名，推理进程不会加载写了一半的文件
+        staging_path = f"{os.path.splitext(model_path)[0]}.staging-{os.getpid()}.h5"
+        model.save(staging_path)
+        self.export_lite(model, staging_path)
+        os.replace(os.path.splitext(staging_path)[0] + ".npz", os.path.splitext(model_path)[0] + ".npz")
+        os.replace(staging_path, model_path)
+        
+        # 重新读取版本配置，保留其他进程发布的模型版本
+        self.model_versions = self._load_model_versions()
+        self.model_versions[model_name] = version
+        self._save_model_versions()
+        return version
+    
+    def start_training(self, model_name: str, version: str = None, data_file: str = None) -> subprocess.Popen:
+        """在独立进程中启动训练任务（models.training），不占用推理进程的CPU和内存
+        
+        data_file 为 save_arrays 保存的训练数据，未指定时从数据库流式读取样本。
+        """
+        command = [sys.executable, "-m", "models.training", model_name]
+        if version:
+            command += ["--version", version]
+        if data_file:
+            command += ["--data", data_file]
+        package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        process = subprocess.Popen(command, cwd=package_dir)
+        logger.info(f"模型 {model_name} 训练任务已启动 (pid: {process.pid})")
+        return process
+    
     def train(self, model_name: str, train_data: Dict[str, Any], version: str = None) -> bool:
-        """训练模型"""
+        """用内存中的训练数据训练模型并等待完成
+        
+        训练数据保存为临时文件后交给独立的训练进程，推理进程中不执行 fit；
+        训练进程发布新版本后本进程立即切换，其他进程由后台检查线程切换。
+        """
+        from .training import save_arrays
+        
+        os.makedirs(self.model_path, exist_ok=True)
+        data_file = os.path.join(self.model_path, f"{model_name}.train-{os.getpid()}-{threading.get_ident()}.npz")
         try:
-            # 获取或创建模型
-            if model_name in self.models:
-                model, _, _ = self.models[model_name]
-            else:
-                model = self._create_model(model_name)
-            
-            # 准备训练数据
-            X_train = train_data["X_train"]
-            y_train = train_data["y_train"]
-            X_val = train_data.get("X_val")
-            y_val = train_data.get("y_val")
-            
-            # 训练模型
-            callbacks = [
-                tf.keras.callbacks.EarlyStopping(
-                    patience=config.get("model.early_stopping_patience"),
-                    restore_best_weights=True
-                )
-            ]
-            
-            validation_data = (X_val, y_val) if X_val is not None and y_val is not None else None
-            
-            history = model.fit(
-                X_train,
-                y_train,
-                validation_data=validation_data,
-                epochs=config.get("model.epochs"),
-                batch_size=config.get("model.batch_size"),
-                callbacks=callbacks,
-                verbose=1
-            )
-            
-            # 保存模型
-            if not version:
-                version = datetime.now().strftime("%Y%m%d_%H%M%S")
-                model_dir = os.path.join(self.model_path, version)
-                os.makedirs(model_dir, exist_ok=True)
-                model_path = os.path.join(model_dir, f"{model_name}_model.h5")
-            else:
-                model_path = self._get_model_file_path(model_name, version)
-            
-            model.save(model_path)
-            
-            # 更新模型版本和缓存
-            self.model_versions[model_name] = version
-            self._save_model_versions()
-            self.models[model_name] = (model, version, datetime.now())
-            
-            logger.info(f"模型 {model_name} (版本: {version}) 训练并保存成功")
-            return True
+            save_arrays(data_file, train_data)
+            returncode = self.start_training(model_name, version, data_file).wait()
         except Exception as e:
             logger.error(f"模型 {model_name} 训练失败: {str(e)}")
             return False
+        finally:
+            if os.path.exists(data_file):
+                os.remove(data_file)
+        
+        if returncode != 0:
+            logger.error(f"模型 {model_name} 训练进程异常退出 (退出码: {returncode})")
+            return False
+        self.check_for_updates()
+        logger.info(f"模型 {model_name} (版本: {self.model_versions.get(model_name)}) 训练并保存成功")
+        return True
     
     def get_model_version(self, model_name: str) -> str:
         """获取模型当前版本"""
         return self.model_versions.get(model_name, "latest")
     
+    def get_loaded_version(self, model_name: str) -> str:
+        """获取正在提供服务的模型版本（含文件修改时间），未加载时返回配置版本"""
+        entry = self.models.get(model_name)
+        if entry is None:
+            return self.get_model_version(model_name)
+        mtime = self.model_mtimes.get(model_name)
+        return f"{entry[1]}@{int(mtime)}" if mtime else entry[1]
+    
     def close(self):
         """释放模型资源"""
+        self._stopped.set()
         self.models.clear()
         logger.info("模型资源已释放")
@@ -0,0 +1,71 @@
+import hashlib
+import logging
+import threading
+import numpy as np
+from typing import Dict, Optional
+from data.local_cache import LocalCache
+
+logger = logging.getLogger(__name__)
+
+class PredictionCache:
+    """模型推理结果缓存
+
+    键由 (模型名称, 模型版本, 学科, 学科知识点版本, 学生特征向量哈希) 组成，值为按知识点顺序
+    排列的 float32 预测向量。进程内LRU为第一层，可选Redis为跨进程共享的第二层。
+    模型版本变化（训练或热切换）后旧键不再命中，本进程缓存同时清空。
+    """
+
+    def __init__(self, model_manager, redis_client=None, max_entries: int = 50000,
+                 max_bytes: int = 128 * 1024 * 1024, ttl: float = 600):
+        self.model_manager = model_manager
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self.local = LocalCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+        self.versions: Dict[str, str] = {}  # {模型名称: 上次使用的模型版本}
+        self._lock = threading.Lock()
+
+    def _model_version(self, model_name: str) -> str:
+        """当前提供服务的模型版本，变化时清空本进程缓存"""
+        version = self.model_manager.get_loaded_version(model_name)
+        if self.versions.get(model_name) != version:
+            with self._lock:
+                previous = self.versions.get(model_name)
+                if previous != version:
+                    if previous is not None:
+                        self.local.clear()
+                        logger.info(f"模型 {model_name} 版本由 {previous} 变为 {version}，推理结果缓存已清空")
+                    self.versions[model_name] = version
+        return version
+
+    def key(self, model_name: str, features: np.ndarray, subject: str, subject_version: int) -> str:
+        """生成缓存键"""
+        digest = hashlib.blake2b(
+            np.ascontiguousarray(features, dtype=np.float32).tobytes(), digest_size=16
+        ).hexdigest()
+        return f"prediction:{model_name}:{self._model_version(model_name)}:{subject}:{subject_version}:{digest}"
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """读取缓存的预测向量，未命中返回None"""
+        payload = self.local.get(key)
+        if payload is None and self.redis_client is not None:
+            try:
+                payload = self.redis_client.get(key)
+            except Exception as e:
+                logger.warning(f"读取推理结果缓存失败: {str(e)}")
+            if payload:
+                self.local.set(key, payload)
+        return np.frombuffer(payload, dtype=np.float32) if payload else None
+
+    def set(self, key: str, scores: np.ndarray):
+        """写入预测向量"""
+        payload = np.ascontiguousarray(scores, dtype=np.float32).tobytes()
+        self.local.set(key, payload)
+        if self.redis_client is not None:
+            try:
+                self.redis_client.setex(key, int(self.ttl), payload)
+            except Exception as e:
+                logger.warning(f"写入推理结果缓存失败: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        """本进程缓存命中统计"""
+        return self.local.stats()
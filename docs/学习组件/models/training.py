@@ -0,0 +1,201 @@
+import os
+import shutil
+import logging
+import numpy as np
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# 训练样本表：每行一个样本，features 为模型各输入按顺序拼接的特征向量（REAL[]），label 为目标值
+TRAINING_SAMPLES_SQL = """
+    SELECT features, label FROM model_training_samples
+    WHERE model_name = %s AND split = %s
+    ORDER BY id
+"""
+SPLIT_EXISTS_SQL = "SELECT EXISTS(SELECT 1 FROM model_training_samples WHERE model_name = %s AND split = %s)"
+
+def has_samples(db_connector, model_name: str, split: str) -> bool:
+    """样本表中是否有该模型指定划分的样本"""
+    with db_connector.get_connection(read_only=True) as conn:
+        with conn.cursor() as cur:
+            cur.execute(SPLIT_EXISTS_SQL, (model_name, split))
+            return bool(cur.fetchone()[0])
+
+def iter_sample_chunks(db_connector, model_name: str, split: str,
+                       chunk_size: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """用服务端游标分块读取训练样本，内存中最多保留一个分块"""
+    with db_connector.get_connection(read_only=True, autocommit=False) as conn:
+        with conn.cursor(name=f"training_samples_{model_name}_{split}") as cur:
+            cur.itersize = chunk_size
+            cur.execute(TRAINING_SAMPLES_SQL, (model_name, split))
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                features = np.asarray([row[0] for row in rows], dtype=np.float32)
+                labels = np.asarray([row[1] for row in rows], dtype=np.float32).reshape(-1, 1)
+                yield features, labels
+
+def make_dataset(db_connector, model_name: str, split: str, input_dims: List[int],
+                 batch_size: int, chunk_size: int, shuffle: bool = True):
+    """构建流式 tf.data 数据集，每个epoch重新从数据库分块读取，数据量不受内存限制"""
+    import tensorflow as tf
+
+    offsets = np.cumsum(input_dims)[:-1]
+
+    def generate():
+        rng = np.random.default_rng()
+        for features, labels in iter_sample_chunks(db_connector, model_name, split, chunk_size):
+            if shuffle:
+                order = rng.permutation(len(labels))
+                features, labels = features[order], labels[order]
+            for start in range(0, len(labels), batch_size):
+                inputs = np.split(features[start:start + batch_size], offsets, axis=1)
+                yield (tuple(inputs) if len(inputs) > 1 else inputs[0]), labels[start:start + batch_size]
+
+    input_specs = [tf.TensorSpec(shape=(None, dim), dtype=tf.float32) for dim in input_dims]
+    output_signature = (
+        tuple(input_specs) if len(input_specs) > 1 else input_specs[0],
+        tf.TensorSpec(shape=(None, 1), dtype=tf.float32)
+    )
+    dataset = tf.data.Dataset.from_generator(generate, output_signature=output_signature)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+def _callbacks(checkpoint_dir: str, has_validation: bool) -> list:
+    import tensorflow as tf
+
+    return [
+        # 没有验证集时按训练损失提前停止
+        tf.keras.callbacks.EarlyStopping(
+            monitor="val_loss" if has_validation else "loss",
+            patience=config.get("model.early_stopping_patience"),
+            restore_best_weights=True
+        ),
+        # 每个epoch结束保存训练状态，进程中断后以相同版本号重新运行即可恢复
+        tf.keras.callbacks.BackupAndRestore(backup_dir=checkpoint_dir)
+    ]
+
+def _checkpoint_dir(model_manager, model_name: str, version: str) -> str:
+    """每次训练（以发布版本号区分）使用独立的检查点目录，并发或先后训练不会恢复到其他训练的状态"""
+    base_dir = config.get("model.training.checkpoint_dir", os.path.join(model_manager.model_path, "checkpoints"))
+    return os.path.join(base_dir, model_name, version)
+
+def _finish(model_manager, model_name: str, model, version: str, checkpoint_dir: str) -> str:
+    """发布新版本并删除本次训练的检查点"""
+    version = model_manager.publish(model_name, model, version)
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    logger.info(f"模型 {model_name} 训练完成，已发布版本 {version}")
+    return version
+
+def run_training(model_manager, db_connector, model_name: str, version: Optional[str] = None,
+                 chunk_size: Optional[int] = None) -> str:
+    """从数据库流式训练模型，定期保存检查点，完成后发布为新版本目录，返回版本号
+
+    中断后以相同的 --version 重新运行，从本次训练最近的检查点继续。
+    """
+    version = version or datetime.now().strftime("%Y%m%d_%H%M%S")
+    if not has_samples(db_connector, model_name, "train"):
+        raise ValueError(f"模型 {model_name} 没有训练样本")
+    has_validation = has_samples(db_connector, model_name, "val")
+    if not has_validation:
+        logger.warning(f"模型 {model_name} 没有验证样本，按训练损失提前停止")
+
+    chunk_size = chunk_size or config.get("model.training.chunk_size", 50000)
+    batch_size = config.get("model.batch_size")
+    model = model_manager.load_keras_model(model_name)
+    input_dims = [int(tensor.shape[-1]) for tensor in model.inputs]
+
+    train_dataset = make_dataset(db_connector, model_name, "train", input_dims, batch_size, chunk_size)
+    val_dataset = (make_dataset(db_connector, model_name, "val", input_dims, batch_size, chunk_size, shuffle=False)
+                   if has_validation else None)
+
+    checkpoint_dir = _checkpoint_dir(model_manager, model_name, version)
+    logger.info(f"模型 {model_name} 开始训练，版本 {version}，检查点目录 {checkpoint_dir}")
+    model.fit(
+        train_dataset,
+        validation_data=val_dataset,
+        epochs=config.get("model.epochs"),
+        callbacks=_callbacks(checkpoint_dir, has_validation),
+        verbose=2
+    )
+    return _finish(model_manager, model_name, model, version, checkpoint_dir)
+
+def save_arrays(path: str, train_data: Dict[str, Any]):
+    """保存内存中的训练数据（X_train、y_train、可选的 X_val、y_val），多输入模型的X为数组列表"""
+    arrays = {}
+    for name, value in train_data.items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple)):
+            arrays.update({f"{name}__{i}": np.asarray(item) for i, item in enumerate(value)})
+        else:
+            arrays[name] = np.asarray(value)
+    np.savez(path, **arrays)
+
+def load_arrays(path: str) -> Dict[str, Any]:
+    """读取 save_arrays 保存的训练数据"""
+    train_data: Dict[str, Any] = {}
+    with np.load(path) as arrays:
+        for key in arrays.files:
+            name, _, index = key.partition("__")
+            if index:
+                train_data.setdefault(name, {})[int(index)] = arrays[key]
+            else:
+                train_data[name] = arrays[key]
+    return {
+        name: [value[i] for i in sorted(value)] if isinstance(value, dict) else value
+        for name, value in train_data.items()
+    }
+
+def run_training_arrays(model_manager, model_name: str, train_data: Dict[str, Any],
+                        version: Optional[str] = None) -> str:
+    """用数组形式的训练数据训练模型（ModelManager.train 保存后在独立进程中调用），返回版本号"""
+    version = version or datetime.now().strftime("%Y%m%d_%H%M%S")
+    X_train, y_train = train_data["X_train"], train_data["y_train"]
+    if not len(y_train):
+        raise ValueError(f"模型 {model_name} 没有训练样本")
+    X_val, y_val = train_data.get("X_val"), train_data.get("y_val")
+    has_validation = X_val is not None and y_val is not None and len(y_val) > 0
+
+    model = model_manager.load_keras_model(model_name)
+    checkpoint_dir = _checkpoint_dir(model_manager, model_name, version)
+    model.fit(
+        X_train,
+        y_train,
+        validation_data=(X_val, y_val) if has_validation else None,
+        epochs=config.get("model.epochs"),
+        batch_size=config.get("model.batch_size"),
+        callbacks=_callbacks(checkpoint_dir, has_validation),
+        verbose=2
+    )
+    return _finish(model_manager, model_name, model, version, checkpoint_dir)
+
+if __name__ == "__main__":
+    # 独立进程训练，推理服务通过版本配置自动切换: python -m models.training knowledge_assessment
+    import argparse
+
+    parser = argparse.ArgumentParser(description="从数据库流式训练模型并发布新版本")
+    parser.add_argument("model_name", choices=["path_recommendation", "knowledge_assessment"])
+    parser.add_argument("--version", help="发布的版本号，默认使用当前时间；中断后以相同版本号重新运行可从检查点恢复")
+    parser.add_argument("--chunk-size", type=int, help="每次从数据库读取的样本数")
+    parser.add_argument("--data", help="save_arrays 保存的训练数据文件（.npz），指定时不从数据库读取")
+    parser.add_argument("--threads", type=int, help="TensorFlow计算线程数上限")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.threads:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(args.threads)
+        tf.config.threading.set_inter_op_parallelism_threads(args.threads)
+
+    from models import model_manager
+    if args.data:
+        run_training_arrays(model_manager, args.model_name, load_arrays(args.data), args.version)
+    else:
+        from data import db_connector
+        try:
+            run_training(model_manager, db_connector, args.model_name, args.version, args.chunk_size)
+        finally:
+            db_connector.close()
@@ -0,0 +1,46 @@
+"""测试公共设置
+
+各组件测试直接导入被测子模块：data、models 包的 __init__ 会创建客户端并导入完整代码树中的
+其他模块，这些模块不存在时只注册空的包对象，子模块仍从真实目录加载。
+配置包（代码中以 config 导入）复制到临时目录，读取其中的 base.yaml。
+"""
+import os
+import sys
+import types
+import shutil
+import tempfile
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_DIR = os.path.join(ROOT, "data", "config")
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+def _install_config():
+    try:
+        importlib.import_module("config")
+        return
+    except (ImportError, OSError):
+        sys.modules.pop("config", None)
+    target = os.path.join(tempfile.mkdtemp(prefix="learning-path-config-"), "config")
+    os.makedirs(target)
+    shutil.copy(os.path.join(CONFIG_DIR, "__init__.py"), os.path.join(target, "__init__.py"))
+    base = next(name for name in os.listdir(CONFIG_DIR) if name.strip() == "base.yaml")
+    shutil.copy(os.path.join(CONFIG_DIR, base), os.path.join(target, "base.yaml"))
+    sys.path.insert(0, os.path.dirname(target))
+    importlib.import_module("config")
+
+def _install_package(name: str):
+    """包 __init__ 无法导入时注册只含 __path__ 的包对象，子模块照常从源码目录导入"""
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        # 已成功导入的子模块保留（重复导入会重复注册 Prometheus 指标），导入失败的模块已被解释器移除
+        package = types.ModuleType(name)
+        package.__path__ = [os.path.join(ROOT, name)]
+        sys.modules[name] = package
+
+_install_config()
+for _package in ("data", "models", "api"):
+    _install_package(_package)
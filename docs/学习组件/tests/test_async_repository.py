@@ -0,0 +1,21 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from data.async_repository import AsyncRepository
+from data.lazy import LazyResource
+
+class Repository:
+    def __init__(self, name):
+        self.name = name
+
+    def get_student(self, student_id):
+        return f"{self.name}:{student_id}"
+
+def test_calls_follow_lazy_resource_override():
+    resource = LazyResource("test_repo", lambda: Repository("real"))
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        repo = AsyncRepository(resource, executor)
+        assert asyncio.run(repo.get_student("s1")) == "real:s1"
+
+        resource.override(lambda: Repository("fake"))
+        assert asyncio.run(repo.get_student("s1")) == "fake:s1"
+        assert repo.name == "fake"
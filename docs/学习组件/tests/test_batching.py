@@ -0,0 +1,143 @@
+import threading
+import numpy as np
+import pytest
+from models.batching import BatchingPredictor
+
+class RecordingModelManager:
+    """记录每次推理的批量行数，输出为输入第一列"""
+
+    def __init__(self, error: Exception = None):
+        self.calls = []
+        self.error = error
+
+    def predict(self, model_name, features):
+        self.calls.append(len(features))
+        if self.error is not None:
+            raise self.error
+        return features[:, :1] * 1.0
+
+def _submit_concurrently(predictor, batches):
+    futures = [predictor.submit("m", features) for features in batches]
+    return [future.exception(timeout=5) or future.result() for future in futures]
+
+def test_results_are_sliced_back_to_each_request():
+    manager = RecordingModelManager()
+    predictor = BatchingPredictor(manager, max_batch_size=1000, max_wait_ms=50)
+    batches = [np.full((rows, 2), index, dtype=np.float32) for index, rows in enumerate([3, 1, 5])]
+    try:
+        results = _submit_concurrently(predictor, batches)
+    finally:
+        predictor.close()
+
+    for index, (features, result) in enumerate(zip(batches, results)):
+        assert result.shape == (len(features), 1)
+        assert np.all(result == index)
+    # 三个请求合并为一次推理
+    assert manager.calls == [9]
+
+def test_batch_is_cut_at_max_batch_size():
+    manager = RecordingModelManager()
+    predictor = BatchingPredictor(manager, max_batch_size=4, max_wait_ms=50)
+    batches = [np.ones((2, 2), dtype=np.float32) for _ in range(4)]
+    try:
+        _submit_concurrently(predictor, batches)
+    finally:
+        predictor.close()
+    assert manager.calls == [4, 4]
+
+def test_error_is_fanned_out_to_every_request():
+    error = RuntimeError("模型不可用")
+    predictor = BatchingPredictor(RecordingModelManager(error), max_batch_size=1000, max_wait_ms=50)
+    try:
+        results = _submit_concurrently(predictor, [np.ones((2, 2)), np.ones((1, 2)), np.ones((3, 2))])
+    finally:
+        predictor.close()
+    assert results == [error, error, error]
+
+def test_cancelled_request_is_skipped():
+    manager = RecordingModelManager()
+    predictor = BatchingPredictor(manager, max_batch_size=1000, max_wait_ms=50)
+    gate = threading.Event()
+    original = manager.predict
+    # 第一批推理期间排队第二批，并在处理前取消其中一个请求
+    manager.predict = lambda name, features: (gate.wait(5), original(name, features))[1]
+    try:
+        first = predictor.submit("m", np.ones((1, 2)))
+        cancelled = predictor.submit("m", np.ones((2, 2)))
+        kept = predictor.submit("m", np.ones((3, 2)))
+        cancelled.cancel()
+        gate.set()
+        assert first.result(timeout=5).shape == (1, 1)
+        assert kept.result(timeout=5).shape == (3, 1)
+    finally:
+        predictor.close()
+    assert 2 not in manager.calls and sum(manager.calls) == 4
+
+def test_submit_after_close_raises():
+    predictor = BatchingPredictor(RecordingModelManager(), max_batch_size=10, max_wait_ms=1)
+    predictor.close()
+    with pytest.raises(RuntimeError):
+        predictor.submit("m", np.ones((1, 2)))
+
+def test_multi_input_requests_are_concatenated_per_input():
+    calls = []
+
+    class MultiInputModelManager:
+        def predict(self, model_name, features):
+            calls.append([len(part) for part in features])
+            return features[0][:, :1] + features[1][:, :1]
+
+    predictor = BatchingPredictor(MultiInputModelManager(), max_batch_size=1000, max_wait_ms=50)
+    batches = [[np.full((rows, 20), index), np.full((rows, 50), 10 * index)] for index, rows in enumerate([2, 3])]
+    try:
+        results = _submit_concurrently(predictor, batches)
+    finally:
+        predictor.close()
+
+    assert calls == [[5, 5]]
+    assert [result.ravel().tolist() for result in results] == [[0, 0], [11, 11, 11]]
+
+def test_mixed_input_arity_fails_the_batch():
+    predictor = BatchingPredictor(RecordingModelManager(), max_batch_size=1000, max_wait_ms=50)
+    try:
+        results = _submit_concurrently(predictor, [np.ones((1, 2)), [np.ones((1, 2)), np.ones((1, 3))]])
+    finally:
+        predictor.close()
+    assert all(isinstance(result, ValueError) for result in results)
+
+def test_requests_racing_close_never_hang():
+    predictor = BatchingPredictor(RecordingModelManager(), max_batch_size=10, max_wait_ms=1)
+    futures, stop = [], threading.Event()
+
+    def submit_loop():
+        while not stop.is_set():
+            try:
+                futures.append(predictor.submit("m", np.ones((1, 2))))
+            except RuntimeError:
+                return
+
+    thread = threading.Thread(target=submit_loop)
+    thread.start()
+    predictor.close()
+    stop.set()
+    thread.join(timeout=5)
+    for future in futures:
+        assert future.exception(timeout=5) is None
+
+def test_close_fails_requests_left_behind_a_stuck_batch(monkeypatch):
+    import models.batching as batching
+    entered, gate = threading.Event(), threading.Event()
+    manager = RecordingModelManager()
+    original = manager.predict
+    manager.predict = lambda name, features: (entered.set(), gate.wait(5), original(name, features))[2]
+    predictor = BatchingPredictor(manager, max_batch_size=1, max_wait_ms=1)
+    first = predictor.submit("m", np.ones((1, 2)))
+    assert entered.wait(5)
+    queued = predictor.submit("m", np.ones((1, 2)))
+
+    # 调度线程卡在第一批推理上，join 立即超时
+    monkeypatch.setattr(batching.threading.Thread, "join", lambda self, timeout=None: None)
+    predictor.close()
+    assert isinstance(queued.exception(timeout=1), RuntimeError)
+    gate.set()
+    assert first.result(timeout=5).shape == (1, 1)
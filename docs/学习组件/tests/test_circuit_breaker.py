@@ -0,0 +1,160 @@
+import pytest
+import fakeredis
+from redis.exceptions import ConnectionError
+from data import circuit_breaker
+from data.circuit_breaker import (
+    BreakerRegistry, CircuitBreaker, CircuitOpenError, GuardedClient, CLOSED, HALF_OPEN, OPEN
+)
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", clock)
+    return clock
+
+def _fail(breaker, times=1):
+    for _ in range(times):
+        breaker.before_call()
+        breaker.record_failure()
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("test:open", failure_threshold=3, recovery_timeout=10)
+    _fail(breaker, 2)
+    breaker.before_call()
+    breaker.record_success()
+    _fail(breaker, 2)
+    assert breaker.state == CLOSED
+    _fail(breaker)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError) as info:
+        breaker.before_call()
+    assert info.value.retry_after == pytest.approx(10)
+
+def test_half_open_allows_single_probe(clock):
+    breaker = CircuitBreaker("test:probe", failure_threshold=1, recovery_timeout=10)
+    _fail(breaker)
+    clock.now += 10
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker("test:reopen", failure_threshold=5, recovery_timeout=10)
+    _fail(breaker, 5)
+    clock.now += 10
+    _fail(breaker)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+def test_stuck_probe_is_replaced_after_timeout(clock):
+    breaker = CircuitBreaker("test:stuck", failure_threshold=1, recovery_timeout=10)
+    _fail(breaker)
+    clock.now += 10
+    breaker.before_call()
+    clock.now += 11
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+
+def test_released_probe_frees_slot(clock):
+    breaker = CircuitBreaker("test:release", failure_threshold=1, recovery_timeout=10)
+    _fail(breaker)
+    clock.now += 10
+    breaker.before_call()
+    breaker.release()
+    breaker.before_call()
+
+def test_call_counts_only_failure_exceptions(clock):
+    breaker = CircuitBreaker("test:call", failure_threshold=1, recovery_timeout=10)
+    with pytest.raises(KeyError):
+        breaker.call(lambda: {}["missing"], failure_exceptions=(ConnectionError,))
+    assert breaker.state == CLOSED
+    with pytest.raises(ConnectionError):
+        breaker.call(lambda: (_ for _ in ()).throw(ConnectionError()), failure_exceptions=(ConnectionError,))
+    assert breaker.state == OPEN
+
+def test_registry_evicts_closed_breakers_first():
+    registry = BreakerRegistry(max_breakers=2, failure_threshold=1)
+    _fail(registry.get("test:a"))
+    registry.get("test:b")
+    registry.get("test:c")
+    assert set(registry.states()) == {"test:a", "test:c"}
+
+def test_guarded_client_guards_pipeline_execute_not_factory():
+    server = fakeredis.FakeServer()
+    breaker = CircuitBreaker("test:redis", failure_threshold=2, recovery_timeout=60)
+    client = GuardedClient(fakeredis.FakeRedis(server=server), breaker, (ConnectionError,))
+
+    pipe = client.pipeline()
+    pipe.set("key", 1)
+    pipe.get("key")
+    assert pipe.execute() == [True, b"1"]
+    assert client.register_script("return 7")() == 7
+
+    server.connected = False
+    for _ in range(2):
+        pipe = client.pipeline()
+        pipe.get("key")
+        with pytest.raises(ConnectionError):
+            pipe.execute()
+    assert breaker.state == OPEN
+    # 创建管道不访问网络，不经过熔断器；执行时被拒绝
+    pipe = client.pipeline()
+    pipe.get("key")
+    with pytest.raises(CircuitOpenError):
+        pipe.execute()
+
+def _app(endpoint, registry=None):
+    from starlette.applications import Starlette
+    from starlette.routing import Route
+    from api.middlewares import CircuitBreakerMiddleware
+    app = Starlette(routes=[Route("/students/{student_id}", endpoint)])
+    app.add_middleware(CircuitBreakerMiddleware, registry=registry or BreakerRegistry())
+    return app
+
+def test_open_dependency_breaker_returns_503():
+    from starlette.testclient import TestClient
+
+    async def endpoint(request):
+        raise CircuitOpenError("postgres", retry_after=12)
+
+    response = TestClient(_app(endpoint)).get("/students/1")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "12"
+
+def test_open_breaker_after_response_started_is_raised():
+    from starlette.responses import StreamingResponse
+    from starlette.testclient import TestClient
+
+    async def chunks():
+        yield b"partial"
+        raise CircuitOpenError("redis", retry_after=1)
+
+    async def endpoint(request):
+        return StreamingResponse(chunks())
+
+    with pytest.raises(CircuitOpenError):
+        TestClient(_app(endpoint)).get("/students/1")
+
+def test_route_breaker_is_shared_across_path_parameters():
+    from starlette.responses import PlainTextResponse
+    from starlette.testclient import TestClient
+
+    async def endpoint(request):
+        return PlainTextResponse("error", status_code=500)
+
+    registry = BreakerRegistry(failure_threshold=2, recovery_timeout=60)
+    client = TestClient(_app(endpoint, registry))
+    assert [client.get(f"/students/{i}").status_code for i in range(3)] == [500, 500, 503]
+    assert registry.get("route:GET /students/{student_id}").state == OPEN
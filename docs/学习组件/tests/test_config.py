@@ -0,0 +1,133 @@
+import os
+import time
+import pytest
+import config as config_module
+from config import Config
+
+BASE_YAML = """
+database:
+  password: "secret"
+  user: "app"
+  pool_size: 20
+  pool_adaptive: true
+  max_replica_lag: 10
+  replicas: []
+redis:
+  ttl_jitter: 0.1
+neo4j: {}
+model: {}
+service:
+  name: "learning-path"
+"""
+
+@pytest.fixture
+def make_config(tmp_path, monkeypatch):
+    (tmp_path / "base.yaml").write_text(BASE_YAML, encoding="utf-8")
+    for key in list(os.environ):
+        if key.startswith(config_module.ENV_PREFIX):
+            monkeypatch.delenv(key)
+
+    class TestConfig(Config):
+        def _config_files(self):
+            return [str(tmp_path / "base.yaml"), str(tmp_path / f"{self.env}.yaml")]
+
+    def make(**env):
+        for key, value in env.items():
+            monkeypatch.setenv(config_module.ENV_PREFIX + key, value)
+        return TestConfig("test")
+    return make
+
+def test_string_values_are_not_parsed(make_config):
+    config = make_config(DATABASE__PASSWORD="no", DATABASE__USER="0755", SERVICE__NAME="null")
+    assert config.get("database.password") == "no"
+    assert config.get("database.user") == "0755"
+    assert config.get("service.name") == "null"
+
+def test_values_without_default_stay_strings(make_config):
+    config = make_config(DATABASE__PORT="5432", DATABASE__HOST="db")
+    assert config.get("database.port") == "5432"
+    assert config.get_int("database.port") == 5432
+
+@pytest.mark.parametrize("key, value, expected", [
+    ("DATABASE__POOL_SIZE", "30", 30),
+    ("DATABASE__MAX_REPLICA_LAG", "2.5", 2.5),
+    ("DATABASE__POOL_ADAPTIVE", "off", False),
+    ("DATABASE__POOL_ADAPTIVE", "Yes", True),
+    ("REDIS__TTL_JITTER", "0.3", 0.3)
+])
+def test_typed_defaults_are_coerced(make_config, key, value, expected):
+    config = make_config(**{key: value})
+    assert config.get(key.lower().replace("__", ".")) == expected
+
+def test_list_default_is_parsed_as_yaml(make_config):
+    config = make_config(DATABASE__REPLICAS="[{host: replica-1, port: 5432}]")
+    replicas = config.get("database.replicas")
+    assert replicas[0]["host"] == "replica-1" and replicas[0]["port"] == 5432
+
+@pytest.mark.parametrize("key, value", [
+    ("DATABASE__POOL_SIZE", "many"),
+    ("DATABASE__POOL_ADAPTIVE", "maybe"),
+    ("DATABASE__REPLICAS", "replica-1")
+])
+def test_invalid_values_are_rejected(make_config, key, value):
+    with pytest.raises(ValueError):
+        make_config(**{key: value})
+
+def test_snapshot_is_read_only(make_config):
+    config = make_config()
+    with pytest.raises(TypeError):
+        config.snapshot["database.pool_size"] = 1
+    assert config.get("database")["pool_size"] == 20
+
+def test_reload_keeps_previous_config_on_invalid_override(make_config, monkeypatch):
+    config = make_config(DATABASE__POOL_SIZE="30")
+    monkeypatch.setenv(config_module.ENV_PREFIX + "DATABASE__POOL_SIZE", "many")
+    assert config.reload() is False
+    assert config.get("database.pool_size") == 30
+
+def test_reload_notifies_subscribers_of_changed_keys(make_config, monkeypatch):
+    config = make_config()
+    seen = []
+    config.subscribe(["database.pool_size"], lambda cfg: seen.append(cfg.get("database.pool_size")))
+    config.subscribe(["redis"], lambda cfg: seen.append("redis"))
+    monkeypatch.setenv(config_module.ENV_PREFIX + "DATABASE__POOL_SIZE", "40")
+    assert config.reload() is True
+    assert seen == [40]
+
+def test_failed_reload_is_retried_until_the_file_is_fixed(make_config, tmp_path):
+    config = make_config()
+    base = tmp_path / "base.yaml"
+    base.write_text("database: [", encoding="utf-8")
+    os.utime(base, (0, 1))
+    assert config.reload() is False
+    # 修改时间未记录，监视线程下次检查时会再次尝试
+    assert config._file_mtimes() != config._mtimes
+
+    base.write_text(BASE_YAML.replace("pool_size: 20", "pool_size: 25"), encoding="utf-8")
+    assert config.reload() is True
+    assert config.get("database.pool_size") == 25
+    assert config._file_mtimes() == config._mtimes
+
+def test_watcher_reloads_and_stops(make_config, tmp_path):
+    config = make_config()
+    config.start_watcher(interval=0.01)
+    base = tmp_path / "base.yaml"
+    base.write_text(BASE_YAML.replace("pool_size: 20", "pool_size: 35"), encoding="utf-8")
+    os.utime(base, (0, 2))
+    for _ in range(500):
+        if config.get("database.pool_size") == 35:
+            break
+        time.sleep(0.01)
+    assert config.get("database.pool_size") == 35
+
+    watcher = config._watcher
+    config.stop_watcher()
+    assert not watcher.is_alive()
+
+def test_unprefixed_env_overrides_are_reported(make_config, monkeypatch, caplog):
+    monkeypatch.setenv("DATABASE__POOL_SIZE", "99")
+    monkeypatch.setenv("UNRELATED__VALUE", "1")
+    config = make_config()
+    assert config.get("database.pool_size") == 20
+    assert "DATABASE__POOL_SIZE" in caplog.text
+    assert "UNRELATED__VALUE" not in caplog.text
@@ -0,0 +1,56 @@
+import fakeredis
+import numpy as np
+import pytest
+from redis.exceptions import ConnectionError
+from data.knowledge_cache import KnowledgeFeatureCache, bump_knowledge_version
+
+class RecordingKnowledgeRepository:
+    """记录特征查询次数的知识库仓库"""
+
+    def __init__(self, features):
+        self.features = features
+        self.calls = []
+
+    def get_subject_node_features(self, subject):
+        self.calls.append(subject)
+        return list(self.features.items())
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeRedis(server=fakeredis.FakeServer())
+
+def test_features_are_loaded_with_one_query_per_subject(redis):
+    repo = RecordingKnowledgeRepository({"k1": [1, 2], "k2": [3, 4], "k3": [5, 6]})
+    cache = KnowledgeFeatureCache(repo, redis, check_interval=0)
+    node_ids, matrix = cache.get("math")
+    assert node_ids == ["k1", "k2", "k3"]
+    assert matrix.dtype == np.float32 and matrix.flags["C_CONTIGUOUS"]
+    assert matrix.tolist() == [[1, 2], [3, 4], [5, 6]]
+
+    cache.get("math")
+    assert repo.calls == ["math"]
+    bump_knowledge_version(redis, "math")
+    cache.get("math")
+    assert repo.calls == ["math", "math"]
+
+def test_empty_subject(redis):
+    cache = KnowledgeFeatureCache(RecordingKnowledgeRepository({}), redis, check_interval=0)
+    assert cache.get("math") == ([], None)
+
+class FailingRedis:
+    def get(self, key):
+        raise ConnectionError("Redis不可用")
+
+def test_cached_entry_is_served_when_version_check_fails(redis):
+    repo = RecordingKnowledgeRepository({"k1": [1, 2]})
+    cache = KnowledgeFeatureCache(repo, redis, check_interval=0)
+    node_ids, _ = cache.get("math")
+
+    cache.redis_client = FailingRedis()
+    assert cache.get("math")[0] == node_ids
+    assert repo.calls == ["math"]
+
+def test_version_check_failure_without_cached_entry_raises():
+    cache = KnowledgeFeatureCache(RecordingKnowledgeRepository({"k1": [1, 2]}), FailingRedis(), check_interval=0)
+    with pytest.raises(ConnectionError):
+        cache.get("math")
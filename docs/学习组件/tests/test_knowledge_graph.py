@@ -0,0 +1,54 @@
+import networkx as nx
+from data.knowledge_cache import CompiledKnowledgeGraph
+
+def _graph(edges, nodes=()):
+    graph = nx.DiGraph()
+    graph.add_nodes_from(nodes)
+    graph.add_edges_from(edges)
+    return CompiledKnowledgeGraph(graph)
+
+# a -> b -> d，a -> c -> d，d -> e，f 独立
+EDGES = [("a", "b"), ("a", "c"), ("b", "d"), ("c", "d"), ("d", "e")]
+
+def _respects_prerequisites(compiled, sequence):
+    position = {node: i for i, node in enumerate(sequence)}
+    return all(position[u] < position[v] for u, v in compiled.graph.edges if u in position and v in position)
+
+def test_closure_sequence_is_topological():
+    compiled = _graph(EDGES, nodes=["f"])
+    sequence = compiled.closure_sequence(["e"])
+    assert set(sequence) == {"a", "b", "c", "d", "e"}
+    assert _respects_prerequisites(compiled, sequence)
+
+def test_cyclic_graph_is_flagged():
+    compiled = _graph([("a", "b"), ("b", "a")])
+    assert not compiled.is_dag
+
+def test_descendants():
+    compiled = _graph(EDGES, nodes=["f"])
+    assert compiled.descendants(["a"]) == {"b", "c", "d", "e"}
+    assert compiled.descendants(["b"]) == {"d", "e"}
+    assert compiled.descendants(["b", "c"]) == {"d", "e"}
+    assert compiled.descendants(["e", "f"]) == set()
+    assert compiled.descendants(["unknown"]) == set()
+
+def test_descendants_matches_networkx():
+    graph = nx.gnp_random_graph(60, 0.08, seed=3, directed=True)
+    dag = nx.DiGraph([(u, v) for u, v in graph.edges if u < v])
+    dag.add_nodes_from(range(60))
+    compiled = CompiledKnowledgeGraph(dag)
+    for node in range(0, 60, 7):
+        assert compiled.descendants([node]) == nx.descendants(dag, node)
+
+def test_splice_keeps_order_and_inserts_after_prerequisites():
+    compiled = _graph(EDGES, nodes=["f"])
+    sequence = ["a", "c", "f"]
+    result = compiled.splice(sequence, remove=["f"], add=["d", "b"])
+    assert result == ["a", "b", "c", "d"]
+    assert _respects_prerequisites(compiled, result)
+    # 未改动的节点保持原相对顺序
+    assert [node for node in result if node in ("a", "c")] == ["a", "c"]
+
+def test_splice_without_prerequisites_inserts_at_front():
+    compiled = _graph(EDGES, nodes=["f"])
+    assert compiled.splice(["b", "d"], remove=[], add=["f"]) == ["f", "b", "d"]
@@ -0,0 +1,41 @@
+import os
+import json
+import time
+import numpy as np
+from models import lite
+
+def _write_model(path, mtime_ns):
+    spec = {"version": lite.LITE_FORMAT_VERSION}
+    np.savez(path, __spec__=np.frombuffer(json.dumps(spec).encode("utf-8"), dtype=np.uint8),
+             **{"dense/kernel": np.ones((2, 2), dtype=np.float32)})
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+def _age(directory, seconds):
+    stamp = time.time() - seconds
+    os.utime(directory, (stamp, stamp))
+
+def test_stale_dirs_are_kept_during_grace_period(tmp_path):
+    path = str(tmp_path / "model.npz")
+    _write_model(path, 1_000_000_000)
+    old_dir = lite._mapped_weights_dir(path)
+    _write_model(path, 2_000_000_000)
+    new_dir = lite._mapped_weights_dir(path)
+
+    assert new_dir != old_dir
+    assert os.path.isdir(old_dir)
+
+def test_only_older_dirs_are_removed_after_grace_period(tmp_path):
+    path = str(tmp_path / "model.npz")
+    _write_model(path, 1_000_000_000)
+    old_dir = lite._mapped_weights_dir(path)
+    _write_model(path, 3_000_000_000)
+    newer_dir = lite._mapped_weights_dir(path)
+    # 其他worker仍在使用的较旧模型文件
+    _write_model(path, 2_000_000_000)
+    current_dir = lite._mapped_weights_dir(path)
+    _age(current_dir, lite.STALE_WEIGHTS_GRACE + 1)
+
+    assert lite._mapped_weights_dir(path) == current_dir
+    assert not os.path.exists(old_dir)
+    assert os.path.isdir(newer_dir)
+    assert os.path.isdir(current_dir)
@@ -0,0 +1,144 @@
+import hmac
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import pytest
+import fakeredis
+from api import rate_limit
+from api.auth import TokenVerifier
+from api.rate_limit import LocalTokenBucket, RateLimiter, RateLimitRule, RedisTokenBucket
+
+SECRET = "test-secret"
+
+class Clock:
+    def __init__(self):
+        self.now = 500.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+def _scope(path="/api/v1/students/1", method="GET", client=("10.0.0.1", 5000), headers=(), state=None):
+    return {"method": method, "path": path, "client": client, "headers": list(headers), "state": state or {}}
+
+@pytest.mark.parametrize("text, capacity, rate", [
+    ("100/minute", 100, 100 / 60),
+    ("10 per second", 10, 10),
+    ("10/5 second", 10, 2),
+    ("3 per 2 hours", 3, 3 / 7200)
+])
+def test_parse_rule(text, capacity, rate):
+    rule = RateLimitRule.parse(text)
+    assert rule.capacity == capacity
+    assert rule.rate == pytest.approx(rate)
+
+def test_parse_rejects_invalid_rule():
+    with pytest.raises(ValueError):
+        RateLimitRule.parse("fast")
+
+def test_local_bucket_refills_over_time(clock):
+    bucket, rule = LocalTokenBucket(), RateLimitRule.parse("2/second")
+    assert bucket.acquire("k", rule) == 0
+    assert bucket.acquire("k", rule) == 0
+    assert bucket.acquire("k", rule) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.acquire("k", rule) == 0
+    assert bucket.acquire("k", rule) > 0
+    # 补充不超过桶容量
+    clock.now += 100
+    assert [bucket.acquire("k", rule) for _ in range(3)][:2] == [0, 0]
+
+def test_local_bucket_evicts_full_buckets_first(clock):
+    bucket, rule = LocalTokenBucket(max_keys=2), RateLimitRule.parse("1/second")
+    bucket.acquire("a", rule)
+    clock.now += 0.2
+    bucket.acquire("b", rule)
+    clock.now += 0.9
+    bucket.acquire("c", rule)
+    assert set(bucket.buckets) == {"b", "c"}
+
+def test_identity_ignores_client_headers():
+    limiter = RateLimiter("10/minute")
+    first = limiter.bucket_key(_scope(headers=[(b"x-student-id", b"s1")]))
+    second = limiter.bucket_key(_scope(headers=[(b"x-student-id", b"s2")]))
+    assert first == second == "*|ip=10.0.0.1"
+
+def test_identity_uses_authenticated_principal():
+    limiter = RateLimiter("10/minute")
+    assert limiter.bucket_key(_scope(state={"principal": "student-1"})) == "*|principal=student-1"
+    assert limiter.bucket_key(_scope(client=None)) == "*|ip=127.0.0.1"
+
+def test_endpoint_rules_get_separate_buckets():
+    limiter = RateLimiter("10/minute", {"POST:/api/v1/learning-paths/batch": "1/minute"})
+    scope = _scope(path="/api/v1/learning-paths/batch", method="POST")
+    assert limiter.rule_for("POST", scope["path"]).capacity == 1
+    assert limiter.bucket_key(scope) == "POST:/api/v1/learning-paths/batch|ip=10.0.0.1"
+    assert limiter.rule_for("GET", "/other") is limiter.global_rule
+
+def test_endpoint_rules_match_route_templates():
+    limiter = RateLimiter("10/minute", {"GET:/api/v1/students/{student_id}": "2/minute"})
+    first, second = _scope(path="/api/v1/students/1"), _scope(path="/api/v1/students/2")
+    assert limiter.rule_for("GET", first["path"]).capacity == 2
+    # 不同路径参数共用同一个端点桶
+    assert limiter.bucket_key(first) == limiter.bucket_key(second) == "GET:/api/v1/students/{student_id}|ip=10.0.0.1"
+    assert limiter.rule_for("POST", first["path"]) is limiter.global_rule
+    assert limiter.rule_for("GET", "/api/v1/students/1/paths") is limiter.global_rule
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _token(claims, secret=SECRET, alg="HS256"):
+    signing_input = f"{_b64(json.dumps({'alg': alg, 'typ': 'JWT'}).encode())}.{_b64(json.dumps(claims).encode())}"
+    signature = hmac.new(secret.encode(), signing_input.encode(), hashlib.sha256).digest()
+    return f"{signing_input}.{_b64(signature)}"
+
+def _bearer(token):
+    return [(b"authorization", f"Bearer {token}".encode())]
+
+def test_identity_uses_verified_token_claims():
+    limiter = RateLimiter("10/minute", token_verifier=TokenVerifier(SECRET, claims=("tenant_id", "student_id")))
+    scope = _scope(headers=_bearer(_token({"student_id": "s1", "exp": time.time() + 60})))
+    assert limiter.bucket_key(scope) == "*|principal=student_id=s1"
+    assert scope["state"]["principal"] == "student_id=s1"
+    tenant = _scope(headers=_bearer(_token({"tenant_id": "t1", "student_id": "s1"})))
+    assert limiter.bucket_key(tenant) == "*|principal=tenant_id=t1"
+
+@pytest.mark.parametrize("token", [
+    _token({"student_id": "s1"}, secret="forged"),
+    _token({"student_id": "s1", "exp": time.time() - 3600}),
+    _token({"student_id": "s1"}, alg="none"),
+    "not-a-token"
+])
+def test_unverified_tokens_fall_back_to_client_ip(token):
+    limiter = RateLimiter("10/minute", token_verifier=TokenVerifier(SECRET))
+    scope = _scope(headers=_bearer(token))
+    assert limiter.bucket_key(scope) == "*|ip=10.0.0.1"
+    assert "principal" not in scope["state"]
+
+def test_redis_bucket_shares_tokens_between_instances():
+    async def run():
+        server = fakeredis.FakeServer()
+        rule = RateLimitRule.parse("2/minute")
+        first = RedisTokenBucket(fakeredis.FakeAsyncRedis(server=server))
+        second = RedisTokenBucket(fakeredis.FakeAsyncRedis(server=server))
+        return [await first.acquire("k", rule), await second.acquire("k", rule), await first.acquire("k", rule)]
+
+    results = asyncio.run(run())
+    assert results[:2] == [0, 0]
+    assert results[2] == pytest.approx(30, abs=0.5)
+
+def test_redis_bucket_fails_open():
+    async def run():
+        server = fakeredis.FakeServer()
+        server.connected = False
+        bucket = RedisTokenBucket(fakeredis.FakeAsyncRedis(server=server))
+        return await bucket.acquire("k", RateLimitRule.parse("1/minute"))
+
+    assert asyncio.run(run()) == 0
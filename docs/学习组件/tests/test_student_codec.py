@@ -0,0 +1,106 @@
+import os
+import sys
+import json
+import types
+import importlib.util
+from enum import Enum
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List
+import numpy as np
+import pytest
+from conftest import ROOT
+
+class LearningStyle(Enum):
+    VISUAL = "visual"
+    AUDITORY = "auditory"
+    READING = "reading"
+    KINESTHETIC = "kinesthetic"
+
+@dataclass
+class StudentProfile:
+    """最小学生画像，字段与 models.student.StudentProfile 一致"""
+    id: str
+    name: str
+    grade_level: int
+    learning_style: LearningStyle
+    cognitive_style: str
+    knowledge_state: Dict[str, float] = field(default_factory=dict)
+    learning_history: List[Any] = field(default_factory=list)
+    preferences: Dict[str, Any] = field(default_factory=dict)
+    emotional_state: Dict[str, float] = field(default_factory=dict)
+    learning_goals: List[Any] = field(default_factory=list)
+    available_time: int = 0
+
+def _load_codec():
+    """导入编解码模块；完整代码树不可用时，在独立的包名下加载源码，models.student 指向上面的最小画像"""
+    try:
+        module = importlib.import_module("data.repositories.student_codec")
+        return module, module.StudentProfile, module.LearningStyle
+    except ImportError:
+        pass
+
+    prefix = "_codec_tree"
+    for name, path in ((prefix, ROOT), (f"{prefix}.data", "data"), (f"{prefix}.data.repositories", "data/repositories"),
+                       (f"{prefix}.models", "models")):
+        package = types.ModuleType(name)
+        package.__path__ = [os.path.join(ROOT, path)]
+        sys.modules[name] = package
+    student = types.ModuleType(f"{prefix}.models.student")
+    student.StudentProfile, student.LearningStyle = StudentProfile, LearningStyle
+    sys.modules[student.__name__] = student
+
+    name = f"{prefix}.data.repositories.student_codec"
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, "data", "repositories", "student_codec.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module, StudentProfile, LearningStyle
+
+codec_module, Profile, Style = _load_codec()
+
+@pytest.fixture
+def student():
+    return Profile(
+        id="s1",
+        name="学生",
+        grade_level=3,
+        learning_style=Style("visual"),
+        cognitive_style="analytical",
+        knowledge_state={"k1": 0.1, "k2": 0.7, "k3": 1 / 3},
+        learning_history=[{"node": "k1"}],
+        preferences={"session_length": 30},
+        emotional_state={"engagement": 0.5},
+        learning_goals=["k3"],
+        available_time=60
+    )
+
+@pytest.mark.parametrize("version", [codec_module.JSON_VERSION, codec_module.MSGPACK_VERSION])
+def test_round_trip_is_exact(student, version):
+    pytest.importorskip("msgpack")
+    codec = codec_module.StudentCacheCodec(version)
+    payload = codec.encode(student)
+    assert payload[0] == version
+    assert codec.decode(payload) == student
+
+def test_float32_version_is_written_as_float64():
+    pytest.importorskip("msgpack")
+    assert codec_module.StudentCacheCodec(codec_module.MSGPACK_F32_VERSION).version == codec_module.MSGPACK_VERSION
+
+def test_legacy_float32_payload_restores_short_decimals(student):
+    msgpack = pytest.importorskip("msgpack")
+    data = asdict(student)
+    data["learning_style"] = student.learning_style.value
+    knowledge_state = data.pop("knowledge_state")
+    data["knowledge_ids"] = ["k1", "k2"]
+    data["knowledge_values"] = np.array([knowledge_state["k1"], knowledge_state["k2"]], dtype=np.float32).tobytes()
+    payload = bytes([codec_module.MSGPACK_F32_VERSION]) + msgpack.packb(data, use_bin_type=True)
+    assert codec_module.StudentCacheCodec().decode(payload).knowledge_state == {"k1": 0.1, "k2": 0.7}
+
+def test_unversioned_json_is_accepted(student):
+    data = asdict(student)
+    data["learning_style"] = student.learning_style.value
+    assert codec_module.StudentCacheCodec().decode(json.dumps(data)) == student
+
+def test_unknown_version_is_rejected():
+    with pytest.raises(ValueError):
+        codec_module.StudentCacheCodec().decode(b"\x09payload")
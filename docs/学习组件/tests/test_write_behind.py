@@ -0,0 +1,84 @@
+import json
+import fakeredis
+from data.write_behind import DEAD_LETTER_KEY, KnowledgeStateWriteBuffer
+
+class RecordingRepository:
+    """记录写入批次，fail 为 True 时写入失败"""
+
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+
+    def batch_update_knowledge_state(self, batch, invalidate_cache=True):
+        if self.fail:
+            raise RuntimeError("数据库不可用")
+        self.batches.append({student_id: dict(deltas) for student_id, deltas in batch.items()})
+        return True
+
+def test_flush_merges_latest_values():
+    repo = RecordingRepository()
+    buffer = KnowledgeStateWriteBuffer(repo)
+    buffer.add("s1", {"k1": 0.1, "k2": 0.2})
+    buffer.add("s1", {"k1": 0.5})
+    buffer.add("s2", {"k3": 0.3})
+    assert buffer.flush() == 2
+    assert repo.batches == [{"s1": {"k1": 0.5, "k2": 0.2}, "s2": {"k3": 0.3}}]
+    assert buffer.flush() == 0
+
+def test_flush_subset_leaves_other_students_pending():
+    repo = RecordingRepository()
+    buffer = KnowledgeStateWriteBuffer(repo)
+    buffer.add("s1", {"k1": 0.1})
+    buffer.add("s2", {"k2": 0.2})
+    assert buffer.flush(["s1", "missing"]) == 1
+    assert repo.batches == [{"s1": {"k1": 0.1}}]
+    assert buffer.pending_for("s1") == {}
+    assert buffer.pending_for("s2") == {"k2": 0.2}
+
+def test_failed_flush_is_retried_with_newer_values():
+    repo = RecordingRepository()
+    buffer = KnowledgeStateWriteBuffer(repo, max_retries=3)
+    buffer.add("s1", {"k1": 0.1, "k2": 0.2})
+    repo.fail = True
+    assert buffer.flush() == 0
+    assert buffer.pending_for("s1") == {"k1": 0.1, "k2": 0.2}
+
+    # 重试前产生的更新值优先
+    buffer.add("s1", {"k1": 0.9})
+    repo.fail = False
+    assert buffer.flush() == 1
+    assert repo.batches == [{"s1": {"k1": 0.9, "k2": 0.2}}]
+    assert buffer.failures == {}
+
+def test_batches_over_retry_limit_go_to_dead_letter():
+    redis = fakeredis.FakeRedis()
+    repo = RecordingRepository()
+    repo.fail = True
+    buffer = KnowledgeStateWriteBuffer(repo, max_retries=2, redis_client=redis)
+    buffer.add("s1", {"k1": 0.4})
+    for _ in range(2):
+        buffer.flush()
+        assert buffer.pending_for("s1") == {"k1": 0.4}
+    buffer.flush()
+
+    assert buffer.pending_for("s1") == {}
+    assert buffer.failures == {}
+    entries = [json.loads(entry) for entry in redis.lrange(DEAD_LETTER_KEY, 0, -1)]
+    assert [(entry["student_id"], entry["deltas"]) for entry in entries] == [("s1", {"k1": 0.4})]
+
+def test_dead_letter_without_redis_is_dropped_after_logging(caplog):
+    repo = RecordingRepository()
+    repo.fail = True
+    buffer = KnowledgeStateWriteBuffer(repo, max_retries=0)
+    buffer.add("s1", {"k1": 0.4})
+    buffer.flush()
+    assert buffer.pending_for("s1") == {}
+    assert "s1" in caplog.text
+
+def test_close_flushes_remaining_changes():
+    repo = RecordingRepository()
+    buffer = KnowledgeStateWriteBuffer(repo, flush_interval=60)
+    buffer.start()
+    buffer.add("s1", {"k1": 0.7})
+    buffer.close()
+    assert repo.batches == [{"s1": {"k1": 0.7}}]